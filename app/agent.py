@@ -12,20 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import logging
 import os
 
 import google.auth
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 from google.adk.agents.callback_context import CallbackContext
-from google.adk.tools import google_search
-from app.utils.bigquery import (
-    list_datasets_with_queryable_resources,
-    list_queryable_resources_in_project,
-    get_table_schema,
-    execute_query,
-    dry_run_query,
-)
+from google.adk.events import Event
+from google.adk.tools import FunctionTool, google_search
+from app.utils import bigquery, bigquery_async
+from app.utils.compaction import ContextCompactor
+from app.utils.metrics import instrument_tool, metrics
+from app.utils.parallel_tools import ParallelToolExecutor
+from app.utils.response_cache import ResponseCache, create_backend
+from app.utils.routing import FLASH_MODEL, PRO_MODEL, ModelRouter, load_rules
+from app.utils.tool_logging import tool_call_logger
+
+logger = logging.getLogger(__name__)
 
 _, project_id = google.auth.default()
 os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
@@ -35,29 +40,115 @@ os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 from google.adk.tools import ToolContext
 from app.tools import generate_python_code
 
-def before_tool_callback(tool_context: ToolContext, tool, args):
-    tool_name = tool.name
-    print(f"Calling tool: {tool_name} with args: {args}")
+# The async tools poll BigQuery jobs without holding a thread or the event loop.
+if os.environ.get("BIGQUERY_ASYNC_TOOLS", "true").lower() == "true":
+    bigquery_tools = bigquery_async
+else:
+    bigquery_tools = bigquery
+
+bigquery_function_tools = [
+    FunctionTool(instrument_tool(tool))
+    for tool in (
+        bigquery_tools.list_datasets_with_queryable_resources,
+        bigquery_tools.list_queryable_resources_in_project,
+        bigquery_tools.get_table_schema,
+        bigquery_tools.profile_table,
+        bigquery_tools.run_query,
+        bigquery_tools.execute_query,
+        bigquery_tools.dry_run_query,
+        bigquery_tools.search_catalog,
+        bigquery_tools.query_stored_result,
+    )
+]
+# The BigQuery tools are independent of each other, so the calls to them in one
+# model response, such as schema lookups of several tables, run concurrently.
+# Calls started ahead of ADK are timed from when they actually start.
+parallel_tool_executor = ParallelToolExecutor(
+    bigquery_function_tools, on_start=tool_call_logger.before_tool_callback
+)
+
+# Answers repeated documentation questions without delegating to the search agent again.
+search_cache = ResponseCache(tool_name="search_agent", backend=create_backend())
+metrics.register_collector(search_cache.samples)
 
-def after_tool_callback(tool_context: ToolContext, tool, args, tool_response):
-    tool_name = tool.name
-    print(f"Finished calling tool: {tool_name} with args: {args}, response: {tool_response}")
+async def before_tool_callback(tool_context: ToolContext, tool, args):
+    tool_call_logger.before_tool_callback(tool, args, tool_context)
+    cached = await search_cache.before_tool_callback(tool, args, tool_context)
+    if cached:
+        return cached
+    return await parallel_tool_executor.before_tool_callback(tool, args, tool_context)
 
-def collect_search_sources_callback(callback_context: CallbackContext):
-    sources = []
-    for event in callback_context._invocation_context.session.events:
+async def after_tool_callback(tool_context: ToolContext, tool, args, tool_response):
+    await search_cache.after_tool_callback(tool, args, tool_context, tool_response)
+    await bigquery.sql_examples.after_tool_callback(tool, args, tool_context, tool_response)
+    tool_call_logger.after_tool_callback(tool, args, tool_context, tool_response)
+
+# Maximum number of sources kept for a turn.
+SEARCH_SOURCES_MAX = int(os.environ.get("SEARCH_SOURCES_MAX", "20"))
+
+def _grounding_sources(events: list[Event]) -> list[dict]:
+    """Returns the web sources grounding `events`, deduplicated by URL."""
+    sources = {}
+    for event in events:
         if event.grounding_metadata and event.grounding_metadata.grounding_chunks:
             for chunk in event.grounding_metadata.grounding_chunks:
-                if chunk.web and chunk.web.uri:
-                    sources.append({"url": chunk.web.uri, "title": chunk.web.title or chunk.web.uri})
+                if chunk.web and chunk.web.uri and chunk.web.uri not in sources:
+                    sources[chunk.web.uri] = {"url": chunk.web.uri, "title": chunk.web.title or chunk.web.uri}
+    return list(sources.values())[:SEARCH_SOURCES_MAX]
+
+def collect_search_sources_callback(callback_context: CallbackContext) -> None:
+    """Stores the grounding sources of this turn's events in `search_sources`.
+
+    Only the events added since the previous turn are scanned, from the cursor kept
+    in `search_sources_cursor`, so the cost does not grow with the session.
+    """
+    events = callback_context._invocation_context.session.events
+    cursor = callback_context.state.get("search_sources_cursor", 0)
+    if cursor > len(events):
+        cursor = 0
+    sources = _grounding_sources(events[cursor:])
+    callback_context.state["search_sources_cursor"] = len(events)
     if sources:
         callback_context.state["search_sources"] = sources
 
+def store_search_agent_sources_callback(callback_context: CallbackContext) -> None:
+    """Stores the sources of the search agent's answer in `search_sources`.
+
+    The search agent runs in a fresh session for every delegation, and AgentTool forwards
+    its state changes to the root session, where `search_cache` stores them with the answer.
+    """
+    events = callback_context._invocation_context.session.events
+    callback_context.state["search_sources"] = _grounding_sources(events)
+
+async def preload_catalog_callback(callback_context: CallbackContext) -> None:
+    """Puts the catalog in session state, where the instruction reads it as `{catalog?}`."""
+    try:
+        overview = await asyncio.to_thread(bigquery.catalog_overview)
+    except Exception as e:
+        logger.warning("Could not preload the catalog, the agent will list it with tools: %s", e)
+        return
+    # Only write state when the catalog was reloaded, so most turns add no state delta.
+    if callback_context.state.get("catalog_version") != overview["version"]:
+        callback_context.state["catalog"] = overview["text"]
+        callback_context.state["catalog_version"] = overview["version"]
+
+# Replaces stale tool responses in the model's context with compact summaries.
+context_compactor = ContextCompactor(result_store=bigquery.result_store)
+
+# Sends mechanical steps (picking tables, formatting results) to the flash model
+# and keeps the pro model for writing and repairing SQL.
+root_model_router = ModelRouter(default_model=PRO_MODEL, rules=load_rules())
+# Summarizing search results needs no SQL reasoning.
+search_model_router = ModelRouter(default_model=FLASH_MODEL, rules=(), default_route="search")
+
 search_agent = Agent(
     name="search_agent",
     model="gemini-2.5-pro",
     instruction="""You are a search agent. You must use the `google_search` tool to answer the user's question. The user's question is in the `request` argument.""",
     tools=[google_search],
+    after_agent_callback=store_search_agent_sources_callback,
+    before_model_callback=search_model_router.before_model_callback,
+    after_model_callback=search_model_router.after_model_callback,
 )
 
 root_agent = Agent(
@@ -66,13 +157,13 @@ root_agent = Agent(
     instruction="""You are a BigQuery expert for a team of analysts. Your goal is to be as helpful as possible and not assume the user knows the data structure. You have access to a variety of tools to help you answer questions about BigQuery datasets.
 
 Here is your workflow:
-1.  **ALWAYS** start by using `list_datasets_with_queryable_resources` to identify available datasets.
-2.  Then, use `list_queryable_resources_in_project` to get a list of all available tables and views within those datasets.
-3.  Present the user with a list of all the resources you found, and ask them to choose one.
-4.  Once the user has selected a resource, you should construct the SQL query required to answer the user's question.
-5.  You should then validate the SQL syntax and perform a dry run to ensure that the query will not fail.
-6.  If the dry run is successful, you should execute the query and return the results to the user in a table format. You should also present the SQL query you used in a nicely formatted code block.
-7.  If the dry run fails, you should try to correct the SQL query and try again. If you are unable to correct the query, you should inform the user of the error and ask for clarification.
+1.  If "Validated SQL" at the end of these instructions has an entry marked "same question", run its SQL with `run_query` right away instead of steps 1-4; otherwise use its entries as examples when you write SQL. The datasets and the tables and views in them are listed under "Data catalog" at the end of these instructions, so you do not need to look them up. Only if the data catalog is empty or a dataset shows just a count of resources, use `list_datasets_with_queryable_resources` to identify available datasets.
+2.  In that case, use `list_queryable_resources_in_project` to get a list of all available tables and views within those datasets.
+3.  Present the user with a list of all the resources available, and ask them to choose one. If there are many resources, or the user's question already names a subject, use `search_catalog` to find the most relevant tables and columns and present those instead of the full list.
+4.  Once the user has selected a resource, use `get_table_schema` to look up its columns, passing the user's question so that only the relevant columns of wide tables are returned, and construct the SQL query required to answer the user's question. Filter on the `partitioned_by` column when you can, to limit the data scanned. If you need to know the values a column holds to write a filter, use `profile_table` rather than querying the column.
+5.  You should then validate and execute the query with `run_query`, which performs a dry run and, only if it succeeds, executes the query in the same call. Use `dry_run_query` on its own only when the user wants a cost estimate without running the query.
+6.  If `run_query` succeeds, you should return the results to the user in a table format. You should also present the SQL query you used in a nicely formatted code block. If the result is `truncated`, tell the user how many of the `total_rows` rows are shown. If the result has `limit_added`, a LIMIT was added to your query: show the query with it. If the result has a `result_id` instead of `rows`, it was too large to return directly: show the `preview`, and use `query_stored_result` to page through, filter or aggregate it rather than re-running the query.
+7.  If `run_query` returns a validation `error`, you should try to correct the SQL query and try again. If you are unable to correct the query, you should inform the user of the error and ask for clarification.
 8.  Always limit queries to no more than 10 rows unless the queries contain aggregates (e.g., COUNT(*), SUM(column), etc.).
 9.  Always show the query before showing the results.
 10. Always show results in markdown format.
@@ -99,16 +190,24 @@ Examples of things you should answer because they directly relate to BigQuery:
     Looker
     Any service native to BigQuery like BI Engine, Data Transfer Service, Dataprep, Pipelines, Data Canvas, etc.
 
-Important: When using regular expressions in a query, you must not have more than one capturing group in the expression. If you need to extract multiple parts from a single column, use a separate function call for each part (e.g., one REGEXP_EXTRACT for address, another for city, etc.). Do not use the `REGEXP_QUOTE` function as it is not supported.""",
+Important: When using regular expressions in a query, you must not have more than one capturing group in the expression. If you need to extract multiple parts from a single column, use a separate function call for each part (e.g., one REGEXP_EXTRACT for address, another for city, etc.). Do not use the `REGEXP_QUOTE` function as it is not supported.
+
+Validated SQL that answered earlier questions similar to the user's (may be empty):
+{sql_examples?}
+
+Data catalog (`dataset: tables and views`):
+{catalog?}""",
     tools=[
-        list_datasets_with_queryable_resources,
-        list_queryable_resources_in_project,
-        get_table_schema,
-        execute_query,
-        dry_run_query,
-        generate_python_code,
+        *bigquery_function_tools,
+        instrument_tool(generate_python_code),
         AgentTool(agent=search_agent)
     ],
+    before_agent_callback=[preload_catalog_callback, bigquery.sql_examples.before_agent_callback],
+    before_model_callback=[
+        context_compactor.before_model_callback,
+        root_model_router.before_model_callback,
+    ],
+    after_model_callback=root_model_router.after_model_callback,
     before_tool_callback=before_tool_callback,
     after_tool_callback=after_tool_callback,
     after_agent_callback=collect_search_sources_callback,
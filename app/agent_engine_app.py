@@ -30,8 +30,10 @@ from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
 from app.agent import root_agent
+from app.utils.clients import client_manager
 from app.utils.gcs import create_bucket_if_not_exists
-from app.utils.tracing import CloudTraceLoggingSpanExporter
+from app.utils.trace_sampling import TailSamplingSpanProcessor
+from app.utils.tracing import CloudTraceLoggingSpanExporter, FileSpanExporter
 from app.utils.typing import Feedback
 
 
@@ -42,13 +44,19 @@ class AgentEngineApp(AdkApp):
         logging_client = google_cloud_logging.Client()
         self.logger = logging_client.logger(__name__)
         provider = TracerProvider()
-        processor = export.BatchSpanProcessor(
-            CloudTraceLoggingSpanExporter(
+        # TRACE_EXPORT_FILE writes spans to a local JSONL file instead of Google Cloud.
+        exporter: export.SpanExporter
+        if trace_file := os.environ.get("TRACE_EXPORT_FILE"):
+            exporter = FileSpanExporter(trace_file)
+        else:
+            exporter = CloudTraceLoggingSpanExporter(
                 project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
             )
-        )
+        processor = TailSamplingSpanProcessor(export.BatchSpanProcessor(exporter))
         provider.add_span_processor(processor)
         trace.set_tracer_provider(provider)
+        if os.environ.get("BIGQUERY_WARM_UP", "false").lower() == "true":
+            client_manager.warm_up()
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
         """Collect and log feedback."""
@@ -113,6 +121,8 @@ def deploy_agent_engine_app(
 
     # Set worker parallelism to 1
     env_vars["NUM_WORKERS"] = "1"
+    # Spill large query results to the artifacts bucket
+    env_vars.setdefault("RESULT_STORE_BUCKET", artifacts_bucket_name)
 
     # Common configuration for both create and update operations
     agent_config = {
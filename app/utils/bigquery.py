@@ -12,21 +12,189 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import datetime
 import os
 import logging
+from collections.abc import Sequence
+from typing import Optional
 
 import google.auth
+from google.adk.tools import ToolContext
+from google.api_core import exceptions
 from google.cloud import bigquery
 
+from app.utils.cache import TTLCache
+from app.utils.catalog import BigQueryCatalog, CatalogSnapshot
+from app.utils.clients import client_manager
+from app.utils.jobs import JOB_TIMEOUT_SECONDS, deadline_exceeded, job_registry, query_job_config
+from app.utils.metrics import Sample, metrics
+from app.utils.profiling import TableProfiler
+from app.utils.query_cache import QueryResultCache, table_version
+from app.utils.result_store import (
+    PREVIEW_ROWS,
+    create_result_store,
+    query_frame,
+    should_spill,
+    summarize,
+)
+from app.utils.results import MAX_RESULT_ROWS, RESULT_PAGE_SIZE, BoundedResult, read_bounded
+from app.utils.schema_digest import schema_digest
+from app.utils.sql import normalize_sql
+from app.utils.sql_check import SQL_DEFAULT_LIMIT, SQLCheck, check_sql
+from app.utils.sql_examples import SQLExampleStore, schema_fingerprint
+
 logger = logging.getLogger(__name__)
 
 _, project_id = google.auth.default()
 os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
 
 
-def get_client() -> bigquery.Client:
-    """Initializes and returns a BigQuery client."""
-    return bigquery.Client()
+def get_client(project: str | None = None, location: str | None = None) -> bigquery.Client:
+    """Returns the shared, pooled BigQuery client for a project and location."""
+    return client_manager.get_client(project, location)
+
+
+# Shared across sessions so the catalog is loaded once per TTL, not per turn.
+catalog = BigQueryCatalog(client_factory=get_client)
+
+# Column statistics, recomputed only when a table changes.
+profiler = TableProfiler(client_factory=get_client)
+
+# Large query results are spilled here and handed to the model as a result id.
+result_store = create_result_store()
+
+
+def _table_versions(tables: Sequence[str]) -> dict[str, datetime.datetime | None]:
+    """Returns the cache version of each fully qualified table, fetched in parallel."""
+    client = get_client()
+    outcome = catalog.crawler.fan_out(lambda table: table_version(client.get_table(table)), tables)
+    return {table: outcome.results.get(table) for table in tables}
+
+
+# Repeated questions are answered from here while the tables they read are unchanged.
+query_cache = QueryResultCache(table_versions=_table_versions)
+
+
+def _schema_fingerprints(tables: Sequence[str]) -> dict[str, str | None]:
+    """Returns the schema fingerprint of each table, from the catalog's cached metadata.
+
+    Tables of other projects, and tables that cannot be read, have no fingerprint.
+    """
+    default_project = get_client().project
+
+    def fingerprint(table: str) -> str | None:
+        parts = table.split(".")
+        if len(parts) not in (2, 3) or (len(parts) == 3 and parts[0] != default_project):
+            return None
+        return schema_fingerprint(catalog.table_metadata(*parts[-2:]))
+
+    outcome = catalog.crawler.fan_out(fingerprint, tables)
+    return {table: outcome.results.get(table) for table in tables}
+
+
+# The SQL that answered earlier questions, offered again for similar questions.
+sql_examples = SQLExampleStore(schema_fingerprints=_schema_fingerprints)
+
+
+def get_query_cache_stats() -> dict:
+    """Returns the hit rate and bytes saved by the shared query result cache."""
+    return query_cache.stats()
+
+
+# Outcomes of recent dry runs, keyed by normalized SQL.
+dry_run_memo = TTLCache(
+    maxsize=512, ttl=float(os.environ.get("DRY_RUN_MEMO_TTL_SECONDS", "300"))
+)
+
+
+bytes_processed = metrics.counter(
+    "bigquery_bytes_processed_total", "Bytes processed by queries run by the tools."
+)
+
+
+def _cache_samples() -> list[Sample]:
+    """Reports the shared caches' counters and the job registry's state to /metrics."""
+    samples = []
+    caches = {
+        "catalog": catalog.stats(),
+        "dry_run": dry_run_memo.stats(),
+        "profile": profiler.stats(),
+        "query_result": query_cache.stats(),
+        "sql_examples": sql_examples.stats(),
+    }
+    for cache, stats in caches.items():
+        samples.append(
+            Sample("cache_hits_total", "Cache hits, by cache.", "counter", {"cache": cache}, stats["hits"])
+        )
+        samples.append(
+            Sample("cache_misses_total", "Cache misses, by cache.", "counter", {"cache": cache}, stats["misses"])
+        )
+        samples.append(
+            Sample("cache_hit_ratio", "Hit ratio of each cache.", "gauge", {"cache": cache}, stats["hit_rate"])
+        )
+    samples.append(
+        Sample(
+            "bigquery_bytes_saved_total",
+            "Bytes not processed because a result came from the query result cache.",
+            "counter",
+            {},
+            caches["query_result"]["bytes_saved"],
+        )
+    )
+    jobs = job_registry.stats()
+    samples.append(Sample("bigquery_jobs_in_flight", "BigQuery jobs being waited on.", "gauge", {}, jobs["in_flight"]))
+    for outcome in ("completed", "failed", "cancelled"):
+        samples.append(
+            Sample("bigquery_jobs_total", "BigQuery jobs by outcome.", "counter", {"outcome": outcome}, jobs[outcome])
+        )
+    return samples
+
+
+metrics.register_collector(_cache_samples)
+
+
+# Additional projects whose resources are listed alongside the default project's.
+CATALOG_PROJECTS = [
+    p.strip() for p in os.environ.get("BIGQUERY_CATALOG_PROJECTS", "").split(",") if p.strip()
+]
+
+
+def _catalog_snapshots() -> list[CatalogSnapshot]:
+    """Returns the snapshots of the default project and any configured extra projects."""
+    if not CATALOG_PROJECTS:
+        return [catalog.snapshot()]
+    default_project = os.environ["GOOGLE_CLOUD_PROJECT"]
+    return catalog.snapshots([default_project, *CATALOG_PROJECTS])
+
+
+# Larger catalogs are preloaded as per-dataset resource counts only.
+CATALOG_PRELOAD_MAX_RESOURCES = int(os.environ.get("BIGQUERY_CATALOG_PRELOAD_MAX_RESOURCES", "500"))
+
+
+def catalog_overview() -> dict:
+    """Returns the catalog as compact text for the agent's instruction, with its version.
+
+    The version is the load time of each snapshot, so it changes whenever the catalog
+    is reloaded.
+    """
+    default_project = os.environ["GOOGLE_CLOUD_PROJECT"]
+    snapshots = _catalog_snapshots()
+    max_resources = CATALOG_PRELOAD_MAX_RESOURCES // max(len(snapshots), 1)
+    return {
+        "text": "\n".join(
+            snapshot.describe(
+                qualified=snapshot.project != default_project, max_resources=max_resources
+            )
+            for snapshot in snapshots
+        ),
+        "version": [snapshot.loaded_at for snapshot in snapshots],
+    }
+
+
+def get_catalog_cache_stats() -> dict:
+    """Returns the hit/miss counters of the shared catalog cache."""
+    return catalog.stats()
 
 
 def list_tables(dataset_id: str) -> list[str]:
@@ -38,51 +206,252 @@ def list_tables(dataset_id: str) -> list[str]:
     Returns:
         A list of table IDs in the dataset.
     """
-    logger.info(f"Calling list_tables with dataset_id: {dataset_id}")
+    logger.debug("Calling list_tables with dataset_id: %s", dataset_id)
     client = get_client()
     tables = client.list_tables(dataset_id)
     result = [table.table_id for table in tables]
-    logger.info(f"list_tables returned: {result}")
+    logger.debug("list_tables returned %d tables", len(result))
     return result
 
 
-def get_table_schema(dataset_id: str, table_id: str) -> dict:
+def get_table_schema(
+    dataset_id: str, table_id: str, question: str = "", detailed: bool = False
+) -> dict:
     """Gets the schema of a BigQuery table.
 
+    By default the schema is a compact digest: one `path TYPE` line per column, with
+    nested fields flattened into dotted paths (`items[].sku` for repeated records).
+
     Args:
         dataset_id: The ID of the BigQuery dataset.
         table_id: The ID of the BigQuery table.
+        question: The user's question. For wide tables, only the columns most relevant
+            to it are returned, plus the partitioning and clustering columns.
+        detailed: Return `columns` as a list of name/type/mode objects for the top-level
+            fields instead.
 
     Returns:
-        A dictionary representing the table schema.
+        A dictionary with the `columns` digest, `partitioned_by` and `clustered_by` when
+        the table is partitioned or clustered, and `omitted_columns` if columns were pruned.
     """
-    logger.info(f"Calling get_table_schema with dataset_id: {dataset_id}, table_id: {table_id}")
-    client = get_client()
-    table_ref = client.dataset(dataset_id).table(table_id)
-    table = client.get_table(table_ref)
-    result = [{"name": field.name, "type": field.field_type, "mode": field.mode} for field in table.schema]
-    logger.info(f"get_table_schema returned: {result}")
+    logger.debug("Calling get_table_schema with dataset_id: %s, table_id: %s", dataset_id, table_id)
+    if detailed:
+        return {"columns": catalog.table_schema(dataset_id, table_id)}
+    return schema_digest(catalog.table_metadata(dataset_id, table_id), question=question)
+
+
+# ADK's declaration parser accepts Optional[...] but not the `X | None` syntax.
+def profile_table(
+    dataset_id: str, table_id: str, columns: Optional[list[str]] = None  # noqa: UP045
+) -> dict:
+    """Profiles the columns of a BigQuery table from a small sample.
+
+    Use this before writing filters to learn what values a column actually holds,
+    instead of running `SELECT DISTINCT` over the whole table.
+
+    Args:
+        dataset_id: The ID of the BigQuery dataset.
+        table_id: The ID of the BigQuery table.
+        columns: The columns to profile. Defaults to all top-level scalar columns.
+
+    Returns:
+        A dictionary with the table's `total_rows`, the `sample` profiled and, for each
+        column, its `null_fraction`, `approx_distinct` count, `min`, `max` and most
+        frequent `top_values` in the sample. Views too large to profile cheaply
+        return an `error` instead.
+    """
+    logger.debug("Calling profile_table with dataset_id: %s, table_id: %s", dataset_id, table_id)
+    result = profiler.profile(dataset_id, table_id, columns)
+    logger.debug("profile_table returned %d column profiles", len(result.get("columns", [])))
     return result
 
 
-def execute_query(query: str) -> list[dict]:
+def _table_exists(table: str) -> bool | None:
+    """Returns whether `table` exists according to the cached catalog, or None if unknown.
+
+    Only tables of the default project are checked, and only once its catalog is cached,
+    so the check never runs a catalog query. Tables of datasets missing from the catalog,
+    which may be in another location, are unknown. A table missing from a known dataset
+    is looked up before it is reported missing, since the catalog may predate it.
+    """
+    parts = table.split(".")
+    snapshot = catalog.cached_snapshot()
+    if snapshot is None or (len(parts) == 3 and parts[0] != snapshot.project):
+        return None
+    dataset_id, table_id = parts[-2:]
+    tables = snapshot.tables_in(dataset_id)
+    if not tables:
+        return None
+    if table_id in tables:
+        return True
+    try:
+        catalog.table_metadata(dataset_id, table_id)
+        return True
+    except exceptions.NotFound:
+        return False
+    except exceptions.GoogleAPIError:
+        return None
+
+
+def check_query(query: str, add_limit: bool = True) -> SQLCheck:
+    """Checks `query` locally before it reaches BigQuery.
+
+    Invalid queries are rejected without a job submission, and with `add_limit`, queries
+    returning rows without aggregates or a LIMIT are limited to `SQL_DEFAULT_LIMIT` rows.
+    """
+    return check_sql(
+        query, table_exists=_table_exists, default_limit=SQL_DEFAULT_LIMIT if add_limit else None
+    )
+
+
+def execute_query(query: str, tool_context: ToolContext | None = None) -> dict:
     """Executes a BigQuery query and returns the results.
 
+    Queries that return rows without aggregates or a LIMIT get a LIMIT added, and the
+    result then has `limit_added`, the number of rows they were limited to. Results
+    are read page by page and capped in rows and bytes, so a query without a LIMIT
+    cannot pull its entire result back. Results too large to return inline are
+    stored, and only a preview, summary statistics and a `result_id` are returned; use
+    `query_stored_result` with that id to page through, filter or aggregate them.
+
     Args:
         query: The BigQuery query to execute.
 
     Returns:
-        A list of dictionaries representing the query results.
+        A dictionary with the result `rows` (a list of dictionaries), `total_rows` in
+        the full result, `rows_returned`, and `truncated`, which is true when the
+        result was cut off at the row or byte cap. Stored results have `result_id`,
+        `schema`, `preview` and `stats` instead of `rows`.
     """
-    logger.info(f"Calling execute_query with query: {query}")
+    logger.debug("Calling execute_query with query: %s", query)
+    check = check_query(query)
+    if not check.ok:
+        return check.error_response()
+    return _execute_checked(check, tool_context)
+
+
+def _execute_checked(check: SQLCheck, tool_context: ToolContext | None) -> dict:
+    """Executes a query that passed `check_query`, annotating the result with the check."""
+    query = check.sql
+    cached = query_cache.get(query)
+    if cached is not None:
+        logger.info("execute_query served from the query result cache")
+        return check.annotate({**cached, "cached": True})
     client = get_client()
-    query_job = client.query(query)
-    results = query_job.result()
-    result = [dict(row) for row in results]
-    logger.info(f"execute_query returned: {result}")
+    query_job = client.query(query, job_config=query_job_config())
+    try:
+        with job_registry.track(query_job, tool_context):
+            return check.annotate(
+                collect_query_results(query, query_job, timeout=JOB_TIMEOUT_SECONDS)
+            )
+    except concurrent.futures.TimeoutError:
+        query_job.cancel()
+        return deadline_exceeded(query_job)
+
+
+def collect_query_results(
+    query: str, query_job: bigquery.QueryJob, timeout: float | None = None
+) -> dict:
+    """Reads, spills and caches the results of a query job, waiting for it if needed."""
+    # Fetch at most one row past the cap so truncation is detected without more pages.
+    row_iterator = query_job.result(
+        page_size=RESULT_PAGE_SIZE, max_results=MAX_RESULT_ROWS + 1, timeout=timeout
+    )
+    bounded = read_bounded(row_iterator, total_rows=row_iterator.total_rows)
+    if should_spill(bounded.rows_returned, bounded.bytes_returned):
+        result = _spill_result(bounded, query_job, row_iterator.schema)
+    else:
+        result = bounded.to_dict()
+    bytes_processed.inc(query_job.total_bytes_processed or 0)
+    query_cache.put(query, query_job, result)
+    logger.debug(
+        "execute_query returned %d of %s rows (%d bytes, truncated: %s)",
+        result["rows_returned"],
+        result["total_rows"],
+        result["bytes_returned"],
+        result["truncated"],
+    )
     return result
 
 
+def _spill_result(
+    bounded: BoundedResult,
+    query_job: bigquery.QueryJob,
+    schema: list[bigquery.SchemaField],
+) -> dict:
+    """Stores a large result and returns a compact handle to it.
+
+    The rows read inline stop at the row and byte caps, so when they were
+    truncated the full result is paged through again from the job and stored
+    up to RESULT_STORE_MAX_ROWS.
+    """
+    rows = query_job.result(page_size=RESULT_PAGE_SIZE) if bounded.truncated else bounded.rows
+    try:
+        result_id, stored = result_store.put(rows, total_rows=bounded.total_rows)
+    except Exception as e:
+        logger.warning("Could not store query result, returning it inline: %s", e)
+        return bounded.to_dict()
+    return {
+        "result_id": result_id,
+        "schema": [{"name": field.name, "type": field.field_type} for field in schema],
+        "preview": bounded.rows[:PREVIEW_ROWS],
+        "stats": summarize(stored.frame),
+        "total_rows": stored.total_rows,
+        "rows_returned": stored.frame.height,
+        "bytes_returned": bounded.bytes_returned,
+        "truncated": stored.truncated,
+    }
+
+
+def query_stored_result(result_id: str, sql: str = "", offset: int = 0, limit: int = 50) -> dict:
+    """Pages through, filters or aggregates a stored query result without re-running the query.
+
+    Args:
+        result_id: The `result_id` returned by `execute_query`.
+        sql: Optional SQL run over the stored result, which is exposed as the table `result`,
+            e.g. "SELECT country, SUM(revenue) AS revenue FROM result GROUP BY country".
+        offset: The first row to return.
+        limit: The maximum number of rows to return.
+
+    Returns:
+        A dictionary with the requested `rows` and the `total_rows` of the (transformed)
+        result, and the `result_total_rows` of the query. If `truncated`, the stored
+        result holds only part of the query's rows, and `sql` runs over that part only.
+    """
+    logger.debug("Calling query_stored_result with result_id: %s, sql: %s", result_id, sql)
+    try:
+        stored = result_store.get(result_id)
+    except KeyError:
+        return {"error": f"No stored result with id {result_id}"}
+    result = query_frame(stored.frame, sql=sql, offset=offset, limit=limit)
+    if "error" not in result:
+        result["result_total_rows"] = stored.total_rows
+        result["truncated"] = stored.truncated
+    logger.debug("query_stored_result returned %s rows", result.get("rows_returned"))
+    return result
+
+
+def memoized_dry_run(query: str) -> dict:
+    """Dry-runs `query`, reusing the outcome of an earlier dry run of the same SQL.
+
+    Invalid queries are reported with an `error` instead of raising, and are memoized
+    too, so resubmitting unchanged SQL after a failure costs no job submission.
+    """
+    key = normalize_sql(query)
+    outcome = dry_run_memo.get(key)
+    if outcome is not None:
+        return outcome
+    client = get_client()
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    try:
+        query_job = client.query(query, job_config=job_config)
+        outcome = {"status": query_job.state, "total_bytes_processed": query_job.total_bytes_processed}
+    except (exceptions.BadRequest, exceptions.NotFound) as e:
+        outcome = {"status": "INVALID", "error": e.message}
+    dry_run_memo.set(key, outcome)
+    return outcome
+
+
 def dry_run_query(query: str) -> dict:
     """Performs a dry run of a BigQuery query to validate it and estimate cost.
 
@@ -90,49 +459,73 @@ def dry_run_query(query: str) -> dict:
         query: The BigQuery query to validate.
 
     Returns:
-        A dictionary containing the query status and the estimated bytes to be processed.
+        A dictionary containing the query status and the estimated bytes to be processed,
+        or the validation `error` if the query is invalid.
     """
-    logger.info(f"Calling dry_run_query with query: {query}")
-    client = get_client()
-    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
-    query_job = client.query(query, job_config=job_config)
-    result = {"status": query_job.state, "total_bytes_processed": query_job.total_bytes_processed}
-    logger.info(f"dry_run_query returned: {result}")
+    logger.debug("Calling dry_run_query with query: %s", query)
+    check = check_query(query, add_limit=False)
+    if not check.ok:
+        return check.error_response()
+    result = memoized_dry_run(query)
+    logger.debug("dry_run_query returned status %s", result["status"])
     return result
 
+
+def run_query(query: str, tool_context: ToolContext | None = None) -> dict:
+    """Validates a BigQuery query with a dry run and, if it is valid, executes it.
+
+    Prefer this over calling `dry_run_query` and then `execute_query`.
+
+    Args:
+        query: The BigQuery query to validate and execute.
+
+    Returns:
+        If the query is invalid, a dictionary with `status` "INVALID" and the validation
+        `error`. Otherwise the results as returned by `execute_query`, together with the
+        dry run's `total_bytes_processed` estimate.
+    """
+    logger.debug("Calling run_query with query: %s", query)
+    check = check_query(query)
+    if not check.ok:
+        return check.error_response()
+    validation = memoized_dry_run(check.sql)
+    if "error" in validation:
+        logger.info("run_query validation failed: %s", validation["error"])
+        return validation
+    result = _execute_checked(check, tool_context)
+    return {"total_bytes_processed": validation["total_bytes_processed"], **result}
+
 def list_datasets() -> list[str]:
     """Lists all datasets in the project."""
-    logger.info("Calling list_datasets")
+    logger.debug("Calling list_datasets")
     client = get_client()
     datasets = list(client.list_datasets())
     result = [dataset.dataset_id for dataset in datasets]
-    logger.info(f"list_datasets returned: {result}")
+    logger.debug("list_datasets returned %d datasets", len(result))
     return result
 
 def list_queryable_resources_in_project() -> list[str]:
     """Lists all queryable resources (tables, views, materialized views) in the project, formatted as `dataset.resource`."""
-    logger.info("Calling list_queryable_resources_in_project")
-    client = get_client()
-    datasets = list(client.list_datasets())
-    all_resources = []
-    for dataset in datasets:
-        tables = client.list_tables(dataset.dataset_id)
-        for table in tables:
-            all_resources.append(f"{dataset.dataset_id}.{table.table_id}")
-    logger.info(f"list_queryable_resources_in_project returned: {all_resources}")
+    logger.debug("Calling list_queryable_resources_in_project")
+    default_project = os.environ["GOOGLE_CLOUD_PROJECT"]
+    all_resources = [
+        resource
+        for snapshot in _catalog_snapshots()
+        for resource in snapshot.resources(qualified=snapshot.project != default_project)
+    ]
+    logger.debug("list_queryable_resources_in_project returned %d resources", len(all_resources))
     return all_resources
 
 def list_datasets_with_queryable_resources() -> list[str]:
     """Lists all datasets in the project that contain at least one queryable resource (table, view, or materialized view)."""
-    logger.info("Calling list_datasets_with_queryable_resources")
-    client = get_client()
-    datasets = list(client.list_datasets())
-    datasets_with_resources = []
-    for dataset in datasets:
-        tables = list(client.list_tables(dataset.dataset_id))
-        if tables:
-            datasets_with_resources.append(dataset.dataset_id)
-    logger.info(f"list_datasets_with_queryable_resources returned: {datasets_with_resources}")
+    logger.debug("Calling list_datasets_with_queryable_resources")
+    default_project = os.environ["GOOGLE_CLOUD_PROJECT"]
+    datasets_with_resources = [
+        dataset
+        for snapshot in _catalog_snapshots()
+        for dataset in snapshot.datasets(qualified=snapshot.project != default_project)
+    ]
+    logger.debug("list_datasets_with_queryable_resources returned %d datasets", len(datasets_with_resources))
     return datasets_with_resources
 
 def find_column_in_tables(dataset_id: str, column_name: str) -> list[str]:
@@ -145,16 +538,26 @@ def find_column_in_tables(dataset_id: str, column_name: str) -> list[str]:
     Returns:
         A list of table IDs that contain the specified column.
     """
-    logger.info(f"Calling find_column_in_tables with dataset_id: {dataset_id}, column_name: {column_name}")
-    client = get_client()
-    tables = client.list_tables(dataset_id)
-    tables_with_column = []
-    for table in tables:
-        table_ref = client.dataset(dataset_id).table(table.table_id)
-        table_schema = client.get_table(table_ref).schema
-        for field in table_schema:
-            if field.name.lower() == column_name.lower():
-                tables_with_column.append(table.table_id)
-                break
-    logger.info(f"find_column_in_tables returned: {tables_with_column}")
+    logger.debug("Calling find_column_in_tables with dataset_id: %s, column_name: %s", dataset_id, column_name)
+    tables_with_column = catalog.search_index().tables_with_column(
+        column_name, dataset_id=dataset_id
+    )
+    logger.debug("find_column_in_tables returned %d tables", len(tables_with_column))
     return tables_with_column
+
+def search_catalog(query: str, k: int = 10) -> list[dict]:
+    """Searches the project's tables and views by name, column names and descriptions.
+
+    Use this to find the tables relevant to a question instead of listing every resource.
+
+    Args:
+        query: Free-text description of the data you are looking for, e.g. "customer orders revenue".
+        k: The maximum number of tables to return.
+
+    Returns:
+        The best matching tables, best first, each with its score and the columns that matched the query.
+    """
+    logger.debug("Calling search_catalog with query: %s, k: %d", query, k)
+    result = catalog.search_index().search(query, k=k)
+    logger.debug("search_catalog returned %d tables", len(result))
+    return result
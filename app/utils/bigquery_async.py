@@ -0,0 +1,133 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Non-blocking versions of the BigQuery tools in `app.utils.bigquery`.
+
+The tools have the same names, arguments and docstrings as their synchronous
+counterparts, so the agent can register either set. Short metadata calls run
+in a worker thread; query jobs are submitted and then polled with
+`asyncio.sleep` backoff, so no thread is held while BigQuery runs the job.
+Cancelling the awaiting task, for example because the client disconnected,
+or reaching the tool deadline cancels the BigQuery job.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from google.adk.tools import ToolContext
+from google.cloud import bigquery
+
+from app.utils import bigquery as bq
+from app.utils.jobs import (
+    JOB_TIMEOUT_SECONDS,
+    deadline_exceeded,
+    job_registry,
+    query_job_config,
+)
+from app.utils.sql_check import SQLCheck
+
+logger = logging.getLogger(__name__)
+
+POLL_INITIAL_DELAY = float(os.environ.get("BIGQUERY_POLL_INITIAL_DELAY", "0.2"))
+POLL_MAX_DELAY = float(os.environ.get("BIGQUERY_POLL_MAX_DELAY", "5"))
+POLL_BACKOFF = 1.5
+
+R = TypeVar("R")
+
+
+def run_in_thread(func: Callable[..., R]) -> Callable[..., Awaitable[R]]:
+    """Turns a blocking tool into a coroutine that runs it in a worker thread."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> R:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return wrapper
+
+
+async def wait_for_job(query_job: bigquery.QueryJob) -> None:
+    """Waits for `query_job` to finish without blocking the event loop.
+
+    The job state is polled with exponential backoff. If the waiting task is
+    cancelled, the BigQuery job is cancelled too.
+    """
+    delay = POLL_INITIAL_DELAY
+    try:
+        while not await asyncio.to_thread(query_job.done):
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+    except asyncio.CancelledError:
+        logger.info("Cancelling BigQuery job %s", query_job.job_id)
+        await asyncio.shield(asyncio.to_thread(query_job.cancel))
+        raise
+
+
+@functools.wraps(bq.execute_query)
+async def execute_query(query: str, tool_context: ToolContext | None = None) -> dict:
+    logger.debug("Calling async execute_query with query: %s", query)
+    check = await asyncio.to_thread(bq.check_query, query)
+    if not check.ok:
+        return check.error_response()
+    return await _execute_checked(check, tool_context)
+
+
+async def _execute_checked(check: SQLCheck, tool_context: ToolContext | None) -> dict:
+    query = check.sql
+    cached = await asyncio.to_thread(bq.query_cache.get, query)
+    if cached is not None:
+        logger.info("execute_query served from the query result cache")
+        return check.annotate({**cached, "cached": True})
+    client = bq.get_client()
+    query_job = await asyncio.to_thread(
+        client.query, query, job_config=query_job_config()
+    )
+    try:
+        with job_registry.track(query_job, tool_context):
+            await asyncio.wait_for(wait_for_job(query_job), JOB_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return deadline_exceeded(query_job)
+    return check.annotate(
+        await asyncio.to_thread(bq.collect_query_results, query, query_job)
+    )
+
+
+@functools.wraps(bq.run_query)
+async def run_query(query: str, tool_context: ToolContext | None = None) -> dict:
+    logger.debug("Calling async run_query with query: %s", query)
+    check = await asyncio.to_thread(bq.check_query, query)
+    if not check.ok:
+        return check.error_response()
+    validation = await asyncio.to_thread(bq.memoized_dry_run, check.sql)
+    if "error" in validation:
+        logger.info("run_query validation failed: %s", validation["error"])
+        return validation
+    result = await _execute_checked(check, tool_context)
+    return {"total_bytes_processed": validation["total_bytes_processed"], **result}
+
+
+dry_run_query = run_in_thread(bq.dry_run_query)
+get_table_schema = run_in_thread(bq.get_table_schema)
+profile_table = run_in_thread(bq.profile_table)
+list_datasets_with_queryable_resources = run_in_thread(
+    bq.list_datasets_with_queryable_resources
+)
+list_queryable_resources_in_project = run_in_thread(
+    bq.list_queryable_resources_in_project
+)
+search_catalog = run_in_thread(bq.search_catalog)
+query_stored_result = run_in_thread(bq.query_stored_result)
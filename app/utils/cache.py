@@ -0,0 +1,173 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any
+
+_MISSING = object()
+
+
+@dataclass
+class _Load:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    callers: int = 0
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after a time-to-live.
+
+    The cache is meant to be shared process-wide, so every operation takes a
+    lock. Hit, miss, eviction and expiration counters are kept so the cache
+    can be observed from the outside. Besides the entry count, the cache can
+    be bounded by the total size of its values as measured by `sizeof`.
+    `get_or_load` runs one loader per key at a time, so an expired entry is
+    reloaded once however many callers miss it together.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float = 300.0,
+        timer: Callable[[], float] = time.monotonic,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ) -> None:
+        """Initializes the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before the least recently
+                used entry is evicted.
+            ttl: Default time-to-live of an entry, in seconds.
+            timer: Monotonic clock used to compute expirations.
+            max_bytes: Maximum total size of the cached values, if bounded.
+            sizeof: Returns the size of a value. Required with `max_bytes`.
+        """
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("sizeof is required when max_bytes is set")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._timer = timer
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._sizes: dict[Hashable, int] = {}
+        self.current_bytes = 0
+        self._lock = threading.RLock()
+        self._loads: dict[Hashable, _Load] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, record=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, record: bool = True) -> Any:
+        """Returns the cached value for `key`, or `default` if absent or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    if record:
+                        self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            if record:
+                self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Stores `value` under `key`, evicting the oldest entries if full."""
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            self._remove(key)
+            expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+            self._data[key] = (expires_at, value)
+            self._sizes[key] = size
+            self.current_bytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def get_or_load(
+        self, key: Hashable, loader: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        """Returns the cached value for `key`, calling `loader` on a miss.
+
+        Callers missing the same key wait for the first one's loader and share
+        its value, instead of each calling their own.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            load = self._loads.setdefault(key, _Load())
+            load.callers += 1
+        try:
+            with load.lock:
+                value = self.get(key, _MISSING, record=False)
+                if value is _MISSING:
+                    value = loader()
+                    self.set(key, value, ttl=ttl)
+                return value
+        finally:
+            with self._lock:
+                load.callers -= 1
+                if not load.callers:
+                    del self._loads[key]
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drops `key` from the cache, or every entry when `key` is None."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self._sizes.clear()
+                self.current_bytes = 0
+            else:
+                self._remove(key)
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the cache counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.current_bytes,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        if self._data.pop(key, None) is not None:
+            self.current_bytes -= self._sizes.pop(key, 0)
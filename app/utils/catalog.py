@@ -0,0 +1,374 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.cache import TTLCache
+from app.utils.crawler import CatalogCrawler, FanOutResult
+from app.utils.search_index import CatalogSearchIndex, TableDocument
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL_SECONDS = float(os.environ.get("BIGQUERY_CATALOG_TTL_SECONDS", "300"))
+CATALOG_MAX_ENTRIES = int(os.environ.get("BIGQUERY_CATALOG_MAX_ENTRIES", "4096"))
+# Partial crawls are retried sooner than complete ones.
+CATALOG_PARTIAL_TTL_SECONDS = 30.0
+
+_TABLES_QUERY = """
+SELECT table_schema, table_name, table_type
+FROM `{project}`.`region-{region}`.INFORMATION_SCHEMA.TABLES
+ORDER BY table_schema, table_name
+"""
+
+_COLUMNS_QUERY = """
+SELECT
+  c.table_schema,
+  c.table_name,
+  c.field_path,
+  c.data_type,
+  c.description,
+  o.option_value AS table_description
+FROM `{project}`.`region-{region}`.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS AS c
+LEFT JOIN `{project}`.`region-{region}`.INFORMATION_SCHEMA.TABLE_OPTIONS AS o
+  ON c.table_schema = o.table_schema
+  AND c.table_name = o.table_name
+  AND o.option_name = 'description'
+"""
+
+
+def _api_table_type(table_type: str) -> str:
+    """Converts an INFORMATION_SCHEMA table type to its API spelling.
+
+    INFORMATION_SCHEMA reports `BASE TABLE` and `MATERIALIZED VIEW` where the
+    API, and so the crawl fallback, reports `TABLE` and `MATERIALIZED_VIEW`.
+    """
+    if table_type == "BASE TABLE":
+        return "TABLE"
+    return table_type.replace(" ", "_")
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A single queryable resource (table, view, materialized view, ...)."""
+
+    dataset_id: str
+    table_id: str
+    table_type: str
+
+    @property
+    def resource(self) -> str:
+        return f"{self.dataset_id}.{self.table_id}"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """The queryable resources of a project at a point in time."""
+
+    project: str
+    entries: tuple[CatalogEntry, ...]
+    loaded_at: float = field(default_factory=time.time)
+    source: str = "information_schema"
+    failed_datasets: tuple[str, ...] = ()
+    # The regions whose INFORMATION_SCHEMA listed the entries, e.g. ("eu", "us").
+    regions: tuple[str, ...] = ()
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.failed_datasets)
+
+    def datasets(self, qualified: bool = False) -> list[str]:
+        """Returns the datasets containing at least one queryable resource.
+
+        With `qualified`, ids are prefixed with the project.
+        """
+        prefix = f"{self.project}." if qualified else ""
+        return sorted({f"{prefix}{entry.dataset_id}" for entry in self.entries})
+
+    def resources(self, qualified: bool = False) -> list[str]:
+        """Returns every resource formatted as `dataset.resource`.
+
+        With `qualified`, resources are formatted as `project.dataset.resource`.
+        """
+        prefix = f"{self.project}." if qualified else ""
+        return [f"{prefix}{entry.resource}" for entry in self.entries]
+
+    def tables_in(self, dataset_id: str) -> list[str]:
+        """Returns the resource ids in `dataset_id`."""
+        return [e.table_id for e in self.entries if e.dataset_id == dataset_id]
+
+    def describe(
+        self, qualified: bool = False, max_resources: int | None = None
+    ) -> str:
+        """Returns the catalog as compact text, one `dataset: resource, ...` line per dataset.
+
+        Views are marked. Past `max_resources`, only the number of resources
+        in each dataset is given.
+        """
+        prefix = f"{self.project}." if qualified else ""
+        by_dataset: dict[str, list[str]] = {}
+        for entry in self.entries:
+            name = entry.table_id
+            if entry.table_type in ("VIEW", "MATERIALIZED_VIEW"):
+                name += " (view)"
+            by_dataset.setdefault(entry.dataset_id, []).append(name)
+        if max_resources is not None and len(self.entries) > max_resources:
+            lines = [
+                f"{prefix}{dataset_id}: {len(names)} resource{'s' if len(names) != 1 else ''}"
+                for dataset_id, names in sorted(by_dataset.items())
+            ]
+        else:
+            lines = [
+                f"{prefix}{dataset_id}: {', '.join(names)}"
+                for dataset_id, names in sorted(by_dataset.items())
+            ]
+        if self.partial:
+            lines.append(
+                f"(incomplete: could not list {', '.join(prefix + d for d in self.failed_datasets)})"
+            )
+        return "\n".join(lines)
+
+
+class BigQueryCatalog:
+    """Process-wide cache of BigQuery metadata shared by every session.
+
+    The datasets of a project and their locations are listed through the
+    API, then the tables of each location are loaded in bulk with a single
+    query against its region-level `INFORMATION_SCHEMA.TABLES` view instead
+    of one `list_tables()` call per dataset. Table schemas are fetched
+    lazily and cached alongside it. The datasets of a location whose
+    INFORMATION_SCHEMA query fails (missing permissions) are crawled through
+    the API in parallel instead.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], bigquery.Client],
+        location: str | None = None,
+        cache: TTLCache | None = None,
+        crawler: CatalogCrawler | None = None,
+    ) -> None:
+        self._client_factory = client_factory
+        self.crawler = crawler or CatalogCrawler(client_factory)
+        # The location of datasets the API does not report one for.
+        self.location: str = location or os.environ.get("BIGQUERY_LOCATION") or "US"
+        # An empty cache is falsy, so it is compared with None.
+        self.cache = (
+            cache
+            if cache is not None
+            else TTLCache(maxsize=CATALOG_MAX_ENTRIES, ttl=CATALOG_TTL_SECONDS)
+        )
+
+    def snapshot(self, project: str | None = None) -> CatalogSnapshot:
+        """Returns the cached catalog snapshot of `project`, loading it on a miss."""
+        project = self._project(project)
+        key = ("tables", project, self.location.lower())
+        snapshot = self.cache.get(key)
+        if snapshot is None:
+            snapshot = self._load_snapshot(self._client_factory(), project)
+            ttl = CATALOG_PARTIAL_TTL_SECONDS if snapshot.partial else None
+            self.cache.set(key, snapshot, ttl=ttl)
+        return snapshot
+
+    def cached_snapshot(self, project: str | None = None) -> CatalogSnapshot | None:
+        """Returns the snapshot of `project` if it is cached, without loading it."""
+        key = ("tables", self._project(project), self.location.lower())
+        return self.cache.get(key, record=False)
+
+    def _project(self, project: str | None) -> str:
+        return (
+            project
+            or os.environ.get("GOOGLE_CLOUD_PROJECT")
+            or self._client_factory().project
+        )
+
+    def snapshots(self, projects: list[str]) -> list[CatalogSnapshot]:
+        """Returns the snapshots of several projects, loading misses in parallel.
+
+        Projects that cannot be loaded at all are logged and left out.
+        """
+        outcome = self.crawler.fan_out_projects(self.snapshot, projects)
+        return [outcome.results[p] for p in projects if p in outcome.results]
+
+    def table_metadata(self, dataset_id: str, table_id: str) -> bigquery.Table:
+        """Returns the cached table resource of `dataset_id.table_id`."""
+        return self.cache.get_or_load(
+            ("table", dataset_id, table_id),
+            lambda: self._load_table(dataset_id, table_id),
+        )
+
+    def table_schema(self, dataset_id: str, table_id: str) -> list[dict[str, Any]]:
+        """Returns the cached top-level schema of `dataset_id.table_id`."""
+        table = self.table_metadata(dataset_id, table_id)
+        return [
+            {"name": f.name, "type": f.field_type, "mode": f.mode} for f in table.schema
+        ]
+
+    def table_schemas(self, dataset_id: str, table_ids: list[str]) -> FanOutResult:
+        """Returns the schemas of several tables, fetching misses in parallel."""
+        return self.crawler.fan_out(
+            lambda table_id: self.table_schema(dataset_id, table_id), table_ids
+        )
+
+    def search_index(self, project: str | None = None) -> CatalogSearchIndex:
+        """Returns the cached search index over the tables and columns of `project`."""
+        snapshot = self.snapshot(project)
+        return self.cache.get_or_load(
+            ("index", snapshot.project, self.location.lower()),
+            lambda: self._build_index(snapshot),
+        )
+
+    def invalidate(self) -> None:
+        """Drops every cached snapshot and schema."""
+        self.cache.invalidate()
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the hit/miss counters of the underlying cache."""
+        return self.cache.stats()
+
+    def _load_snapshot(self, client: bigquery.Client, project: str) -> CatalogSnapshot:
+        located = self._dataset_locations(client, project)
+        regions: dict[str, list[str]] = {}
+        for dataset_id, location in located.results.items():
+            regions.setdefault(location.lower(), []).append(dataset_id)
+
+        def list_region(region: str) -> list[CatalogEntry]:
+            rows = client.query(
+                _TABLES_QUERY.format(project=project, region=region)
+            ).result()
+            return [
+                CatalogEntry(
+                    row["table_schema"],
+                    row["table_name"],
+                    _api_table_type(row["table_type"]),
+                )
+                for row in rows
+            ]
+
+        outcome = self.crawler.fan_out(list_region, sorted(regions))
+        entries = [
+            entry for region in outcome.results for entry in outcome.results[region]
+        ]
+        logger.info(
+            "Loaded %d catalog entries for %s from INFORMATION_SCHEMA in %s",
+            len(entries),
+            project,
+            sorted(outcome.results),
+        )
+        failed_datasets: list[str] = []
+        # Datasets of failed regions, and datasets whose location is unknown.
+        datasets = sorted(
+            [d for region in outcome.errors for d in regions[region]]
+            + list(located.errors)
+        )
+        if datasets:
+            logger.warning(
+                "Listing %d datasets of %s through the datasets API; the "
+                "INFORMATION_SCHEMA query failed in %s, %d dataset locations are unknown",
+                len(datasets),
+                project,
+                sorted(outcome.errors),
+                len(located.errors),
+            )
+            crawl = self.crawler.crawl_project(project, datasets)
+            entries.extend(
+                CatalogEntry(dataset_id, table.table_id, table.table_type)
+                for dataset_id in crawl.results
+                for table in crawl.results[dataset_id]
+            )
+            failed_datasets = sorted(crawl.errors)
+        entries.sort(key=lambda entry: (entry.dataset_id, entry.table_id))
+        return CatalogSnapshot(
+            project=project,
+            entries=tuple(entries),
+            source="api"
+            if outcome.errors and not outcome.results
+            else "information_schema",
+            failed_datasets=tuple(failed_datasets),
+            regions=tuple(sorted(outcome.results)),
+        )
+
+    def _dataset_locations(self, client: bigquery.Client, project: str) -> FanOutResult:
+        """Looks up the location of every dataset of `project` in parallel.
+
+        Returns:
+            A result mapping each dataset id to its location, and an error for
+            each dataset whose location could not be read.
+        """
+        timeout = self.crawler.request_timeout
+
+        def location(dataset_id: str) -> str:
+            dataset = client.get_dataset(f"{project}.{dataset_id}", timeout=timeout)
+            return dataset.location or self.location
+
+        datasets = client.list_datasets(project, timeout=timeout)
+        return self.crawler.fan_out(
+            location, [dataset.dataset_id for dataset in datasets]
+        )
+
+    def _load_table(self, dataset_id: str, table_id: str) -> bigquery.Table:
+        client = self._client_factory()
+        return client.get_table(client.dataset(dataset_id).table(table_id))
+
+    def _build_index(self, snapshot: CatalogSnapshot) -> CatalogSearchIndex:
+        documents = {
+            (entry.dataset_id, entry.table_id): TableDocument(
+                entry.dataset_id, entry.table_id, entry.table_type
+            )
+            for entry in snapshot.entries
+        }
+        client = self._client_factory()
+
+        def list_region_columns(region: str) -> list[Any]:
+            query = _COLUMNS_QUERY.format(project=snapshot.project, region=region)
+            return list(client.query(query).result())
+
+        outcome = self.crawler.fan_out(list_region_columns, snapshot.regions)
+        for rows in outcome.results.values():
+            for row in rows:
+                document = documents.get((row["table_schema"], row["table_name"]))
+                if document is None:
+                    continue
+                document.description = (row["table_description"] or "").strip('"')
+                document.columns.append(
+                    {
+                        "name": row["field_path"],
+                        "type": row["data_type"],
+                        "description": row["description"] or "",
+                    }
+                )
+        # Tables listed through the API, or in a region whose query failed.
+        missing: dict[str, list[str]] = {}
+        for (dataset_id, table_id), document in documents.items():
+            if not document.columns:
+                missing.setdefault(dataset_id, []).append(table_id)
+        if missing:
+            logger.info(
+                "Fetching the schemas of %d tables of %s individually",
+                sum(len(table_ids) for table_ids in missing.values()),
+                snapshot.project,
+            )
+        for dataset_id, table_ids in missing.items():
+            schemas = self.table_schemas(dataset_id, table_ids)
+            for table_id, schema in schemas.results.items():
+                documents[(dataset_id, table_id)].columns.extend(schema)
+        index = CatalogSearchIndex(documents.values())
+        logger.info("Built catalog search index over %d tables", len(index))
+        return index
@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+from collections.abc import Callable
+
+import google.auth
+import google.auth.credentials
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.environ.get("BIGQUERY_HTTP_POOL_SIZE", "32"))
+
+_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+ClientFactory = Callable[[str | None, str | None], bigquery.Client]
+
+
+class BigQueryClientManager:
+    """Process-wide, thread-safe registry of BigQuery clients.
+
+    Credentials are resolved once and every client shares a single authorized
+    HTTP session whose connection pool is sized for concurrent tool calls, so
+    tool calls reuse open TLS connections instead of building a new client
+    each time. One client is kept per (project, location) pair.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE) -> None:
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[str | None, str | None], bigquery.Client] = {}
+        self._session: AuthorizedSession | None = None
+        self._credentials: google.auth.credentials.Credentials | None = None
+        self._factory: ClientFactory | None = None
+
+    def get_client(
+        self, project: str | None = None, location: str | None = None
+    ) -> bigquery.Client:
+        """Returns the shared client for `project` and `location`.
+
+        Args:
+            project: The project to bill jobs to. Defaults to the ADC project.
+            location: The default location of the jobs run by the client.
+
+        Returns:
+            A BigQuery client, created on first use and reused afterwards.
+        """
+        key = (project, location)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create_client(project, location)
+                self._clients[key] = client
+            return client
+
+    def warm_up(self, project: str | None = None, location: str | None = None) -> None:
+        """Resolves credentials and opens a pooled connection ahead of traffic."""
+        try:
+            client = self.get_client(project, location)
+            list(client.list_datasets(max_results=1))
+            logger.info("Warmed up BigQuery client for project %s", client.project)
+        except Exception as e:
+            logger.warning("BigQuery client warm-up failed: %s", e)
+
+    def set_client_factory(self, factory: ClientFactory | None) -> None:
+        """Overrides how clients are built, e.g. to inject a fake in tests.
+
+        Any client already created is dropped. Passing None restores the
+        default factory.
+        """
+        with self._lock:
+            self._factory = factory
+            self._clients.clear()
+
+    def reset(self) -> None:
+        """Drops every cached client and the shared HTTP session."""
+        with self._lock:
+            self._clients.clear()
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._credentials = None
+
+    def _create_client(
+        self, project: str | None, location: str | None
+    ) -> bigquery.Client:
+        if self._factory is not None:
+            return self._factory(project, location)
+        if self._session is None:
+            self._credentials, _ = google.auth.default(scopes=_SCOPES)
+            session = AuthorizedSession(self._credentials)
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("https://", adapter)
+            self._session = session
+        return bigquery.Client(
+            project=project,
+            location=location,
+            credentials=self._credentials,
+            _http=self._session,
+        )
+
+
+client_manager = BigQueryClientManager()
@@ -0,0 +1,199 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+from app.utils.result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+# Compact stale tool responses, oldest first, while the request exceeds this budget.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "32000"))
+# Stale tool responses above this size are compacted even within the budget.
+CONTEXT_MAX_STALE_RESPONSE_TOKENS = int(
+    os.environ.get("CONTEXT_MAX_STALE_RESPONSE_TOKENS", "2000")
+)
+# Responses this small are never worth compacting.
+CONTEXT_MIN_COMPACT_TOKENS = 200
+# Rows kept in the summary of a compacted query result.
+COMPACTED_PREVIEW_ROWS = 3
+MAX_SUMMARY_STRING_LENGTH = 200
+CHARS_PER_TOKEN = 4
+
+tokens_saved = metrics.counter(
+    "context_tokens_saved_total",
+    "Estimated prompt tokens removed by context compaction.",
+)
+request_tokens = metrics.histogram(
+    "context_request_tokens",
+    "Estimated prompt tokens sent to the model after compaction.",
+    buckets=(1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000, 256000),
+)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Estimates the prompt tokens of a text or a JSON-serializable value."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _part_tokens(part: types.Part) -> int:
+    if part.text:
+        return estimate_tokens(part.text)
+    if part.function_call:
+        return estimate_tokens(part.function_call.args or {})
+    if part.function_response:
+        return estimate_tokens(part.function_response.response or {})
+    return 0
+
+
+def _current_turn_start(contents: list[types.Content]) -> int:
+    """Returns the index of the user message that started the current turn."""
+    for i in range(len(contents) - 1, -1, -1):
+        content = contents[i]
+        if content.role == "user" and any(p.text for p in content.parts or []):
+            return i
+    return 0
+
+
+class ContextCompactor:
+    """Shrinks the conversation history sent to the model on every call.
+
+    Tool responses from earlier turns have already been used to answer the
+    user, yet they are re-sent on every model call. Responses from before the
+    current turn are replaced by a compact summary, oldest first, while the
+    request exceeds the token budget; very large ones are replaced regardless.
+    The summary keeps scalar fields such as `total_rows` and `result_id` and
+    drops lists. Inline query rows are moved to the result store, so the
+    summary carries a `result_id` the model can read them back with.
+
+    Only the outgoing request is changed, never the session's events.
+    Compacted responses are memoized by function call id, since the history
+    is rebuilt from the session for every model call.
+    """
+
+    def __init__(
+        self,
+        result_store: ResultStore | None = None,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        max_stale_response_tokens: int = CONTEXT_MAX_STALE_RESPONSE_TOKENS,
+    ) -> None:
+        self.result_store = result_store
+        self.budget = budget
+        self.max_stale_response_tokens = max_stale_response_tokens
+        self._compacted = TTLCache(maxsize=2048, ttl=3600)
+
+    async def before_model_callback(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        saved = await asyncio.to_thread(self.compact, llm_request.contents)
+        if saved:
+            logger.info(
+                "Context compaction saved ~%d tokens for invocation %s",
+                saved,
+                callback_context.invocation_id,
+            )
+
+    def compact(self, contents: list[types.Content]) -> int:
+        """Compacts stale tool responses in `contents` in place.
+
+        Returns:
+            The estimated number of tokens saved.
+        """
+        turn_start = _current_turn_start(contents)
+        total = 0
+        stale: list[tuple[types.FunctionResponse, int]] = []
+        for i, content in enumerate(contents):
+            for part in content.parts or []:
+                tokens = _part_tokens(part)
+                total += tokens
+                if (
+                    i < turn_start
+                    and part.function_response
+                    and tokens > CONTEXT_MIN_COMPACT_TOKENS
+                ):
+                    stale.append((part.function_response, tokens))
+
+        saved = 0
+        for function_response, tokens in stale:
+            if (
+                total - saved <= self.budget
+                and tokens <= self.max_stale_response_tokens
+            ):
+                continue
+            compacted = self._compact_response(function_response)
+            function_response.response = compacted
+            saved += max(tokens - estimate_tokens(compacted), 0)
+
+        tokens_saved.inc(saved)
+        request_tokens.observe(total - saved)
+        return saved
+
+    def _compact_response(
+        self, function_response: types.FunctionResponse
+    ) -> dict[str, Any]:
+        key = function_response.id
+        compacted = self._compacted.get(key) if key else None
+        if compacted is None:
+            compacted = self.summarize(function_response.response or {})
+            if key:
+                self._compacted.set(key, compacted)
+        return compacted
+
+    def summarize(self, response: dict[str, Any]) -> dict[str, Any]:
+        """Returns a compact summary of a tool response."""
+        summary: dict[str, Any] = {"compacted": True}
+        rows = response.get("rows")
+        if isinstance(rows, list) and rows and "result_id" not in response:
+            result_id = self._store(rows, response.get("total_rows"))
+            if result_id:
+                summary["result_id"] = result_id
+                summary["preview"] = rows[:COMPACTED_PREVIEW_ROWS]
+        for key, value in response.items():
+            if key in summary:
+                continue
+            if value is None or isinstance(value, (bool, int, float)):
+                summary[key] = value
+            elif isinstance(value, str):
+                summary[key] = value[:MAX_SUMMARY_STRING_LENGTH]
+            elif isinstance(value, (list, dict)):
+                summary[key] = f"<{len(value)} items omitted>"
+        summary["note"] = "This earlier tool response was compacted. " + (
+            "Use query_stored_result with the result_id to read its rows."
+            if "result_id" in summary
+            else "Call the tool again if you need the omitted details."
+        )
+        return summary
+
+    def _store(self, rows: list[dict[str, Any]], total_rows: Any) -> str | None:
+        if self.result_store is None:
+            return None
+        try:
+            result_id, _ = self.result_store.put(
+                rows, total_rows=total_rows if isinstance(total_rows, int) else None
+            )
+            return result_id
+        except Exception as e:
+            logger.warning("Could not store compacted rows: %s", e)
+            return None
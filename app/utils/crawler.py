@@ -0,0 +1,161 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+CRAWL_MAX_WORKERS = int(os.environ.get("BIGQUERY_CRAWL_MAX_WORKERS", "16"))
+CRAWL_REQUEST_TIMEOUT = float(os.environ.get("BIGQUERY_CRAWL_REQUEST_TIMEOUT", "20"))
+CRAWL_TIMEOUT = float(os.environ.get("BIGQUERY_CRAWL_TIMEOUT", "60"))
+CRAWL_MAX_PROJECT_WORKERS = 4
+
+K = TypeVar("K", bound=Hashable)
+
+
+@dataclass
+class FanOutResult:
+    """Results of a fan-out, keyed by the input item.
+
+    Items that raised or did not finish before the deadline are listed in
+    `errors` instead, so callers can still use the partial results.
+    """
+
+    results: dict[Any, Any] = field(default_factory=dict)
+    errors: dict[Any, str] = field(default_factory=dict)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.errors)
+
+
+class CatalogCrawler:
+    """Fans BigQuery metadata calls out over a bounded thread pool.
+
+    Discovery time is bounded by the slowest dataset (or `timeout`) rather
+    than the sum of all of them. Every request is issued with
+    `request_timeout`, and anything still running at the overall deadline is
+    reported as timed out instead of failing the whole crawl.
+
+    Projects are fanned out on a separate, smaller pool because each project
+    crawl itself fans out over datasets; sharing one pool could starve it.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[..., bigquery.Client],
+        max_workers: int = CRAWL_MAX_WORKERS,
+        request_timeout: float = CRAWL_REQUEST_TIMEOUT,
+        timeout: float = CRAWL_TIMEOUT,
+    ) -> None:
+        self._client_factory = client_factory
+        self.request_timeout = request_timeout
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bq-crawler"
+        )
+        self._project_executor = ThreadPoolExecutor(
+            max_workers=CRAWL_MAX_PROJECT_WORKERS,
+            thread_name_prefix="bq-crawler-project",
+        )
+
+    def fan_out(
+        self,
+        fn: Callable[[K], Any],
+        items: Iterable[K],
+        timeout: float | None = None,
+    ) -> FanOutResult:
+        """Runs `fn` on every item concurrently and collects what finishes.
+
+        Args:
+            fn: The function to call with each item.
+            items: The items to process. They are used as result keys.
+            timeout: Overall deadline in seconds. Defaults to the crawler's.
+
+        Returns:
+            The results of the calls that succeeded, and an error message for
+            each call that raised or timed out.
+        """
+        return self._fan_out(self._executor, fn, items, timeout)
+
+    def fan_out_projects(
+        self, fn: Callable[[str], Any], projects: Iterable[str]
+    ) -> FanOutResult:
+        """Like `fan_out`, for per-project work that may itself fan out."""
+        return self._fan_out(self._project_executor, fn, projects, None)
+
+    def _fan_out(
+        self,
+        executor: ThreadPoolExecutor,
+        fn: Callable[[K], Any],
+        items: Iterable[K],
+        timeout: float | None,
+    ) -> FanOutResult:
+        futures = {executor.submit(fn, item): item for item in items}
+        done, not_done = wait(
+            futures, timeout=self.timeout if timeout is None else timeout
+        )
+        outcome = FanOutResult()
+        for future in done:
+            item = futures[future]
+            try:
+                outcome.results[item] = future.result()
+            except Exception as e:
+                logger.warning("Catalog crawl failed for %s: %s", item, e)
+                outcome.errors[item] = str(e)
+        for future in not_done:
+            future.cancel()
+            outcome.errors[futures[future]] = "timed out"
+        if not_done:
+            logger.warning("Catalog crawl timed out for %d item(s)", len(not_done))
+        return outcome
+
+    def crawl_project(
+        self, project: str, datasets: Iterable[str] | None = None
+    ) -> FanOutResult:
+        """Lists the tables of every dataset in `project` in parallel.
+
+        Args:
+            project: The project to crawl.
+            datasets: The dataset ids to crawl. Defaults to every dataset of
+                the project.
+
+        Returns:
+            A result mapping each dataset id to its list of
+            `bigquery.table.TableListItem`.
+        """
+        client = self._client_factory()
+        if datasets is None:
+            datasets = [
+                dataset.dataset_id
+                for dataset in client.list_datasets(
+                    project, timeout=self.request_timeout
+                )
+            ]
+
+        def list_dataset_tables(dataset_id: str) -> list[Any]:
+            return list(
+                client.list_tables(
+                    f"{project}.{dataset_id}", timeout=self.request_timeout
+                )
+            )
+
+        return self.fan_out(list_dataset_tables, datasets)
@@ -0,0 +1,178 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import concurrent.futures
+import contextlib
+import logging
+import os
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.tools import ToolContext
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+# Deadline of a single query tool call. BigQuery also enforces it server-side.
+JOB_TIMEOUT_SECONDS = float(os.environ.get("BIGQUERY_JOB_TIMEOUT_SECONDS", "300"))
+
+_CANCELLATION_ERRORS = (
+    asyncio.CancelledError,
+    asyncio.TimeoutError,
+    concurrent.futures.TimeoutError,
+    TimeoutError,
+)
+
+
+@dataclass(frozen=True)
+class _TrackedJob:
+    job: bigquery.QueryJob
+    invocation_id: str | None
+    session_id: str | None
+
+
+def query_job_config(**kwargs: Any) -> bigquery.QueryJobConfig:
+    """Returns a job config that makes BigQuery stop the job at the tool deadline."""
+    return bigquery.QueryJobConfig(
+        job_timeout_ms=int(JOB_TIMEOUT_SECONDS * 1000), **kwargs
+    )
+
+
+def context_ids(tool_context: ToolContext | None) -> tuple[str | None, str | None]:
+    """Returns the invocation and session ids of a tool call, if known."""
+    if tool_context is None:
+        return None, None
+    session = tool_context._invocation_context.session
+    return tool_context.invocation_id, session.id if session else None
+
+
+def deadline_exceeded(query_job: bigquery.QueryJob) -> dict[str, Any]:
+    """Returns the tool response for a query cancelled at its deadline."""
+    return {
+        "status": "CANCELLED",
+        "job_id": query_job.job_id,
+        "error": (
+            f"The query did not finish within {JOB_TIMEOUT_SECONDS:.0f} seconds "
+            "and was cancelled. Try a more selective query."
+        ),
+    }
+
+
+def job_outcome(query_job: bigquery.QueryJob) -> str:
+    """Returns whether a finished job completed, failed or was cancelled.
+
+    BigQuery reports jobs cancelled by a client, or stopped at their
+    `job_timeout_ms`, with a `stopped` or `timeout` error result.
+    """
+    error = query_job.error_result
+    if not error:
+        return "completed"
+    if error.get("reason") in ("stopped", "timeout"):
+        return "cancelled"
+    return "failed"
+
+
+class JobRegistry:
+    """Tracks in-flight BigQuery jobs per session and invocation.
+
+    Jobs are registered while a tool waits on them, so that when a client
+    disconnects or a turn is abandoned the jobs it started can be cancelled
+    instead of running on in BigQuery. Completed, failed and cancelled jobs
+    are counted.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: dict[str, _TrackedJob] = {}
+        self.outcomes: Counter[str] = Counter()
+
+    @contextlib.contextmanager
+    def track(
+        self, query_job: bigquery.QueryJob, tool_context: ToolContext | None = None
+    ) -> Iterator[None]:
+        """Registers `query_job` for the duration of the block.
+
+        The job is counted as cancelled if the block is cancelled or times
+        out, and failed if it raises anything else. Otherwise the job has
+        finished, and its outcome is read from its final state.
+        """
+        invocation_id, session_id = context_ids(tool_context)
+        with self._lock:
+            self._jobs[query_job.job_id] = _TrackedJob(
+                query_job, invocation_id, session_id
+            )
+        outcome = "failed"
+        try:
+            yield
+            outcome = job_outcome(query_job)
+        except _CANCELLATION_ERRORS:
+            outcome = "cancelled"
+            raise
+        finally:
+            self._finish(query_job.job_id, outcome)
+
+    def cancel(
+        self, invocation_id: str | None = None, session_id: str | None = None
+    ) -> int:
+        """Cancels the in-flight jobs of an invocation or a session.
+
+        Returns:
+            The number of jobs a cancellation was requested for.
+        """
+        with self._lock:
+            tracked = [
+                t
+                for t in self._jobs.values()
+                if (invocation_id and t.invocation_id == invocation_id)
+                or (session_id and t.session_id == session_id)
+            ]
+        cancelled = 0
+        for t in tracked:
+            if not self._finish(t.job.job_id, "cancelled"):
+                continue
+            try:
+                t.job.cancel()
+                cancelled += 1
+                logger.info("Cancelled abandoned BigQuery job %s", t.job.job_id)
+            except Exception as e:
+                logger.warning("Could not cancel BigQuery job %s: %s", t.job.job_id, e)
+        return cancelled
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of in-flight jobs and the count of each outcome."""
+        with self._lock:
+            return {
+                "in_flight": len(self._jobs),
+                "completed": self.outcomes["completed"],
+                "failed": self.outcomes["failed"],
+                "cancelled": self.outcomes["cancelled"],
+            }
+
+    def _finish(self, job_id: str, outcome: str) -> bool:
+        with self._lock:
+            if self._jobs.pop(job_id, None) is None:
+                return False
+            self.outcomes[outcome] += 1
+            return True
+
+
+job_registry = JobRegistry()
@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.jobs import job_registry
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CancelJobsOnDisconnectMiddleware:
+    """Cancels the BigQuery jobs of a session once its agent run request ends.
+
+    A run request that ends with jobs still registered for its session was
+    either abandoned by the client (closed tab, dropped SSE stream) or failed
+    part-way, so nothing will read those jobs' results anymore.
+    """
+
+    def __init__(
+        self, app: ASGIApp, paths: tuple[str, ...] = ("/run", "/run_sse")
+    ) -> None:
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the body up front to find the session, then replay it to the app.
+        messages: list[Message] = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            body += message.get("body", b"")
+            if message["type"] != "http.request" or not message.get("more_body"):
+                break
+
+        async def replay() -> Message:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        session_id = _session_id(body)
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            if session_id:
+                cancelled = await asyncio.shield(
+                    asyncio.to_thread(job_registry.cancel, session_id=session_id)
+                )
+                if cancelled:
+                    logger.info(
+                        "Cancelled %d BigQuery job(s) left running by session %s",
+                        cancelled,
+                        session_id,
+                    )
+
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by path and status.", ("path", "status")
+)
+http_in_flight = metrics.gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served, e.g. open /run_sse streams.",
+    ("path",),
+)
+http_latency = metrics.histogram(
+    "http_request_duration_seconds", "Time until the response was complete.", ("path",)
+)
+time_to_first_event = metrics.histogram(
+    "http_time_to_first_event_seconds",
+    "Time until the first non-empty response body, the first streamed event for /run_sse.",
+    ("path",),
+)
+
+
+class MetricsMiddleware:
+    """Records the concurrency, latency and time to first event of HTTP requests.
+
+    Only `paths` are labelled individually; other paths, which embed app,
+    user and session ids, are counted together as `other` to keep the number
+    of label values bounded.
+    """
+
+    def __init__(
+        self, app: ASGIApp, paths: tuple[str, ...] = ("/run", "/run_sse", "/metrics")
+    ) -> None:
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        started = time.perf_counter()
+        status = "500"
+        first_event = True
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, first_event
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif first_event and message.get("body"):
+                first_event = False
+                time_to_first_event.observe(time.perf_counter() - started, path=path)
+            await send(message)
+
+        http_in_flight.inc(path=path)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(path=path)
+            http_latency.observe(time.perf_counter() - started, path=path)
+            http_requests.inc(path=path, status=status)
+
+
+def _session_id(body: bytes) -> str | None:
+    try:
+        payload: Any = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    return payload.get("sessionId") or payload.get("session_id")
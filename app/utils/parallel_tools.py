@@ -0,0 +1,182 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+
+from app.utils.jobs import JOB_TIMEOUT_SECONDS
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Calls of one model response running at the same time.
+PARALLEL_TOOL_MAX_CONCURRENCY = int(
+    os.environ.get("PARALLEL_TOOL_MAX_CONCURRENCY", "4")
+)
+# A query may use the whole job timeout, plus the time to read its results.
+PARALLEL_TOOL_TIMEOUT_SECONDS = float(
+    os.environ.get("PARALLEL_TOOL_TIMEOUT_SECONDS", str(JOB_TIMEOUT_SECONDS + 60))
+)
+# Started calls that were never collected are forgotten past this many.
+_MAX_PENDING_CALLS = 1024
+
+# Called with the tool, arguments and tool context of a call when it starts.
+OnStart = Callable[[BaseTool, dict[str, Any], ToolContext], None]
+
+parallel_tool_calls = metrics.counter(
+    "parallel_tool_calls_total",
+    "Tool calls run concurrently with other calls of the same model response.",
+    ("tool",),
+)
+tool_call_timeouts = metrics.counter(
+    "parallel_tool_call_timeouts_total",
+    "Concurrent tool calls that timed out.",
+    ("tool",),
+)
+
+
+def _response_calls(tool_context: ToolContext) -> list[types.FunctionCall]:
+    """Returns the function calls of the model response holding the current call."""
+    for event in reversed(tool_context._invocation_context.session.events):
+        calls = event.get_function_calls()
+        if any(call.id == tool_context.function_call_id for call in calls):
+            return calls
+    return []
+
+
+class ParallelToolExecutor:
+    """Runs the function calls of one model response concurrently.
+
+    ADK executes the function calls of a model response one after another.
+    Installed as the last before tool callback of an agent, the executor
+    starts every call to one of `tools` in the response when the first of
+    them is reached, at most `max_concurrency` at a time, and waits for its
+    own result only. The callbacks of the following calls then return the
+    results of calls that already ran, so the calls take as long as the
+    slowest of them rather than their sum. Responses stay in the order of
+    the calls, and state changes made by a call are applied to its own
+    tool context when its result is collected.
+
+    A call that takes longer than `timeout` seconds is cancelled, which also
+    cancels its BigQuery job, and answered with an error. Tools only overlap
+    when they are coroutines, such as the `bigquery_async` tools.
+
+    Before tool callbacks earlier in the list see a call only when ADK
+    reaches it, after it may already have run. `on_start` is called when
+    the call actually starts instead, e.g. to time it.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_concurrency: int = PARALLEL_TOOL_MAX_CONCURRENCY,
+        timeout: float = PARALLEL_TOOL_TIMEOUT_SECONDS,
+        on_start: OnStart | None = None,
+    ) -> None:
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.on_start = on_start
+        self._pending: OrderedDict[str, tuple[asyncio.Task, ToolContext]] = (
+            OrderedDict()
+        )
+
+    async def before_tool_callback(
+        self, tool: BaseTool, args: dict[str, Any], tool_context: ToolContext
+    ) -> dict[str, Any] | None:
+        call_id = tool_context.function_call_id
+        if not call_id or tool.name not in self.tools:
+            return None
+        pending = self._pending.pop(call_id, None)
+        if pending is not None:
+            task, started_context = pending
+            result = await task
+            for key, value in started_context.actions.state_delta.items():
+                tool_context.state[key] = value
+            return result
+
+        calls = [
+            (call.id, call.name, call.args or {})
+            for call in _response_calls(tool_context)
+            if call.id and call.name and call.name in self.tools
+        ]
+        if len(calls) < 2 or all(id_ != call_id for id_, _, _ in calls):
+            return None
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        own: asyncio.Task | None = None
+        others: list[asyncio.Task] = []
+        # Tasks are created in the order of the calls, so they acquire the semaphore in that order.
+        for id_, name, call_args in calls:
+            parallel_tool_calls.inc(tool=name)
+            if id_ == call_id:
+                own = asyncio.create_task(
+                    self._run(semaphore, tool, args, tool_context)
+                )
+                continue
+            context = ToolContext(
+                tool_context._invocation_context, function_call_id=id_
+            )
+            task = asyncio.create_task(
+                self._run(semaphore, self.tools[name], call_args, context)
+            )
+            others.append(task)
+            self._add_pending(id_, task, context)
+        logger.debug("Running %d tool calls concurrently", len(calls))
+        assert own is not None
+        try:
+            return await own
+        except asyncio.CancelledError:
+            for task in others:
+                task.cancel()
+            raise
+
+    async def _run(
+        self,
+        semaphore: asyncio.Semaphore,
+        tool: BaseTool,
+        args: dict[str, Any],
+        tool_context: ToolContext,
+    ) -> dict[str, Any]:
+        async with semaphore:
+            if self.on_start is not None:
+                self.on_start(tool, args, tool_context)
+            try:
+                result = await asyncio.wait_for(
+                    tool.run_async(args=args, tool_context=tool_context), self.timeout
+                )
+            except asyncio.TimeoutError:
+                tool_call_timeouts.inc(tool=tool.name)
+                logger.warning("%s timed out after %g seconds", tool.name, self.timeout)
+                return {
+                    "error": f"{tool.name} did not finish within {self.timeout:g} seconds."
+                }
+        # An empty response would make ADK call the tool again.
+        if isinstance(result, dict) and result:
+            return result
+        return {"result": result}
+
+    def _add_pending(
+        self, call_id: str, task: asyncio.Task, tool_context: ToolContext
+    ) -> None:
+        self._pending[call_id] = (task, tool_context)
+        while len(self._pending) > _MAX_PENDING_CALLS:
+            _, (evicted, _) = self._pending.popitem(last=False)
+            evicted.cancel()
@@ -0,0 +1,216 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import logging
+import os
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.cache import TTLCache
+from app.utils.jobs import query_job_config
+
+logger = logging.getLogger(__name__)
+
+# Tables larger than this are profiled from a TABLESAMPLE of about this size, and
+# views, which cannot be sampled, are only profiled if they scan at most this much.
+PROFILE_SAMPLE_BYTES = int(
+    os.environ.get("BIGQUERY_PROFILE_SAMPLE_BYTES", str(64 * 1024 * 1024))
+)
+PROFILE_MAX_COLUMNS = int(os.environ.get("BIGQUERY_PROFILE_MAX_COLUMNS", "50"))
+PROFILE_TOP_VALUES = 5
+PROFILE_CACHE_TTL_SECONDS = float(
+    os.environ.get("BIGQUERY_PROFILE_CACHE_TTL_SECONDS", "86400")
+)
+# Long strings in min/max/top values are cut to this many characters.
+MAX_VALUE_LENGTH = 100
+
+# Types supported by APPROX_COUNT_DISTINCT and APPROX_TOP_COUNT.
+_GROUPABLE_TYPES = {
+    "STRING",
+    "INTEGER",
+    "INT64",
+    "NUMERIC",
+    "BIGNUMERIC",
+    "BOOLEAN",
+    "BOOL",
+    "DATE",
+    "DATETIME",
+    "TIME",
+    "TIMESTAMP",
+}
+# Types supported by MIN and MAX.
+_ORDERABLE_TYPES = _GROUPABLE_TYPES | {"FLOAT", "FLOAT64"}
+# Table types TABLESAMPLE can read.
+_SAMPLEABLE_TABLE_TYPES = ("TABLE", "MATERIALIZED_VIEW")
+
+
+def _sample_clause(table: bigquery.Table) -> tuple[str, str]:
+    """Returns the FROM clause that samples `table` and a description of the sample."""
+    name = f"`{table.project}.{table.dataset_id}.{table.table_id}`"
+    if table.table_type not in _SAMPLEABLE_TABLE_TYPES:
+        # A LIMIT would not reduce the bytes a view scans, so views are read in full.
+        return name, "all rows"
+    if not table.num_bytes or table.num_bytes <= PROFILE_SAMPLE_BYTES:
+        return name, "full table"
+    percent = max(100 * PROFILE_SAMPLE_BYTES / table.num_bytes, 0.001)
+    return (
+        f"{name} TABLESAMPLE SYSTEM ({percent:.3f} PERCENT)",
+        f"{percent:.3f}% of blocks",
+    )
+
+
+def profile_query(table: bigquery.Table, fields: Sequence[bigquery.SchemaField]) -> str:
+    """Builds a single query that profiles every one of `fields` over a sample of `table`."""
+    source, _ = _sample_clause(table)
+    expressions = ["COUNT(*) AS sampled_rows"]
+    for i, field in enumerate(fields):
+        column = f"`{field.name}`"
+        expressions.append(f"COUNTIF({column} IS NULL) AS c{i}_nulls")
+        if field.field_type in _GROUPABLE_TYPES:
+            expressions.append(f"APPROX_COUNT_DISTINCT({column}) AS c{i}_distinct")
+            expressions.append(
+                f"APPROX_TOP_COUNT({column}, {PROFILE_TOP_VALUES}) AS c{i}_top"
+            )
+        if field.field_type in _ORDERABLE_TYPES:
+            expressions.append(f"MIN({column}) AS c{i}_min")
+            expressions.append(f"MAX({column}) AS c{i}_max")
+    select = ",\n  ".join(expressions)
+    return f"SELECT\n  {select}\nFROM {source}"
+
+
+def _value(value: Any) -> Any:
+    """Makes a profiled value JSON serializable and short."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)[:MAX_VALUE_LENGTH]
+
+
+def _column_profile(
+    row: Any, i: int, field: bigquery.SchemaField, sampled_rows: int
+) -> dict[str, Any]:
+    values = dict(row)
+    profile: dict[str, Any] = {
+        "name": field.name,
+        "type": field.field_type,
+        "null_fraction": (
+            round(values[f"c{i}_nulls"] / sampled_rows, 4) if sampled_rows else None
+        ),
+    }
+    if f"c{i}_distinct" in values:
+        profile["approx_distinct"] = values[f"c{i}_distinct"]
+        profile["top_values"] = [
+            {"value": _value(top["value"]), "count": top["count"]}
+            for top in values[f"c{i}_top"]
+            if top["value"] is not None
+        ]
+    if f"c{i}_min" in values:
+        profile["min"] = _value(values[f"c{i}_min"])
+        profile["max"] = _value(values[f"c{i}_max"])
+    return profile
+
+
+class TableProfiler:
+    """Computes and caches approximate column statistics of BigQuery tables.
+
+    Statistics come from one aggregate query over a `TABLESAMPLE SYSTEM`
+    sample using APPROX_* functions, so profiling a large table scans about
+    `PROFILE_SAMPLE_BYTES` rather than the whole table. Views are dry-run
+    first and only profiled if they scan at most as much. Profiles are cached
+    per table and columns, and are recomputed when the table's last
+    modification time moves.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], bigquery.Client],
+        cache: TTLCache | None = None,
+    ) -> None:
+        self._client_factory = client_factory
+        # An empty cache is falsy, so it is compared with None.
+        self.cache = (
+            cache
+            if cache is not None
+            else TTLCache(maxsize=256, ttl=PROFILE_CACHE_TTL_SECONDS)
+        )
+
+    def profile(
+        self, dataset_id: str, table_id: str, columns: Sequence[str] | None = None
+    ) -> dict[str, Any]:
+        """Returns the profile of `columns` (by default all) of `dataset_id.table_id`."""
+        client = self._client_factory()
+        table = client.get_table(client.dataset(dataset_id).table(table_id))
+        key = (dataset_id, table_id, tuple(columns or ()))
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == table.modified:
+            return cached[1]
+        profile = self._compute(client, table, columns)
+        self.cache.set(key, (table.modified, profile))
+        return profile
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats()
+
+    def _compute(
+        self,
+        client: bigquery.Client,
+        table: bigquery.Table,
+        columns: Sequence[str] | None,
+    ) -> dict[str, Any]:
+        fields = [
+            f
+            for f in table.schema
+            if f.mode != "REPEATED" and f.field_type in _ORDERABLE_TYPES
+        ]
+        if columns:
+            wanted = {c.lower() for c in columns}
+            fields = [f for f in fields if f.name.lower() in wanted]
+        fields = fields[:PROFILE_MAX_COLUMNS]
+        profile: dict[str, Any] = {
+            "table": f"{table.dataset_id}.{table.table_id}",
+            "total_rows": table.num_rows,
+            "sample": _sample_clause(table)[1],
+        }
+        if not fields:
+            return {**profile, "sampled_rows": 0, "columns": []}
+        sql = profile_query(table, fields)
+        if table.table_type not in _SAMPLEABLE_TABLE_TYPES:
+            dry_run = client.query(
+                sql,
+                job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False),
+            )
+            if (dry_run.total_bytes_processed or 0) > PROFILE_SAMPLE_BYTES:
+                return {
+                    **profile,
+                    "error": (
+                        f"Profiling this {table.table_type.lower()} would scan "
+                        f"{dry_run.total_bytes_processed} bytes, more than the "
+                        f"{PROFILE_SAMPLE_BYTES} allowed. Profile the tables it reads instead."
+                    ),
+                }
+        logger.info("Profiling %s with query: %s", profile["table"], sql)
+        row = next(iter(client.query(sql, job_config=query_job_config()).result()))
+        sampled_rows = row["sampled_rows"]
+        return {
+            **profile,
+            "sampled_rows": sampled_rows,
+            "columns": [
+                _column_profile(row, i, field, sampled_rows)
+                for i, field in enumerate(fields)
+            ],
+        }
@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.cache import TTLCache
+from app.utils.sql import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(
+    os.environ.get("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("QUERY_CACHE_TTL_SECONDS", "3600"))
+
+_NONDETERMINISTIC_RE = re.compile(
+    r"\b(current_date|current_datetime|current_time|current_timestamp|rand"
+    r"|generate_uuid|session_user)\b",
+    re.IGNORECASE,
+)
+
+# Only these types have a `modified` time that changes whenever their data does.
+_VERSIONED_TABLE_TYPES = ("TABLE", "MATERIALIZED_VIEW")
+
+TableVersions = Callable[[Sequence[str]], dict[str, datetime.datetime | None]]
+
+
+@dataclass(frozen=True)
+class _Entry:
+    result: dict[str, Any]
+    versions: dict[str, datetime.datetime | None]
+    total_bytes_processed: int
+    size: int
+
+
+def table_version(table: bigquery.Table) -> datetime.datetime | None:
+    """Returns the last modification time of `table`, or None if it is unreliable.
+
+    External tables and tables with a streaming buffer can change without
+    their modification time moving, so their results are never cached.
+    """
+    if table.table_type not in _VERSIONED_TABLE_TYPES or table.streaming_buffer:
+        return None
+    return table.modified
+
+
+class QueryResultCache:
+    """Application-level cache of query results, shared by every session.
+
+    Entries are keyed by the normalized SQL text and remember the last
+    modification time of every table the query read. On lookup those times
+    are fetched again and the entry is dropped if any table changed, so a hit
+    never returns stale data. Entries are bounded in count and total size and
+    evicted least recently used first.
+    """
+
+    def __init__(
+        self,
+        table_versions: TableVersions,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._table_versions = table_versions
+        self.cache = TTLCache(
+            maxsize=max_entries,
+            ttl=ttl,
+            max_bytes=max_bytes,
+            sizeof=lambda entry: entry.size,
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.bytes_saved = 0
+
+    def get(self, sql: str) -> dict[str, Any] | None:
+        """Returns the cached result of `sql` if none of its tables changed."""
+        key = normalize_sql(sql)
+        entry = self.cache.get(key, record=False)
+        if (
+            entry is not None
+            and self._table_versions(list(entry.versions)) != entry.versions
+        ):
+            logger.info("Cached result is stale, a referenced table changed")
+            self.cache.invalidate(key)
+            with self._lock:
+                self.stale += 1
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_saved += entry.total_bytes_processed
+        return entry.result
+
+    def put(
+        self, sql: str, query_job: bigquery.QueryJob, result: dict[str, Any]
+    ) -> None:
+        """Caches `result` of the finished `query_job` if it is safe to reuse."""
+        if query_job.statement_type != "SELECT" or _NONDETERMINISTIC_RE.search(sql):
+            return
+        tables = [
+            f"{ref.project}.{ref.dataset_id}.{ref.table_id}"
+            for ref in query_job.referenced_tables
+        ]
+        if not tables:
+            return
+        versions = self._table_versions(tables)
+        started = query_job.started
+        for version in versions.values():
+            # A table modified after the job started may not match the result.
+            if version is None or (started is not None and version > started):
+                return
+        self.cache.set(
+            normalize_sql(sql),
+            _Entry(
+                result=result,
+                versions=versions,
+                total_bytes_processed=query_job.total_bytes_processed or 0,
+                size=len(json.dumps(result, default=str)),
+            ),
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the hit rate, bytes saved and size of the cache."""
+        cache_stats = self.cache.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "entries": cache_stats["size"],
+                "bytes": cache_stats["bytes"],
+                "evictions": cache_stats["evictions"],
+            }
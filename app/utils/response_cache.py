@@ -0,0 +1,251 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from google.adk.tools import BaseTool, ToolContext
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import Sample
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_BACKEND = os.environ.get("SEARCH_CACHE_BACKEND", "memory")
+# The SQLite file of the "sqlite" backend, on storage that outlives the process.
+SEARCH_CACHE_PATH = os.environ.get("SEARCH_CACHE_PATH")
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_request(request: str) -> str:
+    """Normalizes a question so trivially different phrasings share a cache key."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", request.lower()).split())
+
+
+class ResponseCacheBackend(abc.ABC):
+    """Storage of a response cache. Values are JSON-serializable dicts.
+
+    Backends may block; `ResponseCache` calls them from a worker thread.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Returns the value stored under `key`, or None if absent or expired."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        """Stores `value` under `key`."""
+
+
+class MemoryBackend(ResponseCacheBackend):
+    """Keeps responses in process memory, evicting the least recently used."""
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.cache = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        self.cache.set(key, value)
+
+
+class SqliteBackend(ResponseCacheBackend):
+    """Keeps responses in a local SQLite file, so they survive restarts.
+
+    Stands in for a shared store such as Redis: any backend implementing
+    `get` and `set` can be passed to `ResponseCache`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL_SECONDS,
+        timer: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = self._timer()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        now = self._timer()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+
+class ResponseCache:
+    """Answers repeated delegations to an agent tool from a cache.
+
+    Installed as a before and after tool callback of the calling agent. On a
+    hit, the before callback returns the cached answer, which skips the
+    delegated agent entirely, and restores the grounding sources it had into
+    `search_sources`. Answers are keyed by the normalized `request` argument.
+    The backend is called from a worker thread, so that a backend doing I/O
+    does not block the event loop.
+    """
+
+    def __init__(
+        self,
+        tool_name: str,
+        backend: ResponseCacheBackend | None = None,
+        sources_key: str = "search_sources",
+    ) -> None:
+        self.tool_name = tool_name
+        self.backend = backend or MemoryBackend()
+        self.sources_key = sources_key
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def before_tool_callback(
+        self, tool: BaseTool, args: dict[str, Any], tool_context: ToolContext
+    ) -> dict[str, Any] | None:
+        if tool.name != self.tool_name or not args.get("request"):
+            return None
+        cached = await asyncio.to_thread(self.backend.get, _key(args["request"]))
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        logger.info("Answered %s from the response cache", self.tool_name)
+        tool_context.state[self.sources_key] = cached["sources"]
+        return {"result": cached["answer"], "cached": True}
+
+    async def after_tool_callback(
+        self,
+        tool: BaseTool,
+        args: dict[str, Any],
+        tool_context: ToolContext,
+        tool_response: Any,
+    ) -> None:
+        if tool.name != self.tool_name or not args.get("request"):
+            return
+        if isinstance(tool_response, dict) or not tool_response:
+            # Cache hits, errors and empty answers are not stored.
+            return
+        await asyncio.to_thread(
+            self.backend.set,
+            _key(args["request"]),
+            {
+                "answer": tool_response,
+                "sources": tool_context.state.get(self.sources_key) or [],
+            },
+        )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def samples(self) -> list[Sample]:
+        """Reports the hits and misses of the cache to /metrics."""
+        stats = self.stats()
+        labels = {"cache": self.tool_name}
+        return [
+            Sample(
+                "cache_hits_total",
+                "Cache hits, by cache.",
+                "counter",
+                labels,
+                stats["hits"],
+            ),
+            Sample(
+                "cache_misses_total",
+                "Cache misses, by cache.",
+                "counter",
+                labels,
+                stats["misses"],
+            ),
+            Sample(
+                "cache_hit_ratio",
+                "Hit ratio of each cache.",
+                "gauge",
+                labels,
+                stats["hit_rate"],
+            ),
+        ]
+
+
+def _key(request: str) -> str:
+    return hashlib.sha256(normalize_request(request).encode()).hexdigest()
+
+
+def create_backend() -> ResponseCacheBackend:
+    """Returns the backend selected by `SEARCH_CACHE_BACKEND` ("memory" or "sqlite").
+
+    The SQLite backend is only used with an explicit `SEARCH_CACHE_PATH`, so the
+    cache never lands in whatever directory the server happens to start in.
+    """
+    if SEARCH_CACHE_BACKEND == "sqlite":
+        if SEARCH_CACHE_PATH:
+            return SqliteBackend(SEARCH_CACHE_PATH)
+        logger.warning(
+            "SEARCH_CACHE_PATH is not set, keeping search responses in memory"
+        )
+    return MemoryBackend()
@@ -0,0 +1,227 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import uuid
+from collections.abc import Iterable
+from typing import Any, NamedTuple
+
+import google.cloud.storage as storage
+import polars as pl
+
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Results larger than either threshold are stored instead of returned inline.
+SPILL_THRESHOLD_ROWS = int(os.environ.get("RESULT_SPILL_THRESHOLD_ROWS", "50"))
+SPILL_THRESHOLD_BYTES = int(os.environ.get("RESULT_SPILL_THRESHOLD_BYTES", "16384"))
+PREVIEW_ROWS = int(os.environ.get("RESULT_PREVIEW_ROWS", "10"))
+# Results longer than this are stored up to it and marked truncated.
+RESULT_STORE_MAX_ROWS = int(os.environ.get("RESULT_STORE_MAX_ROWS", "1000000"))
+MAX_PAGE_ROWS = 200
+
+# Result ids are uuid4 hex strings; anything else is never a stored result.
+_RESULT_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+class StoredResult(NamedTuple):
+    """A stored result, with the size of the full result it was read from."""
+
+    frame: pl.DataFrame
+    total_rows: int | None
+    truncated: bool
+
+
+class ResultStore(abc.ABC):
+    """Stores query results as Parquet and reads them back as DataFrames.
+
+    Each result is a Parquet object with a small JSON object next to it,
+    holding the row count of the full result and whether it was truncated.
+    Subclasses only implement how these objects are written and read.
+    Recently read results are kept in memory so paging through a result
+    does not download it again.
+    """
+
+    def __init__(self) -> None:
+        self._frames = TTLCache(maxsize=16, ttl=600)
+
+    def put(
+        self,
+        rows: Iterable[Any],
+        total_rows: int | None = None,
+        max_rows: int = RESULT_STORE_MAX_ROWS,
+    ) -> tuple[str, StoredResult]:
+        """Stores up to `max_rows` of `rows` and returns the new result id and the result.
+
+        Args:
+            rows: The rows to store, each convertible with `dict()`. They are
+                read lazily, so a BigQuery `RowIterator` is paged through only
+                up to `max_rows`.
+            total_rows: The size of the full result, if known. The result is
+                marked truncated when fewer rows than this are stored.
+            max_rows: Rows past this are left out.
+        """
+        records = [dict(row) for row in itertools.islice(rows, max_rows + 1)]
+        df = pl.DataFrame(records[:max_rows], infer_schema_length=None)
+        if total_rows is None and len(records) <= max_rows:
+            total_rows = df.height
+        truncated = total_rows is None or total_rows > df.height
+        stored = StoredResult(df, total_rows, truncated)
+        buffer = io.BytesIO()
+        df.write_parquet(buffer)
+        result_id = uuid.uuid4().hex
+        self._write(f"{result_id}.parquet", buffer.getvalue())
+        info = {"total_rows": total_rows, "truncated": truncated}
+        self._write(f"{result_id}.json", json.dumps(info).encode())
+        self._frames.set(result_id, stored)
+        return result_id, stored
+
+    def get(self, result_id: str) -> StoredResult:
+        """Returns the stored result `result_id`.
+
+        Raises:
+            KeyError: If no result with that id exists.
+        """
+        if not _RESULT_ID_RE.fullmatch(result_id):
+            raise KeyError(result_id)
+        return self._frames.get_or_load(result_id, lambda: self._load(result_id))
+
+    def _load(self, result_id: str) -> StoredResult:
+        info = json.loads(self._read(f"{result_id}.json"))
+        df = pl.read_parquet(io.BytesIO(self._read(f"{result_id}.parquet")))
+        return StoredResult(df, info["total_rows"], info["truncated"])
+
+    @abc.abstractmethod
+    def _write(self, name: str, data: bytes) -> None:
+        """Writes an object of a new result."""
+
+    @abc.abstractmethod
+    def _read(self, name: str) -> bytes:
+        """Reads an object of a result, raising KeyError if it does not exist."""
+
+
+class LocalResultStore(ResultStore):
+    """Stores results as Parquet files in a local directory."""
+
+    def __init__(self, directory: str) -> None:
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, name: str, data: bytes) -> None:
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(data)
+
+    def _read(self, name: str) -> bytes:
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise KeyError(name) from e
+
+
+class GcsResultStore(ResultStore):
+    """Stores results as Parquet objects in the artifacts bucket."""
+
+    def __init__(self, bucket_name: str, prefix: str = "query-results") -> None:
+        super().__init__()
+        self.bucket = storage.Client().bucket(bucket_name)
+        self.prefix = prefix
+
+    def _write(self, name: str, data: bytes) -> None:
+        content_type = (
+            "application/json"
+            if name.endswith(".json")
+            else "application/vnd.apache.parquet"
+        )
+        self.bucket.blob(f"{self.prefix}/{name}").upload_from_string(data, content_type)
+
+    def _read(self, name: str) -> bytes:
+        blob = self.bucket.blob(f"{self.prefix}/{name}")
+        if not blob.exists():
+            raise KeyError(name)
+        return blob.download_as_bytes()
+
+
+def create_result_store() -> ResultStore:
+    """Returns a GCS-backed store if RESULT_STORE_BUCKET is set, else a local one."""
+    bucket_name = os.environ.get("RESULT_STORE_BUCKET")
+    if bucket_name:
+        return GcsResultStore(bucket_name)
+    directory = os.environ.get(
+        "RESULT_STORE_DIR",
+        os.path.join(tempfile.gettempdir(), "analytics-agent-results"),
+    )
+    return LocalResultStore(directory)
+
+
+def should_spill(rows_returned: int, bytes_returned: int) -> bool:
+    """Returns whether a result is too large to hand to the model inline."""
+    return (
+        rows_returned > SPILL_THRESHOLD_ROWS or bytes_returned > SPILL_THRESHOLD_BYTES
+    )
+
+
+def summarize(df: pl.DataFrame) -> dict[str, dict[str, Any]]:
+    """Returns per-column summary statistics of `df`."""
+    stats: dict[str, dict[str, Any]] = {}
+    for name, dtype in df.schema.items():
+        column = df.get_column(name)
+        entry: dict[str, Any] = {"type": str(dtype), "nulls": column.null_count()}
+        if dtype.is_numeric():
+            entry.update(min=column.min(), max=column.max(), mean=column.mean())
+        elif dtype.is_temporal():
+            entry.update(min=column.min(), max=column.max())
+        else:
+            entry["distinct"] = column.n_unique()
+        stats[name] = entry
+    return stats
+
+
+def query_frame(
+    df: pl.DataFrame, sql: str = "", offset: int = 0, limit: int = 50
+) -> dict[str, Any]:
+    """Runs `sql` (if any) over `df`, exposed as the table `result`, and returns a page.
+
+    Args:
+        df: The stored result.
+        sql: Optional Polars SQL over the table `result`, e.g. to filter or aggregate.
+        offset: The first row of the page.
+        limit: The number of rows in the page, at most MAX_PAGE_ROWS.
+
+    Returns:
+        The page of rows with the total row count of the (transformed) result, or
+        an `error` if `sql` cannot be run.
+    """
+    if sql:
+        try:
+            df = pl.SQLContext(frames={"result": df}).execute(sql, eager=True)
+        except (pl.exceptions.PolarsError, pl.exceptions.PolarsPanicError) as e:
+            return {"error": f"Could not run the SQL over the stored result: {e}"}
+    limit = max(0, min(limit, MAX_PAGE_ROWS))
+    page = df.slice(offset, limit)
+    return {
+        "rows": page.to_dicts(),
+        "total_rows": df.height,
+        "offset": offset,
+        "rows_returned": page.height,
+    }
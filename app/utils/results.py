@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+MAX_RESULT_ROWS = int(os.environ.get("BIGQUERY_MAX_RESULT_ROWS", "1000"))
+MAX_RESULT_BYTES = int(os.environ.get("BIGQUERY_MAX_RESULT_BYTES", str(1024 * 1024)))
+RESULT_PAGE_SIZE = int(os.environ.get("BIGQUERY_RESULT_PAGE_SIZE", "500"))
+
+
+@dataclass
+class BoundedResult:
+    """The rows of a query result read up to a row and byte cap."""
+
+    rows: list[dict[str, Any]] = field(default_factory=list)
+    total_rows: int | None = None
+    bytes_returned: int = 0
+    truncated: bool = False
+
+    @property
+    def rows_returned(self) -> int:
+        return len(self.rows)
+
+    def to_dict(self) -> dict[str, Any]:
+        result = asdict(self)
+        result["rows_returned"] = self.rows_returned
+        return result
+
+
+def row_size(row: dict[str, Any]) -> int:
+    """Returns the approximate serialized size of a row, in bytes."""
+    return len(json.dumps(row, default=str).encode())
+
+
+def read_bounded(
+    rows: Iterable[Any],
+    max_rows: int = MAX_RESULT_ROWS,
+    max_bytes: int = MAX_RESULT_BYTES,
+    total_rows: int | None = None,
+) -> BoundedResult:
+    """Reads rows lazily until the row or byte cap is reached.
+
+    `rows` is typically a BigQuery `RowIterator`, which fetches one page at a
+    time as it is iterated, so stopping early also stops fetching pages.
+
+    Args:
+        rows: The rows to read. Each must be convertible with `dict()`.
+        max_rows: Maximum number of rows to return.
+        max_bytes: Maximum serialized size of the returned rows.
+        total_rows: The size of the full result, if known.
+
+    Returns:
+        The rows read and whether the result was truncated.
+    """
+    result = BoundedResult(total_rows=total_rows)
+    for row in rows:
+        record = dict(row)
+        size = row_size(record)
+        if result.rows_returned >= max_rows or result.bytes_returned + size > max_bytes:
+            result.truncated = True
+            break
+        result.rows.append(record)
+        result.bytes_returned += size
+    if result.total_rows is None and not result.truncated:
+        result.total_rows = result.rows_returned
+    return result
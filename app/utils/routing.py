@@ -0,0 +1,213 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRO_MODEL = os.environ.get("ROUTER_PRO_MODEL", "gemini-2.5-pro")
+FLASH_MODEL = os.environ.get("ROUTER_FLASH_MODEL", "gemini-2.5-flash")
+MODEL_ROUTING_ENABLED = (
+    os.environ.get("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+)
+# Model calls that never completed are forgotten past this many.
+_MAX_PENDING_CALLS = 1024
+
+_MODEL_ALIASES = {"pro": PRO_MODEL, "flash": FLASH_MODEL}
+
+model_calls = metrics.counter(
+    "model_calls_total",
+    "Model calls by agent, route and model.",
+    ("agent", "route", "model"),
+)
+model_latency = metrics.histogram(
+    "model_call_duration_seconds", "Model call latency.", ("agent", "route", "model")
+)
+model_tokens = metrics.counter(
+    "model_tokens_total",
+    "Prompt and output tokens by agent, route and model.",
+    ("agent", "route", "model", "kind"),
+)
+
+
+@dataclass(frozen=True)
+class RouteRule:
+    """Sends the next model call to `model` when the last tool responses match.
+
+    A rule matches when the most recent content holds function responses,
+    every one of them is from a tool in `after_tools`, and they all failed
+    (`on_error`) or all succeeded.
+    """
+
+    name: str
+    model: str
+    after_tools: tuple[str, ...]
+    on_error: bool = False
+
+    def matches(self, responses: Sequence[types.FunctionResponse]) -> bool:
+        if not responses:
+            return False
+        return all(
+            r.name in self.after_tools and _failed(r) == self.on_error
+            for r in responses
+        )
+
+
+_QUERY_TOOLS = ("run_query", "execute_query", "dry_run_query", "query_stored_result")
+
+# SQL repair stays on the pro model; picking from the catalog and formatting
+# results go to flash. Everything else, notably writing SQL after reading
+# schemas and answering a new user message, uses the agent's default model.
+DEFAULT_RULES = (
+    RouteRule("sql_repair", PRO_MODEL, _QUERY_TOOLS, on_error=True),
+    RouteRule(
+        "catalog",
+        FLASH_MODEL,
+        (
+            "list_datasets_with_queryable_resources",
+            "list_queryable_resources_in_project",
+            "search_catalog",
+        ),
+    ),
+    RouteRule("format_results", FLASH_MODEL, _QUERY_TOOLS),
+)
+
+
+def _failed(response: types.FunctionResponse) -> bool:
+    return isinstance(response.response, dict) and "error" in response.response
+
+
+def load_rules(value: str | None = None) -> tuple[RouteRule, ...]:
+    """Reads routing rules from JSON, e.g. from the `MODEL_ROUTING_RULES` variable.
+
+    The JSON is a list of objects with `name`, `model` ("pro", "flash" or a
+    model name), `after_tools` and optionally `on_error`. Without a value the
+    default rules are used.
+    """
+    value = value if value is not None else os.environ.get("MODEL_ROUTING_RULES")
+    if not value:
+        return DEFAULT_RULES
+    return tuple(
+        RouteRule(
+            name=rule["name"],
+            model=_MODEL_ALIASES.get(rule["model"], rule["model"]),
+            after_tools=tuple(rule["after_tools"]),
+            on_error=rule.get("on_error", False),
+        )
+        for rule in json.loads(value)
+    )
+
+
+class ModelRouter:
+    """Chooses the model of each call of an agent and records per-route metrics.
+
+    Installed as both the before and after model callback of an agent. Before
+    each call, the first rule matching the latest tool responses sets the
+    request's model; otherwise `default_model` is used. After the call, its
+    latency and token usage are recorded under the route's name, so the
+    savings of the flash routes can be compared with the default route. When
+    disabled, the agent's own model is kept and only the metrics are recorded.
+    """
+
+    def __init__(
+        self,
+        default_model: str = PRO_MODEL,
+        rules: Sequence[RouteRule] = DEFAULT_RULES,
+        default_route: str = "default",
+        enabled: bool = MODEL_ROUTING_ENABLED,
+    ) -> None:
+        self.default_model = default_model
+        self.rules = tuple(rules)
+        self.default_route = default_route
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pending: OrderedDict[tuple[str, str], tuple[float, str, str]] = (
+            OrderedDict()
+        )
+
+    def route(self, contents: Sequence[types.Content]) -> tuple[str, str]:
+        """Returns the route name and model for a request with `contents`."""
+        if contents:
+            responses = [
+                p.function_response
+                for p in contents[-1].parts or []
+                if p.function_response
+            ]
+            for rule in self.rules:
+                if rule.matches(responses):
+                    return rule.name, rule.model
+        return self.default_route, self.default_model
+
+    def before_model_callback(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        if self.enabled:
+            route, llm_request.model = self.route(llm_request.contents)
+        else:
+            route = self.default_route
+        model = llm_request.model or ""
+        with self._lock:
+            self._pending[_call_key(callback_context)] = (
+                time.perf_counter(),
+                route,
+                model,
+            )
+            if len(self._pending) > _MAX_PENDING_CALLS:
+                self._pending.popitem(last=False)
+        logger.debug(
+            "Routing %s model call to %s (%s)",
+            callback_context.agent_name,
+            model,
+            route,
+        )
+
+    def after_model_callback(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        if llm_response.partial:
+            return
+        with self._lock:
+            pending = self._pending.pop(_call_key(callback_context), None)
+        if pending is None:
+            return
+        started, route, model = pending
+        labels: dict[str, Any] = {
+            "agent": callback_context.agent_name,
+            "route": route,
+            "model": model,
+        }
+        model_calls.inc(**labels)
+        model_latency.observe(time.perf_counter() - started, **labels)
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            model_tokens.inc(usage.prompt_token_count or 0, kind="prompt", **labels)
+            model_tokens.inc(usage.candidates_token_count or 0, kind="output", **labels)
+
+
+def _call_key(callback_context: CallbackContext) -> tuple[str, str]:
+    return callback_context.invocation_id, callback_context.agent_name
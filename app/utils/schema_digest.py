@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+from collections.abc import Iterable, Sequence
+from typing import Any, NamedTuple
+
+from google.cloud import bigquery
+
+from app.utils.search_index import tokenize, trigrams
+
+# Wide tables are pruned to this many columns when a question is given.
+SCHEMA_DIGEST_MAX_COLUMNS = int(os.environ.get("SCHEMA_DIGEST_MAX_COLUMNS", "60"))
+
+# Legacy SQL type names, as reported by the API, mapped to GoogleSQL names.
+_TYPE_NAMES = {
+    "INTEGER": "INT64",
+    "FLOAT": "FLOAT64",
+    "BOOLEAN": "BOOL",
+    "RECORD": "STRUCT",
+}
+
+_TOKEN_ESTIMATE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+class Column(NamedTuple):
+    """A leaf column, with nested fields flattened into a dotted path."""
+
+    path: str
+    type: str
+    description: str = ""
+
+
+def flatten_schema(
+    fields: Iterable[bigquery.SchemaField], prefix: str = ""
+) -> list[Column]:
+    """Flattens nested RECORD fields into dotted leaf paths.
+
+    Repeated leaves are typed `ARRAY<...>` and repeated records are marked
+    with `[]` in the path of their children, e.g. `items[].sku`.
+    """
+    columns = []
+    for field in fields:
+        path = f"{prefix}{field.name}"
+        repeated = field.mode == "REPEATED"
+        if field.field_type in ("RECORD", "STRUCT") and field.fields:
+            suffix = "[]." if repeated else "."
+            columns.extend(flatten_schema(field.fields, prefix=path + suffix))
+            continue
+        type_name = _TYPE_NAMES.get(field.field_type, field.field_type)
+        if repeated:
+            type_name = f"ARRAY<{type_name}>"
+        columns.append(Column(path, type_name, field.description or ""))
+    return columns
+
+
+def partition_column(table: bigquery.Table) -> str | None:
+    """Returns how `table` is partitioned, e.g. `event_date (DAY)`, if it is."""
+    if table.time_partitioning is not None:
+        field = table.time_partitioning.field or "_PARTITIONTIME"
+        return f"{field} ({table.time_partitioning.type_})"
+    if table.range_partitioning is not None:
+        return f"{table.range_partitioning.field} (RANGE)"
+    return None
+
+
+def _relevance(column: Column, question_terms: set[str]) -> float:
+    column_terms = set(tokenize(column.path)) | set(tokenize(column.description))
+    score = 0.0
+    for term in question_terms:
+        if term in column_terms:
+            score += 1.0
+            continue
+        grams = trigrams(term)
+        score += max(
+            (
+                len(grams & trigrams(other)) / len(grams | trigrams(other))
+                for other in column_terms
+            ),
+            default=0.0,
+        )
+    return score
+
+
+def prune_columns(
+    columns: Sequence[Column],
+    question: str,
+    max_columns: int,
+    keep: Iterable[str] = (),
+) -> list[Column]:
+    """Keeps the `max_columns` columns most relevant to `question`.
+
+    Columns named in `keep` (partition and clustering columns) always stay.
+    The original column order is preserved.
+    """
+    if len(columns) <= max_columns or not question:
+        return list(columns)
+    keep = set(keep)
+    question_terms = set(tokenize(question))
+    ranked = sorted(
+        range(len(columns)),
+        key=lambda i: (
+            columns[i].path not in keep,
+            -_relevance(columns[i], question_terms),
+            i,
+        ),
+    )
+    selected = set(ranked[:max_columns])
+    return [column for i, column in enumerate(columns) if i in selected]
+
+
+def schema_digest(
+    table: bigquery.Table,
+    question: str = "",
+    max_columns: int = SCHEMA_DIGEST_MAX_COLUMNS,
+) -> dict[str, Any]:
+    """Returns a token-compact description of the schema of `table`.
+
+    Columns are rendered one per line as `path TYPE`, DDL style, instead of
+    a list of objects that repeats its key names for every column.
+
+    Args:
+        table: The table, as returned by `client.get_table`.
+        question: The user's question. When given and the table has more
+            than `max_columns` columns, only the most relevant are kept.
+        max_columns: The column budget for pruning.
+
+    Returns:
+        A dictionary with the digest in `columns` and, if applicable, the
+        partitioning, clustering and number of pruned columns.
+    """
+    columns = flatten_schema(table.schema)
+    partitioned_by = partition_column(table)
+    clustered_by = list(table.clustering_fields or [])
+    keep = [*clustered_by]
+    if partitioned_by:
+        keep.append(partitioned_by.split(" ")[0])
+    selected = prune_columns(columns, question, max_columns, keep=keep)
+
+    digest: dict[str, Any] = {
+        "table": f"{table.dataset_id}.{table.table_id}",
+        "columns": "\n".join(f"{c.path} {c.type}" for c in selected),
+    }
+    if partitioned_by:
+        digest["partitioned_by"] = partitioned_by
+    if clustered_by:
+        digest["clustered_by"] = ", ".join(clustered_by)
+    if len(selected) < len(columns):
+        digest["omitted_columns"] = len(columns) - len(selected)
+    return digest
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the LLM tokens in `text`: words, numbers and symbols."""
+    return len(_TOKEN_ESTIMATE_RE.findall(text))
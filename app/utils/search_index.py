@@ -0,0 +1,199 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import re
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+_TOKEN_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+# How many times a term counts towards BM25 term frequency per field.
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# Minimum trigram similarity for a query word to match an unseen index term.
+FUZZY_MIN_SIMILARITY = 0.5
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits identifiers and prose into lowercase words.
+
+    snake_case, camelCase and dotted paths are split into their parts, so
+    `orderItems.unit_price` yields `order`, `items`, `unit`, `price`.
+    """
+    return [token.lower() for token in _TOKEN_RE.findall(text or "")]
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class TableDocument:
+    """The searchable metadata of one table."""
+
+    dataset_id: str
+    table_id: str
+    table_type: str = ""
+    description: str = ""
+    columns: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def resource(self) -> str:
+        return f"{self.dataset_id}.{self.table_id}"
+
+
+class CatalogSearchIndex:
+    """An in-memory BM25 index over table names, column names and descriptions.
+
+    Query words that do not appear in the index are matched to index terms
+    by trigram similarity, so partial or misspelled words still rank. A
+    separate exact column-name map answers "which tables have column X"
+    without touching BigQuery.
+    """
+
+    def __init__(
+        self, documents: Iterable[TableDocument], k1: float = 1.2, b: float = 0.75
+    ) -> None:
+        self.k1 = k1
+        self.b = b
+        self.documents: list[TableDocument] = []
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._lengths: list[int] = []
+        self._trigrams: dict[str, set[str]] = defaultdict(set)
+        self._column_terms: list[list[set[str]]] = []
+        self._columns_by_name: dict[str, list[tuple[int, str]]] = defaultdict(list)
+        for document in documents:
+            self._add(document)
+        self._avg_length = (
+            sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        )
+        for term in self._postings:
+            for gram in trigrams(term):
+                self._trigrams[gram].add(term)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _add(self, document: TableDocument) -> None:
+        doc_id = len(self.documents)
+        self.documents.append(document)
+        counts: Counter[str] = Counter()
+        for token in tokenize(document.table_id):
+            counts[token] += TABLE_NAME_WEIGHT
+        for token in tokenize(document.description):
+            counts[token] += DESCRIPTION_WEIGHT
+        column_terms = []
+        for column in document.columns:
+            name = column["name"]
+            name_terms = set(tokenize(name))
+            for token in name_terms:
+                counts[token] += COLUMN_NAME_WEIGHT
+            description_terms = tokenize(column.get("description") or "")
+            for token in description_terms:
+                counts[token] += DESCRIPTION_WEIGHT
+            column_terms.append(name_terms | set(description_terms))
+            self._columns_by_name[name.lower()].append((doc_id, name))
+        for term, count in counts.items():
+            self._postings[term][doc_id] = count
+        self._lengths.append(sum(counts.values()))
+        self._column_terms.append(column_terms)
+
+    def _expand(self, word: str) -> dict[str, float]:
+        """Maps a query word to index terms, weighted by similarity."""
+        if word in self._postings:
+            return {word: 1.0}
+        grams = trigrams(word)
+        candidates: Counter[str] = Counter()
+        for gram in grams:
+            for term in self._trigrams.get(gram, ()):
+                candidates[term] += 1
+        expanded = {}
+        for term, shared in candidates.items():
+            similarity = shared / len(grams | trigrams(term))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                expanded[term] = similarity
+        return expanded
+
+    def search(self, query: str, k: int = 10) -> list[dict[str, Any]]:
+        """Returns the `k` best matching tables for `query`.
+
+        Args:
+            query: Free text, e.g. "customer lifetime revenue".
+            k: Maximum number of tables to return.
+
+        Returns:
+            A list of dictionaries with the table, its score and the columns
+            whose name or description matched the query, best match first.
+        """
+        terms: dict[str, float] = {}
+        for word in set(tokenize(query)):
+            for term, weight in self._expand(word).items():
+                terms[term] = max(terms.get(term, 0.0), weight)
+        if not terms or not self.documents:
+            return []
+
+        total = len(self.documents)
+        scores: dict[int, float] = defaultdict(float)
+        for term, weight in terms.items():
+            postings = self._postings[term]
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (
+                    1 - self.b + self.b * self._lengths[doc_id] / self._avg_length
+                )
+                scores[doc_id] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        results = []
+        for doc_id, score in ranked:
+            document = self.documents[doc_id]
+            matching_columns = [
+                column["name"]
+                for column, column_terms in zip(
+                    document.columns, self._column_terms[doc_id], strict=True
+                )
+                if column_terms.intersection(terms)
+            ]
+            results.append(
+                {
+                    "table": document.resource,
+                    "table_type": document.table_type,
+                    "score": round(score, 3),
+                    "matching_columns": matching_columns,
+                }
+            )
+        return results
+
+    def tables_with_column(
+        self, column_name: str, dataset_id: str | None = None
+    ) -> list[str]:
+        """Returns the tables that have a column named `column_name`.
+
+        The match is case-insensitive. With `dataset_id`, only tables in that
+        dataset are returned, as bare table ids.
+        """
+        matches = self._columns_by_name.get(column_name.lower(), [])
+        if dataset_id is None:
+            return [self.documents[doc_id].resource for doc_id, _ in matches]
+        return [
+            self.documents[doc_id].table_id
+            for doc_id, _ in matches
+            if self.documents[doc_id].dataset_id == dataset_id
+        ]
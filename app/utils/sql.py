@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from collections.abc import Iterator
+from typing import NamedTuple
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    |(?P<string>[rRbB]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"))
+    |(?P<quoted_identifier>`(?:\\.|[^`\\])*`)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+    |(?P<word>[A-Za-z_][A-Za-z_0-9]*)
+    |(?P<whitespace>\s+)
+    |(?P<symbol>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Keywords are case-insensitive, unlike dataset and table names, so only these
+# are case-folded when normalizing.
+KEYWORDS = frozenset(
+    """
+    all and any array as asc assert_rows_modified at between by case cast collate
+    contains create cross cube current default define desc distinct else end enum
+    escape except exclude exists extract false fetch following for from full group
+    grouping groups hash having if ignore in inner intersect interval into is join
+    lateral left like limit lookup merge natural new no not null nulls of offset on
+    or order outer over partition preceding proto qualify range recursive respect
+    right rollup rows select set some struct tablesample then to treat true
+    unbounded union unnest using when where window with within
+    count sum avg min max approx_count_distinct approx_top_count approx_quantiles
+    countif safe_cast coalesce ifnull nullif date datetime timestamp time
+    """.split()
+)
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+
+def tokenize(sql: str) -> Iterator[Token]:
+    """Splits BigQuery SQL into tokens, keeping strings and quoted names whole."""
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        assert kind is not None
+        yield Token(kind, match.group())
+
+
+def normalize_sql(sql: str) -> str:
+    """Returns a canonical form of `sql` for use as a cache key.
+
+    Comments are removed, whitespace is reduced to a single space between
+    adjacent words and dropped around punctuation, keywords are lowercased
+    and trailing semicolons are dropped. String literals, quoted identifiers
+    and the case of unquoted names are preserved, since they change the
+    meaning of the query.
+    """
+    parts: list[str] = []
+    previous_kind = "symbol"
+    for token in tokenize(sql):
+        if token.kind in ("comment", "whitespace"):
+            continue
+        text = token.text
+        if token.kind == "word" and text.lower() in KEYWORDS:
+            text = text.lower()
+        if token.kind != "symbol" and previous_kind != "symbol":
+            parts.append(" ")
+        parts.append(text)
+        previous_kind = token.kind
+    return "".join(parts).rstrip(";")
+
+
+def significant_tokens(sql: str) -> list[Token]:
+    """Returns the tokens of `sql` other than comments and whitespace."""
+    return [t for t in tokenize(sql) if t.kind not in ("comment", "whitespace")]
+
+
+def _name_parts(tokens: list[Token], i: int) -> tuple[list[str], int]:
+    """Reads a possibly dotted, quoted or hyphenated name starting at `tokens[i]`.
+
+    Returns the name's parts, without backticks, and the index after the name.
+    """
+    text = ""
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == "quoted_identifier":
+            text += token.text[1:-1]
+        elif token.kind in ("word", "number"):
+            text += token.text
+        else:
+            break
+        i += 1
+        if i < len(tokens) and tokens[i].text == "*":
+            # The prefix of a wildcard table, e.g. analytics.events_*.
+            text += "*"
+            i += 1
+            break
+        # Unquoted project ids may contain hyphens, e.g. my-project.sales.orders.
+        if (
+            i + 1 < len(tokens)
+            and tokens[i].text in (".", "-")
+            and tokens[i + 1].kind
+            in (
+                "word",
+                "number",
+                "quoted_identifier",
+            )
+        ):
+            text += tokens[i].text
+            i += 1
+        else:
+            break
+    return [part for part in text.split(".") if part], i
+
+
+def referenced_tables(sql: str) -> list[str]:
+    """Returns the names of the tables read by `sql`, in order of first appearance.
+
+    Names following FROM and JOIN are returned without backticks, as written,
+    e.g. `sales.orders` or `my-project.sales.orders`. Subqueries, UNNEST,
+    table functions and the names of common table expressions are skipped.
+    """
+    tokens = significant_tokens(sql)
+    ctes = {
+        tokens[i - 1].text.lower()
+        for i in range(1, len(tokens) - 1)
+        if tokens[i].text.lower() == "as"
+        and tokens[i + 1].text == "("
+        and tokens[i - 1].kind in ("word", "quoted_identifier")
+        and i >= 2
+        and tokens[i - 2].text.lower() in ("with", ",", "recursive")
+    }
+    tables: dict[str, None] = {}
+    in_extract = False
+    for i, token in enumerate(tokens):
+        keyword = token.text.lower() if token.kind == "word" else ""
+        if keyword == "extract" and i + 1 < len(tokens) and tokens[i + 1].text == "(":
+            # EXTRACT(part FROM value) is not a table reference.
+            in_extract = True
+            continue
+        if keyword not in ("from", "join"):
+            continue
+        if in_extract and keyword == "from":
+            in_extract = False
+            continue
+        parts, end = _name_parts(tokens, i + 1)
+        if not parts or (end < len(tokens) and tokens[end].text == "("):
+            continue
+        name = ".".join(parts)
+        if (len(parts) == 1 and name.lower() in ctes) or name.lower() == "unnest":
+            continue
+        tables[name] = None
+    return list(tables)
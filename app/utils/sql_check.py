@@ -0,0 +1,309 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+
+from app.utils.metrics import metrics
+from app.utils.sql import Token, referenced_tables, significant_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Rows a query without aggregates or a LIMIT of its own is limited to.
+SQL_DEFAULT_LIMIT = int(os.environ.get("SQL_DEFAULT_LIMIT", "10"))
+
+_AGGREGATES = frozenset(
+    """
+    any_value approx_count_distinct approx_quantiles approx_top_count approx_top_sum
+    array_agg avg bit_and bit_or bit_xor corr count countif covar_pop covar_samp
+    logical_and logical_or max min stddev stddev_pop stddev_samp string_agg sum
+    var_pop var_samp variance
+    """.split()
+)
+_REGEXP_EXTRACT_FUNCTIONS = frozenset(
+    ("regexp_extract", "regexp_extract_all", "regexp_substr")
+)
+_ESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+
+# Returns whether a table exists, or None when that is not known locally.
+TableExists = Callable[[str], bool | None]
+
+rejections = metrics.counter(
+    "sql_check_rejections_total",
+    "Queries rejected before reaching BigQuery, by rule.",
+    ("rule",),
+)
+limits_added = metrics.counter(
+    "sql_check_limits_added_total", "Queries a LIMIT was added to."
+)
+
+
+class Finding(NamedTuple):
+    rule: str
+    message: str
+
+
+@dataclass
+class SQLCheck:
+    """The outcome of checking a query locally."""
+
+    sql: str
+    findings: list[Finding] = field(default_factory=list)
+    limit_added: int | None = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.findings
+
+    def annotate(self, result: dict[str, Any]) -> dict[str, Any]:
+        """Adds `limit_added` to the result of the checked query, if a LIMIT was added."""
+        if self.limit_added is None:
+            return result
+        return {**result, "limit_added": self.limit_added}
+
+    def error_response(self) -> dict[str, Any]:
+        """Returns the tool response for a rejected query, shaped like a failed dry run."""
+        return {
+            "status": "INVALID",
+            "error": " ".join(finding.message for finding in self.findings),
+            "checked_locally": True,
+        }
+
+
+def capturing_groups(pattern: str) -> int:
+    """Counts the capturing groups of an RE2 regular expression."""
+    groups = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A `]` first in a class, after an optional `^`, is a literal.
+            i += 1 + pattern.startswith("^", i + 1)
+            if pattern.startswith("]", i):
+                i += 1
+            continue
+        elif char == "(":
+            rest = pattern[i + 1 : i + 4]
+            if (
+                not rest.startswith("?")
+                or rest.startswith("?P<")
+                or (rest.startswith("?<") and rest[2:3] not in ("=", "!"))
+            ):
+                groups += 1
+        i += 1
+    return groups
+
+
+def string_value(literal: str) -> str:
+    """Returns the value of a string literal token, e.g. `r'\\d+'` or `'a\\\\.b'`."""
+    prefix_length = len(literal) - len(literal.lstrip("rRbB"))
+    prefix, quoted = literal[:prefix_length], literal[prefix_length:]
+    quote_length = 3 if quoted[:3] in ("'''", '"""') else 1
+    body = quoted[quote_length:-quote_length]
+    if "r" in prefix.lower():
+        return body
+    return _ESCAPE_RE.sub(lambda m: "\\" if m.group(1) == "\\" else m.group(1), body)
+
+
+def _arguments(tokens: list[Token], open_index: int) -> list[list[Token]]:
+    """Returns the arguments of the call whose `(` is at `open_index`."""
+    arguments: list[list[Token]] = [[]]
+    depth = 0
+    for token in tokens[open_index:]:
+        if token.text in ("(", "["):
+            depth += 1
+            if depth == 1:
+                continue
+        elif token.text in (")", "]"):
+            depth -= 1
+            if depth == 0:
+                break
+        elif token.text == "," and depth == 1:
+            arguments.append([])
+            continue
+        arguments[-1].append(token)
+    return arguments
+
+
+def _check_syntax(tokens: list[Token]) -> list[Finding]:
+    if not tokens:
+        return [Finding("syntax", "The query is empty.")]
+    findings = []
+    if any(t.kind == "symbol" and t.text in ("'", '"', "`") for t in tokens):
+        findings.append(
+            Finding(
+                "syntax",
+                "The query has an unterminated string literal or quoted identifier.",
+            )
+        )
+    depth = 0
+    for token in tokens:
+        depth += token.text in ("(", "[")
+        depth -= token.text in (")", "]")
+        if depth < 0:
+            break
+    if depth:
+        findings.append(
+            Finding("syntax", "The query has unbalanced parentheses or brackets.")
+        )
+    return findings
+
+
+def _check_functions(tokens: list[Token]) -> list[Finding]:
+    findings = []
+    for i, token in enumerate(tokens[:-1]):
+        if token.kind != "word" or tokens[i + 1].text != "(":
+            continue
+        name = token.text.lower()
+        if name == "regexp_quote":
+            findings.append(
+                Finding(
+                    "regexp_quote",
+                    "REGEXP_QUOTE is not supported; escape the pattern by hand.",
+                )
+            )
+        elif name in _REGEXP_EXTRACT_FUNCTIONS:
+            arguments = _arguments(tokens, i + 1)
+            if (
+                len(arguments) < 2
+                or len(arguments[1]) != 1
+                or arguments[1][0].kind != "string"
+            ):
+                continue
+            groups = capturing_groups(string_value(arguments[1][0].text))
+            if groups > 1:
+                findings.append(
+                    Finding(
+                        "regexp_groups",
+                        f"{token.text.upper()} allows at most one capturing group, and "
+                        f"{arguments[1][0].text} has {groups}. Use one {token.text.upper()} "
+                        "per part, or make the other groups non-capturing with (?:...).",
+                    )
+                )
+    return findings
+
+
+def _check_tables(sql: str, table_exists: TableExists) -> list[Finding]:
+    findings = []
+    for table in referenced_tables(sql):
+        parts = table.split(".")
+        if len(parts) < 2 or "*" in table or "information_schema" in table.lower():
+            continue
+        if table_exists(table) is False:
+            findings.append(
+                Finding(
+                    "unknown_table", f"Table {table} was not found in the data catalog."
+                )
+            )
+    return findings
+
+
+def needs_limit(tokens: list[Token]) -> bool:
+    """Returns whether a query returns rows without aggregating or limiting them.
+
+    Only the outermost query is considered: LIMITs and aggregates in
+    subqueries and common table expressions do not bound its result. Nor do
+    aggregate functions called over a window, which return a row per row.
+    """
+    if not tokens or tokens[0].text.lower() not in ("select", "with", "("):
+        return False
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.text in ("(", "["):
+            depth += 1
+        elif token.text in (")", "]"):
+            depth -= 1
+        elif depth == 0 and token.kind == "word":
+            word = token.text.lower()
+            following = tokens[i + 1].text.lower() if i + 1 < len(tokens) else ""
+            if word == "limit" or (word == "group" and following == "by"):
+                return False
+            if (
+                word in _AGGREGATES
+                and following == "("
+                and not _is_window_call(tokens, i + 1)
+            ):
+                return False
+    return True
+
+
+def _is_window_call(tokens: list[Token], start: int) -> bool:
+    """Returns whether the arguments opened by the `(` at `start` are followed by OVER."""
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i].text in ("(", "["):
+            depth += 1
+        elif tokens[i].text in (")", "]"):
+            depth -= 1
+            if depth == 0:
+                return i + 1 < len(tokens) and tokens[i + 1].text.lower() == "over"
+    return False
+
+
+def add_limit(sql: str, limit: int) -> str:
+    """Appends `LIMIT limit` to `sql`, after any trailing comment and before a final `;`."""
+    tokens = list(tokenize(sql))
+    for i in range(len(tokens) - 1, -1, -1):
+        if tokens[i].kind not in ("comment", "whitespace"):
+            if tokens[i].text == ";":
+                del tokens[i]
+            break
+    return "".join(token.text for token in tokens).rstrip() + f"\nLIMIT {limit}"
+
+
+def check_sql(
+    sql: str,
+    table_exists: TableExists | None = None,
+    default_limit: int | None = None,
+) -> SQLCheck:
+    """Checks a query locally, before it is sent to BigQuery.
+
+    Finds syntax errors that need no parser (unterminated strings,
+    unbalanced parentheses), REGEXP_EXTRACT patterns with more than one
+    capturing group, REGEXP_QUOTE, and, with `table_exists`, tables that do
+    not exist. With `default_limit`, a LIMIT is added to queries that return
+    rows without aggregating or limiting them.
+
+    Returns:
+        The checked query, the LIMIT added to it if any, and the findings
+        that make it invalid.
+    """
+    tokens = significant_tokens(sql)
+    findings = _check_syntax(tokens)
+    if not findings:
+        findings += _check_functions(tokens)
+        if table_exists is not None:
+            findings += _check_tables(sql, table_exists)
+    if findings:
+        for finding in findings:
+            rejections.inc(rule=finding.rule)
+        logger.info(
+            "Query rejected before reaching BigQuery: %s", [f.rule for f in findings]
+        )
+        return SQLCheck(sql, findings)
+    if default_limit is not None and needs_limit(tokens):
+        limits_added.inc()
+        return SQLCheck(add_limit(sql, default_limit), limit_added=default_limit)
+    return SQLCheck(sql)
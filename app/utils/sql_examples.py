@@ -0,0 +1,357 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any, NamedTuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools import BaseTool, ToolContext
+from google.cloud import bigquery
+from google.genai import types
+
+from app.utils.search_index import tokenize
+from app.utils.sql import normalize_sql, referenced_tables
+
+logger = logging.getLogger(__name__)
+
+SQL_EXAMPLES_MAX_ENTRIES = int(os.environ.get("SQL_EXAMPLES_MAX_ENTRIES", "1000"))
+# Earlier questions at least this similar to the user's are offered as examples.
+SQL_EXAMPLES_MIN_SIMILARITY = float(
+    os.environ.get("SQL_EXAMPLES_MIN_SIMILARITY", "0.5")
+)
+# Earlier questions at least this similar are taken to be the same question.
+SQL_EXAMPLES_REUSE_SIMILARITY = float(
+    os.environ.get("SQL_EXAMPLES_REUSE_SIMILARITY", "0.9")
+)
+SQL_EXAMPLES_K = 3
+# Replies with fewer content words, such as "yes, go ahead", are not questions.
+SQL_EXAMPLES_MIN_WORDS = 3
+
+SchemaFingerprints = Callable[[Sequence[str]], dict[str, str | None]]
+
+_QUERY_TOOLS = ("run_query", "execute_query")
+
+# Words that do not distinguish one data question from another, or that make
+# up replies to the agent rather than questions.
+_STOPWORDS = frozenset(
+    """
+    a about ahead all an and any are as at be by can continue could did do does
+    fine for from give go good great how i in is it its just me my of ok okay on
+    or our per please proceed run s show sure tell thank thanks that the their
+    there these this those to us use was we were what which who with yes you
+    your
+    """.split()
+)
+# Words that invert a question. They are never stopwords, and questions that
+# differ in them are never the same question. "t" is what is left of "n't".
+_NEGATIONS = frozenset(
+    """
+    except exclude excluded excludes excluding neither never no none nor not
+    nothing t without
+    """.split()
+)
+
+
+def schema_fingerprint(table: bigquery.Table) -> str:
+    """Returns a hash of the column names, types and modes of `table`.
+
+    Descriptions and data changes do not change the fingerprint, so SQL is
+    only invalidated by changes that can break it.
+    """
+
+    def shape(field: bigquery.SchemaField) -> list[Any]:
+        return [
+            field.name,
+            field.field_type,
+            field.mode,
+            [shape(f) for f in field.fields],
+        ]
+
+    encoded = json.dumps([shape(field) for field in table.schema]).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _words(question: str) -> list[str]:
+    return [word for word in tokenize(question) if word not in _STOPWORDS]
+
+
+def _negations(question: str) -> frozenset[str]:
+    return frozenset(word for word in tokenize(question) if word in _NEGATIONS)
+
+
+def question_terms(question: str) -> Counter[str]:
+    """Returns the words and word pairs of a question, with their counts."""
+    words = _words(question)
+    terms = Counter(words)
+    terms.update(f"{a} {b}" for a, b in itertools.pairwise(words))
+    return terms
+
+
+def is_question(text: str) -> bool:
+    """Returns whether `text` has enough content words to be a data question."""
+    return len(_words(text)) >= SQL_EXAMPLES_MIN_WORDS
+
+
+def _is_select(sql: str) -> bool:
+    return normalize_sql(sql).startswith(("select", "with", "("))
+
+
+def _user_text(content: types.Content | None) -> str:
+    if content is None:
+        return ""
+    return " ".join(part.text for part in content.parts or [] if part.text).strip()
+
+
+@dataclass
+class _Entry:
+    question: str
+    sql: str
+    fingerprints: dict[str, str | None]
+    terms: Counter[str]
+
+
+class Match(NamedTuple):
+    question: str
+    sql: str
+    similarity: float
+    same_question: bool
+
+
+class SQLExampleStore:
+    """Remembers the SQL that answered earlier questions, for every session.
+
+    When a query tool succeeds, the user's question and the SQL are stored
+    together with a fingerprint of the schema of every table the SQL reads.
+    The question is the last user message that was one, kept in session
+    state, so that replies such as "yes, go ahead" or "use sales.orders" to
+    the agent's own questions are never stored or matched as questions.
+    At the start of a turn, the stored questions most similar to the user's,
+    by TF-IDF cosine similarity over words and word pairs, are written to
+    session state, where the agent's instruction offers them as examples, or
+    for direct reuse when the question is the same. Entries whose tables'
+    schemas have changed since are evicted when they are matched, so stale
+    SQL is never offered.
+    """
+
+    def __init__(
+        self,
+        schema_fingerprints: SchemaFingerprints,
+        max_entries: int = SQL_EXAMPLES_MAX_ENTRIES,
+        min_similarity: float = SQL_EXAMPLES_MIN_SIMILARITY,
+        reuse_similarity: float = SQL_EXAMPLES_REUSE_SIMILARITY,
+        state_key: str = "sql_examples",
+        question_state_key: str = "sql_examples_question",
+    ) -> None:
+        self._schema_fingerprints = schema_fingerprints
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self.reuse_similarity = reuse_similarity
+        self.state_key = state_key
+        self.question_state_key = question_state_key
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._postings: dict[str, set[str]] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, question: str, sql: str) -> bool:
+        """Stores the SQL that answered `question`.
+
+        Returns:
+            Whether it was stored. Statements other than queries, queries
+            reading a table whose schema cannot be fingerprinted, and text
+            that is not a question, are not.
+        """
+        terms = question_terms(question)
+        tables = referenced_tables(sql)
+        if not is_question(question) or not tables or not _is_select(sql):
+            return False
+        fingerprints = self._schema_fingerprints(tables)
+        if any(fingerprint is None for fingerprint in fingerprints.values()):
+            return False
+        key = " ".join(_words(question))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(question, sql, fingerprints, terms)
+            for term in terms:
+                self._postings[term].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def lookup(self, question: str, k: int = SQL_EXAMPLES_K) -> list[Match]:
+        """Returns up to `k` stored questions similar to `question`, most similar first.
+
+        The schemas of the candidates' tables are checked first, and
+        candidates whose schemas changed are evicted. Only a `question` with
+        enough content words, and the same negations, is matched as the same
+        question.
+        """
+        terms = question_terms(question)
+        reusable = is_question(question)
+        negations = _negations(question)
+        with self._lock:
+            candidates = self._rank(terms)[: k * 2]
+        current: dict[str, str | None] = {}
+        if candidates:
+            tables = sorted(
+                {table for _, entry in candidates for table in entry.fingerprints}
+            )
+            current = self._schema_fingerprints(tables)
+        matches = []
+        for similarity, entry in candidates:
+            if any(current.get(t) != f for t, f in entry.fingerprints.items()):
+                logger.info(
+                    "Evicting SQL example, the schema of a table it reads changed"
+                )
+                with self._lock:
+                    self._remove(" ".join(_words(entry.question)), evicted=True)
+                continue
+            matches.append(
+                Match(
+                    entry.question,
+                    entry.sql,
+                    round(similarity, 3),
+                    reusable
+                    and similarity >= self.reuse_similarity
+                    and _negations(entry.question) == negations,
+                )
+            )
+        with self._lock:
+            if matches:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return matches[:k]
+
+    def _rank(self, terms: Counter[str]) -> list[tuple[float, _Entry]]:
+        keys = set().union(*(self._postings.get(term, ()) for term in terms))
+        if not keys:
+            return []
+        query_vector = self._vector(terms)
+        query_norm = math.sqrt(sum(w * w for w in query_vector.values()))
+        ranked = []
+        for key in keys:
+            entry = self._entries[key]
+            vector = self._vector(entry.terms)
+            norm = math.sqrt(sum(w * w for w in vector.values()))
+            dot = sum(w * vector.get(term, 0.0) for term, w in query_vector.items())
+            similarity = dot / (query_norm * norm) if query_norm and norm else 0.0
+            if similarity >= self.min_similarity:
+                ranked.append((similarity, entry))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked
+
+    def _vector(self, terms: Counter[str]) -> dict[str, float]:
+        total = len(self._entries)
+        return {
+            term: count
+            * (math.log((1 + total) / (1 + len(self._postings.get(term, ())))) + 1)
+            for term, count in terms.items()
+        }
+
+    def _remove(self, key: str, evicted: bool = False) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry.terms:
+            postings = self._postings[term]
+            postings.discard(key)
+            if not postings:
+                del self._postings[term]
+        if evicted:
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    async def before_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Writes the examples for the user's question to `state_key`.
+
+        A user message that is a question is kept in `question_state_key`;
+        for a reply to the agent, the examples are those of that question.
+        """
+        question = _user_text(callback_context.user_content)
+        if is_question(question):
+            if callback_context.state.get(self.question_state_key) != question:
+                callback_context.state[self.question_state_key] = question
+        else:
+            question = callback_context.state.get(self.question_state_key) or ""
+        try:
+            matches = await asyncio.to_thread(self.lookup, question) if question else []
+        except Exception as e:
+            logger.warning("Could not look up SQL examples: %s", e)
+            matches = []
+        text = format_examples(matches)
+        if callback_context.state.get(self.state_key, "") != text:
+            callback_context.state[self.state_key] = text
+
+    async def after_tool_callback(
+        self,
+        tool: BaseTool,
+        args: dict[str, Any],
+        tool_context: ToolContext,
+        tool_response: Any,
+    ) -> None:
+        """Records the SQL of a successful query with the user's last question."""
+        if tool.name not in _QUERY_TOOLS or not args.get("query"):
+            return
+        if not isinstance(tool_response, dict) or "error" in tool_response:
+            return
+        question = _user_text(tool_context.user_content)
+        if not is_question(question):
+            question = tool_context.state.get(self.question_state_key) or ""
+        if not question:
+            return
+        try:
+            await asyncio.to_thread(self.record, question, args["query"])
+        except Exception as e:
+            logger.warning("Could not record SQL example: %s", e)
+
+
+def format_examples(matches: Sequence[Match]) -> str:
+    """Renders matches for the agent's instruction, with the SQL on one line."""
+    lines = []
+    for match in matches:
+        label = (
+            "same question"
+            if match.same_question
+            else f"similarity {match.similarity:.2f}"
+        )
+        lines.append(
+            f"- Question ({label}): {match.question}\n  SQL: {normalize_sql(match.sql)}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from google.adk.tools import BaseTool, ToolContext
+
+logger = logging.getLogger(__name__)
+
+# Fraction of successful tool calls that are logged. Failed calls are always logged.
+TOOL_LOG_SAMPLE_RATE = float(os.environ.get("TOOL_LOG_SAMPLE_RATE", "1.0"))
+# Maximum size of the argument and result previews in a record.
+TOOL_LOG_PREVIEW_BYTES = int(os.environ.get("TOOL_LOG_PREVIEW_BYTES", "512"))
+# Start times of calls that raised, and so never finished, are dropped past this.
+_MAX_PENDING_CALLS = 1024
+
+_ENCODER = json.JSONEncoder(default=str)
+
+
+def bounded_preview(value: Any, max_bytes: int = TOOL_LOG_PREVIEW_BYTES) -> str:
+    """Serializes `value` to JSON, stopping once `max_bytes` characters are produced.
+
+    `iterencode` yields the encoding piece by piece, so only about `max_bytes`
+    of a large result is ever serialized.
+    """
+    parts: list[str] = []
+    size = 0
+    for chunk in _ENCODER.iterencode(value):
+        parts.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            return "".join(parts)[:max_bytes] + "..."
+    return "".join(parts)
+
+
+def result_metrics(result: Any) -> dict[str, Any]:
+    """Returns the size of a tool result from metadata that costs O(1) to read."""
+    if isinstance(result, list):
+        return {"items": len(result)}
+    if not isinstance(result, dict):
+        return {}
+    metrics: dict[str, Any] = {}
+    if "rows_returned" in result:
+        metrics["rows"] = result["rows_returned"]
+    elif isinstance(result.get("rows"), list):
+        metrics["rows"] = len(result["rows"])
+    for key in ("total_rows", "bytes_returned", "truncated", "cached", "result_id"):
+        if result.get(key) is not None:
+            metrics[key] = result[key]
+    return metrics
+
+
+class _LazyJSON:
+    """Defers serializing a log record until a handler formats it."""
+
+    __slots__ = ("record",)
+
+    def __init__(self, record: dict[str, Any]) -> None:
+        self.record = record
+
+    def __str__(self) -> str:
+        return json.dumps(self.record, default=str)
+
+
+class ToolCallLogger:
+    """Emits one structured, size-bounded log record per tool call.
+
+    Records carry the tool name, an argument preview, the call duration, the
+    result's row count and size when the tool reports them, and a truncated
+    result preview. Their cost does not grow with the size of the result:
+    previews are serialized only up to the byte cap, and nothing is formatted
+    unless the record is sampled and the log level is enabled. Records are
+    passed to handlers as `json_fields`, which Cloud Logging stores as the
+    structured payload.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = TOOL_LOG_SAMPLE_RATE,
+        preview_bytes: int = TOOL_LOG_PREVIEW_BYTES,
+        log: logging.Logger = logger,
+        random_fn: Callable[[], float] = random.random,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.preview_bytes = preview_bytes
+        self.log = log
+        self._random = random_fn
+        self._lock = threading.Lock()
+        self._started: OrderedDict[str, float] = OrderedDict()
+
+    def before_tool_callback(
+        self, tool: BaseTool, args: dict[str, Any], tool_context: ToolContext
+    ) -> None:
+        """Records the start of a call. A call already started keeps its first start."""
+        with self._lock:
+            self._started.setdefault(_call_id(tool, tool_context), time.perf_counter())
+            if len(self._started) > _MAX_PENDING_CALLS:
+                self._started.popitem(last=False)
+
+    def after_tool_callback(
+        self,
+        tool: BaseTool,
+        args: dict[str, Any],
+        tool_context: ToolContext,
+        tool_response: Any,
+    ) -> None:
+        with self._lock:
+            started = self._started.pop(_call_id(tool, tool_context), None)
+        duration_ms = (time.perf_counter() - started) * 1000 if started else None
+        failed = isinstance(tool_response, dict) and "error" in tool_response
+        level = logging.WARNING if failed else logging.INFO
+        if not self.log.isEnabledFor(level):
+            return
+        if not failed and self._random() >= self.sample_rate:
+            return
+        record = {
+            "tool": tool.name,
+            "invocation_id": tool_context.invocation_id,
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            "args": bounded_preview(args, self.preview_bytes),
+            **result_metrics(tool_response),
+            "preview": bounded_preview(tool_response, self.preview_bytes),
+        }
+        self.log.log(
+            level, "tool_call %s", _LazyJSON(record), extra={"json_fields": record}
+        )
+
+
+def _call_id(tool: BaseTool, tool_context: ToolContext) -> str:
+    return tool_context.function_call_id or f"{tool_context.invocation_id}:{tool.name}"
+
+
+tool_call_logger = ToolCallLogger()
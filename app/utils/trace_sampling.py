@@ -0,0 +1,165 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import StatusCode
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fraction of traces without errors that are kept, unless they are slow.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.1"))
+# Traces taking longer than this are always kept.
+TRACE_SLOW_SECONDS = float(os.environ.get("TRACE_SLOW_SECONDS", "30"))
+# Spans held while their traces are in progress. Past this, the oldest traces are
+# decided early.
+TRACE_SAMPLING_MAX_BUFFERED_SPANS = int(
+    os.environ.get("TRACE_SAMPLING_MAX_BUFFERED_SPANS", "20000")
+)
+# Decided traces remembered, so that spans ending after their trace follow its decision.
+_MAX_DECIDED_TRACES = 10000
+_TRACE_ID_LIMIT = (1 << 64) - 1
+
+sampled_traces = metrics.counter(
+    "trace_sampling_traces_total",
+    "Traces decided by the tail sampler, by decision: error, slow, sampled or dropped.",
+    ("decision",),
+)
+buffered_spans = metrics.gauge(
+    "trace_sampling_buffered_spans",
+    "Spans held by the tail sampler until their trace ends.",
+)
+
+
+@dataclass
+class _Trace:
+    spans: list[ReadableSpan] = field(default_factory=list)
+    open_spans: int = 0
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Decides which traces to export once they have ended.
+
+    The spans of a trace are held until every span started in it has
+    ended. Traces with an error span, and traces taking longer than
+    `slow_seconds` from their first start to their last end, are then
+    passed to `processor` in full. Of the others, a `sample_rate` fraction
+    is kept, chosen by trace ID like the `TraceIdRatioBased` sampler, so
+    that every process keeps the same traces.
+
+    When more than `max_buffered_spans` spans are held, the oldest traces
+    are decided with the spans they have. Spans ending after the decision
+    on their trace follow it.
+    """
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        slow_seconds: float = TRACE_SLOW_SECONDS,
+        max_buffered_spans: int = TRACE_SAMPLING_MAX_BUFFERED_SPANS,
+    ) -> None:
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_buffered_spans = max_buffered_spans
+        self._bound = round(min(max(sample_rate, 0.0), 1.0) * (_TRACE_ID_LIMIT + 1))
+        self._traces: OrderedDict[int, _Trace] = OrderedDict()
+        self._decided: OrderedDict[int, bool] = OrderedDict()
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        trace_id = span.context.trace_id
+        with self._lock:
+            if trace_id in self._decided:
+                return
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                trace = self._traces[trace_id] = _Trace()
+            trace.open_spans += 1
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        decided: list[tuple[list[ReadableSpan], bool]] = []
+        with self._lock:
+            keep = self._decided.get(trace_id)
+            if keep is not None:
+                decided.append(([span], keep))
+            else:
+                trace = self._traces.get(trace_id)
+                if trace is None:
+                    trace = self._traces[trace_id] = _Trace(open_spans=1)
+                trace.spans.append(span)
+                trace.open_spans -= 1
+                self._buffered += 1
+                if trace.open_spans <= 0:
+                    decided.append(self._decide(trace_id))
+                while self._buffered > self.max_buffered_spans and self._traces:
+                    decided.append(self._decide(next(iter(self._traces))))
+            buffered_spans.set(self._buffered)
+        self._forward(decided)
+
+    def _decide(self, trace_id: int) -> tuple[list[ReadableSpan], bool]:
+        """Removes a trace from the buffer and returns its spans and the decision."""
+        trace = self._traces.pop(trace_id)
+        self._buffered -= len(trace.spans)
+        if any(span.status.status_code is StatusCode.ERROR for span in trace.spans):
+            decision = "error"
+        elif trace.spans and self._duration_seconds(trace.spans) > self.slow_seconds:
+            decision = "slow"
+        elif trace_id & _TRACE_ID_LIMIT < self._bound:
+            decision = "sampled"
+        else:
+            decision = "dropped"
+        sampled_traces.inc(decision=decision)
+        keep = decision != "dropped"
+        self._decided[trace_id] = keep
+        while len(self._decided) > _MAX_DECIDED_TRACES:
+            self._decided.popitem(last=False)
+        return trace.spans, keep
+
+    @staticmethod
+    def _duration_seconds(spans: list[ReadableSpan]) -> float:
+        start = min(span.start_time or 0 for span in spans)
+        end = max(span.end_time or 0 for span in spans)
+        return (end - start) / 1e9
+
+    def _forward(self, decided: list[tuple[list[ReadableSpan], bool]]) -> None:
+        for spans, keep in decided:
+            if keep:
+                for span in spans:
+                    self.processor.on_end(span)
+
+    def shutdown(self) -> None:
+        """Decides the traces in progress, then shuts down the wrapped processor."""
+        with self._lock:
+            decided = [self._decide(trace_id) for trace_id in list(self._traces)]
+            buffered_spans.set(self._buffered)
+        if decided:
+            logger.info("Deciding %d unfinished traces at shutdown", len(decided))
+        self._forward(decided)
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Flushes the wrapped processor. Traces still in progress stay buffered."""
+        return self.processor.force_flush(timeout_millis)
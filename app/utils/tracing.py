@@ -12,16 +12,133 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import gzip
+import hashlib
 import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import Sequence
 from typing import Any
 
 import google.cloud.storage as storage
+from google.api_core import exceptions
 from google.cloud import logging as google_cloud_logging
+from opentelemetry import trace
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk import util
+from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanContext
+
+logger = logging.getLogger(__name__)
+
+# Cloud Logging entries written per API call, and their approximate total size.
+TRACE_LOG_BATCH_MAX_ENTRIES = int(os.environ.get("TRACE_LOG_BATCH_MAX_ENTRIES", "500"))
+TRACE_LOG_BATCH_MAX_BYTES = int(
+    os.environ.get("TRACE_LOG_BATCH_MAX_BYTES", str(4 * 1024 * 1024))
+)
+# Threads uploading large payloads to GCS, and uploads allowed to wait for them.
+TRACE_UPLOAD_WORKERS = int(os.environ.get("TRACE_UPLOAD_WORKERS", "4"))
+TRACE_UPLOAD_MAX_PENDING = int(os.environ.get("TRACE_UPLOAD_MAX_PENDING", "64"))
+TRACE_BUCKET_CHECK_TTL_SECONDS = float(
+    os.environ.get("TRACE_BUCKET_CHECK_TTL_SECONDS", "300")
+)
+# Cloud Logging entries are limited to 256 KB.
+MAX_ATTRIBUTES_BYTES = 255 * 1024
+# Attribute values smaller than this are never offloaded to GCS.
+TRACE_PAYLOAD_MIN_BYTES = int(os.environ.get("TRACE_PAYLOAD_MIN_BYTES", "1024"))
+# Hashes of payloads known to be stored, to skip uploading them again.
+TRACE_PAYLOAD_DEDUP_ENTRIES = int(os.environ.get("TRACE_PAYLOAD_DEDUP_ENTRIES", "4096"))
+
+_LOG_LABELS = {"type": "agent_telemetry", "service_name": "analytics-agent"}
+
+
+def _format_context(context: SpanContext) -> dict[str, str]:
+    return {
+        "trace_id": f"0x{trace.format_trace_id(context.trace_id)}",
+        "span_id": f"0x{trace.format_span_id(context.span_id)}",
+        "trace_state": repr(context.trace_state),
+    }
+
+
+def _format_attributes(attributes: Any) -> dict[str, Any] | None:
+    if attributes is None:
+        return None
+    # Sequence values are tuples; JSON and Cloud Logging want lists.
+    return {
+        key: list(value) if isinstance(value, tuple) else value
+        for key, value in attributes.items()
+    }
+
+
+def attribute_size(key: str, value: Any) -> int:
+    """Estimate the JSON size of an attribute in bytes, without serializing strings."""
+    if isinstance(value, str):
+        if value.isascii():
+            # Counted in place, without encoding a copy; these are escaped in JSON.
+            size = len(value) + sum(value.count(char) for char in ('"', "\\", "\n"))
+        else:
+            size = len(value.encode())
+    elif isinstance(value, (bool, int, float)) or value is None:
+        size = 8
+    else:
+        size = len(json.dumps(value))
+    return size + len(key) + 6
+
+
+def resource_to_dict(resource: Resource) -> dict[str, Any]:
+    return {
+        "attributes": _format_attributes(resource.attributes),
+        "schema_url": resource.schema_url,
+    }
+
+
+def span_to_dict(
+    span: ReadableSpan, resource: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Build the same dictionary as `json.loads(span.to_json())`, without the JSON round trip.
+
+    :param span: The span to convert
+    :param resource: The converted resource of the span, to reuse it across spans
+    :return: The span data dictionary
+    """
+    status = {"status_code": span.status.status_code.name}
+    if span.status.description:
+        status["description"] = span.status.description
+    return {
+        "name": span.name,
+        "context": _format_context(span.context) if span.context else None,
+        "kind": str(span.kind),
+        "parent_id": (
+            f"0x{trace.format_span_id(span.parent.span_id)}" if span.parent else None
+        ),
+        "start_time": util.ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": util.ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": _format_attributes(span.attributes),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": util.ns_to_iso_str(event.timestamp),
+                "attributes": _format_attributes(event.attributes),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": _format_context(link.context),
+                "attributes": _format_attributes(link.attributes),
+            }
+            for link in span.links
+        ],
+        "resource": resource if resource is not None else resource_to_dict(span.resource),
+    }
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -31,6 +148,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
     This class helps bypass the 256 character limit of Cloud Trace for attribute values
     by leveraging Cloud Logging (which has a 256KB limit) and Cloud Storage for larger payloads.
+
+    The log entries of a batch of spans are written with a few bulk API calls instead of
+    one per span, and large payloads are uploaded by a bounded pool of worker threads, so
+    that the exporter keeps up with the BatchSpanProcessor queue under load.
     """
 
     def __init__(
@@ -39,6 +160,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        max_batch_entries: int = TRACE_LOG_BATCH_MAX_ENTRIES,
+        max_batch_bytes: int = TRACE_LOG_BATCH_MAX_BYTES,
+        upload_workers: int = TRACE_UPLOAD_WORKERS,
+        max_pending_uploads: int = TRACE_UPLOAD_MAX_PENDING,
         **kwargs: Any,
     ) -> None:
         """
@@ -48,6 +173,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param max_batch_entries: Maximum log entries written per API call
+        :param max_batch_bytes: Approximate maximum size of the entries written per API call
+        :param upload_workers: Number of threads uploading large payloads to GCS
+        :param max_pending_uploads: Uploads queued before they are done on the exporter thread
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -61,6 +190,18 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             bucket_name or f"{self.project_id}-analytics-agent-logs-data"
         )
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self.max_batch_entries = max_batch_entries
+        self.max_batch_bytes = max_batch_bytes
+        self._uploads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="span-upload"
+        )
+        self._upload_slots = threading.BoundedSemaphore(max_pending_uploads)
+        self._pending_uploads: set[concurrent.futures.Future] = set()
+        self._pending_lock = threading.Lock()
+        self._bucket_exists: bool | None = None
+        self._bucket_checked_at = 0.0
+        self._resource: tuple[Resource, dict[str, Any]] | None = None
+        self._stored: OrderedDict[str, None] = OrderedDict()
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -69,83 +210,219 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param spans: A sequence of spans to export
         :return: The result of the export operation
         """
+        logged = True
+        batch = self.logger.batch()
+        batch_bytes = 0
         for span in spans:
-            span_context = span.get_span_context()
-            trace_id = format(span_context.trace_id, "x")
-            span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_dict, size = self._span_entry(span)
+            if self.debug:
+                print(span_dict)
+            if batch.entries and (
+                len(batch.entries) >= self.max_batch_entries
+                or batch_bytes + size > self.max_batch_bytes
+            ):
+                logged = self._commit(batch) and logged
+                batch_bytes = 0
+            batch.log_struct(span_dict, labels=_LOG_LABELS, severity="INFO")
+            batch_bytes += size
+        if batch.entries:
+            logged = self._commit(batch) and logged
+        # Export spans to Google Cloud Trace using the parent class method
+        result = super().export(spans)
+        return result if logged else SpanExportResult.FAILURE
 
-            span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
-            span_dict["span_id"] = span_id
+    def _span_entry(self, span: ReadableSpan) -> tuple[dict[str, Any], int]:
+        span_context = span.get_span_context()
+        # Only SDK spans reach the exporter, and they always have a context.
+        assert span_context is not None
+        trace_id = format(span_context.trace_id, "x")
+        span_id = format(span_context.span_id, "x")
+        span_dict = span_to_dict(span, self._resource_dict(span.resource))
+        span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
+        span_dict["span_id"] = span_id
+        return self._process_large_attributes(span_dict=span_dict, span_id=span_id)
 
-            span_dict = self._process_large_attributes(
-                span_dict=span_dict, span_id=span_id
-            )
+    def _resource_dict(self, resource: Resource) -> dict[str, Any]:
+        # Every span of a provider shares one resource, so it is converted once.
+        if self._resource is None or self._resource[0] is not resource:
+            self._resource = (resource, resource_to_dict(resource))
+        return self._resource[1]
 
-            if self.debug:
-                print(span_dict)
+    def _commit(self, batch: Any) -> bool:
+        try:
+            batch.commit()
+            return True
+        except Exception:
+            logger.exception("Could not write %d span log entries", len(batch.entries))
+            del batch.entries[:]
+            return False
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
-                span_dict,
-                labels={
-                    "type": "agent_telemetry",
-                    "service_name": "analytics-agent",
-                },
-                severity="INFO",
-            )
-        # Export spans to Google Cloud Trace using the parent class method
-        return super().export(spans)
+    def bucket_exists(self) -> bool:
+        """Return whether the payload bucket exists, checking at most every few minutes."""
+        now = time.monotonic()
+        if (
+            self._bucket_exists is None
+            or now - self._bucket_checked_at > TRACE_BUCKET_CHECK_TTL_SECONDS
+        ):
+            self._bucket_exists = self.bucket.exists()
+            self._bucket_checked_at = now
+        return bool(self._bucket_exists)
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def store_payload(self, payload: bytes) -> str:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Initiate storing a large payload in Google Cloud Storage, gzip-compressed and
+        named by its SHA-256, so that a payload repeated across spans is stored once.
 
-        :param content: The content to store
-        :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        The upload runs on the upload pool; when too many uploads are pending, it runs
+        on the calling thread instead, which slows down the export rather than queueing
+        payloads without bound.
+
+        :param payload: The JSON-encoded content to store
+        :return: The GCS URI of the stored content
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
-            logging.warning(
-                f"Bucket {self.bucket_name} not found. "
-                "Unable to store span attributes in GCS."
+        if not self.bucket_exists():
+            logger.warning(
+                "Bucket %s not found. Unable to store span attributes in GCS.",
+                self.bucket_name,
             )
             return "GCS bucket not found"
 
-        blob_name = f"spans/{span_id}.json"
+        blob_name = f"spans/payloads/{hashlib.sha256(payload).hexdigest()}.json.gz"
+        uri = f"gs://{self.bucket_name}/{blob_name}"
+        with self._pending_lock:
+            if blob_name in self._stored:
+                self._stored.move_to_end(blob_name)
+                return uri
+            self._stored[blob_name] = None
+            while len(self._stored) > TRACE_PAYLOAD_DEDUP_ENTRIES:
+                self._stored.popitem(last=False)
+        if self._upload_slots.acquire(blocking=False):
+            future = self._uploads.submit(self._upload, blob_name, payload)
+            with self._pending_lock:
+                self._pending_uploads.add(future)
+            future.add_done_callback(self._upload_done)
+        else:
+            self._upload(blob_name, payload)
+        return uri
+
+    def _upload(self, blob_name: str, payload: bytes) -> None:
         blob = self.bucket.blob(blob_name)
+        # Served decompressed to clients that do not accept gzip.
+        blob.content_encoding = "gzip"
+        try:
+            # The name is the content's hash, so an existing object already holds it.
+            blob.upload_from_string(
+                gzip.compress(payload), "application/json", if_generation_match=0
+            )
+        except exceptions.PreconditionFailed:
+            pass
+        except Exception:
+            with self._pending_lock:
+                self._stored.pop(blob_name, None)
+            raise
+
+    def _upload_done(self, future: concurrent.futures.Future) -> None:
+        with self._pending_lock:
+            self._pending_uploads.discard(future)
+        self._upload_slots.release()
+        if future.exception() is not None:
+            logger.warning("Could not upload span attributes to GCS: %s", future.exception())
 
-        blob.upload_from_string(content, "application/json")
-        return f"gs://{self.bucket_name}/{blob_name}"
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Wait for pending payload uploads to finish."""
+        with self._pending_lock:
+            pending = set(self._pending_uploads)
+        _, not_done = concurrent.futures.wait(pending, timeout=timeout_millis / 1000)
+        return not not_done
 
-    def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
+    def shutdown(self) -> None:
+        self._uploads.shutdown(wait=True)
+        super().shutdown()
+
+    def _process_large_attributes(
+        self, span_dict: dict, span_id: str
+    ) -> tuple[dict, int]:
         """
-        Process large attribute values by storing them in GCS if they exceed the size
-        limit of Google Cloud Logging.
+        Offload the largest attribute values to GCS while the attributes exceed the size
+        limit of Google Cloud Logging. Each offloaded value is replaced by its GCS URI,
+        and their names are listed in the `offloaded_attributes` attribute.
+
+        The size of each value is estimated once, and the attributes are changed in
+        place, since `span_dict` is built for this export only.
 
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
-        :return: The updated span dictionary
+        :return: The updated span dictionary and the approximate size of its attributes
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+        if not attributes:
+            return span_dict, 0
+        sizes = [(attribute_size(key, value), key) for key, value in attributes.items()]
+        total = sum(size for size, _ in sizes)
+        if total <= MAX_ATTRIBUTES_BYTES:
+            return span_dict, total
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
-            )
+        offloaded = []
+        for size, key in sorted(sizes, reverse=True):
+            if total <= MAX_ATTRIBUTES_BYTES or size < TRACE_PAYLOAD_MIN_BYTES:
+                break
+            uri = self.store_payload(json.dumps(attributes[key]).encode())
+            attributes[key] = uri
+            total -= size - attribute_size(key, uri)
+            offloaded.append(key)
+        attributes["offloaded_attributes"] = offloaded
+        logger.info(
+            "Attributes of span %s above 250 KB, stored %d of them in GCS "
+            "to avoid large log entry errors",
+            span_id,
+            len(offloaded),
+        )
+        return span_dict, total
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Writes spans to a local file, one JSON object per line, in the format of
+    `ReadableSpan.to_json`.
+
+    A stand-in for CloudTraceLoggingSpanExporter to run, test and benchmark the
+    tracing pipeline without Google Cloud.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the file to append spans to.
+
+        :param path: Path of the JSONL file, created if it does not exist
+        """
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._resource: tuple[Resource, dict[str, Any]] | None = None
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """
+        Append the spans to the file.
+
+        :param spans: A sequence of spans to export
+        :return: The result of the export operation
+        """
+        lines = []
+        for span in spans:
+            if self._resource is None or self._resource[0] is not span.resource:
+                self._resource = (span.resource, resource_to_dict(span.resource))
+            lines.append(json.dumps(span_to_dict(span, self._resource[1])) + "\n")
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+            try:
+                self._file.writelines(lines)
+                self._file.flush()
+            except OSError:
+                logger.exception("Could not write %d spans to %s", len(spans), self.path)
+                return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
 
-        return span_dict
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -1,10 +1,14 @@
 import os
 import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
 from google.adk.cli.fast_api import get_fast_api_app
 from app.agent import root_agent # Assuming root_agent is defined here
+from app.utils.clients import client_manager
+from app.utils.metrics import metrics
+from app.utils.middleware import CancelJobsOnDisconnectMiddleware, MetricsMiddleware
 
 # Configure logging for google.adk
 logging.basicConfig(level=logging.INFO) # Set to INFO or DEBUG for more verbosity
@@ -19,6 +23,23 @@ app: FastAPI = get_fast_api_app(
     web=False # CRITICAL: Disables the default ADK UI
 )
 
+# Optionally resolve credentials and open the pooled BigQuery connection up front
+# so the first tool call doesn't pay for it
+if os.environ.get("BIGQUERY_WARM_UP", "false").lower() == "true":
+    client_manager.warm_up()
+
+# Cancel BigQuery jobs left running when a client drops its /run_sse stream
+app.add_middleware(CancelJobsOnDisconnectMiddleware)
+
+# Record request concurrency, latency and time to first event for /metrics
+app.add_middleware(MetricsMiddleware)
+
+
+# Serve the in-process metrics in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Add CORS middleware directly to the ADK app
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,82 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the per-call overhead of the metrics instrumentation.
+
+Usage: uv run python tests/benchmarks/bench_metrics.py
+"""
+
+import asyncio
+import time
+import timeit
+from typing import Any
+
+from app.utils.metrics import MetricsRegistry, instrument_tool
+from app.utils.middleware import MetricsMiddleware
+
+N = 200_000
+
+
+def per_call_ns(stmt: Any, number: int = N) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def tool(n: int) -> dict:
+    return {"rows": [n]}
+
+
+async def app(scope: Any, receive: Any, send: Any) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+
+
+async def send(message: Any) -> None:
+    pass
+
+
+def per_request_ns(asgi_app: Any, number: int = 50_000) -> float:
+    scope = {"type": "http", "path": "/run_sse"}
+
+    async def run() -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            await asgi_app(scope, None, send)
+        return time.perf_counter() - started
+
+    return min(asyncio.run(run()) for _ in range(3)) / number * 1e9
+
+
+def main() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "Counter.", ("tool", "outcome"))
+    histogram = registry.histogram("h_seconds", "Histogram.", ("tool",))
+    instrumented = instrument_tool(tool)
+
+    print(
+        f"counter.inc            {per_call_ns(lambda: counter.inc(tool='t', outcome='ok')):8.0f} ns"
+    )
+    print(
+        f"histogram.observe      {per_call_ns(lambda: histogram.observe(0.3, tool='t')):8.0f} ns"
+    )
+    bare, wrapped = per_call_ns(lambda: tool(1)), per_call_ns(lambda: instrumented(1))
+    print(f"tool call overhead     {wrapped - bare:8.0f} ns")
+    bare, wrapped = per_request_ns(app), per_request_ns(MetricsMiddleware(app))
+    print(f"middleware overhead    {wrapped - bare:8.0f} ns per request")
+    for _ in range(100):
+        histogram.observe(0.3, tool=f"tool_{_}")
+    print(f"render (100 series)    {per_call_ns(registry.render, 1000) / 1000:8.0f} us")
+
+
+if __name__ == "__main__":
+    main()
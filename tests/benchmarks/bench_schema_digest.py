@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the prompt tokens of the detailed and digest schema formats.
+
+Usage: uv run python tests/benchmarks/bench_schema_digest.py
+"""
+
+import json
+import time
+
+from google.cloud import bigquery
+
+from app.utils.schema_digest import estimate_tokens, schema_digest
+
+QUESTION = "What was the total revenue per customer country last month?"
+
+
+def wide_table(width: int) -> bigquery.Table:
+    fields = [
+        bigquery.SchemaField("event_date", "DATE"),
+        bigquery.SchemaField("customer_id", "STRING"),
+        bigquery.SchemaField("customer_country", "STRING"),
+        bigquery.SchemaField("revenue", "NUMERIC"),
+        bigquery.SchemaField(
+            "items",
+            "RECORD",
+            mode="REPEATED",
+            fields=[
+                bigquery.SchemaField("sku", "STRING"),
+                bigquery.SchemaField("quantity", "INTEGER"),
+                bigquery.SchemaField("price", "FLOAT"),
+            ],
+        ),
+    ]
+    fields += [
+        bigquery.SchemaField(f"metric_{i}", "FLOAT") for i in range(width - len(fields))
+    ]
+    table = bigquery.Table("project.analytics.events", schema=fields)
+    table.time_partitioning = bigquery.TimePartitioning(field="event_date")
+    table.clustering_fields = ["customer_id"]
+    return table
+
+
+def main() -> None:
+    print(
+        f"{'columns':>8} {'detailed':>9} {'digest':>7} {'pruned':>7} {'digest ms':>10}"
+    )
+    for width in (20, 100, 400, 1000):
+        table = wide_table(width)
+        detailed = json.dumps(
+            [
+                {"name": f.name, "type": f.field_type, "mode": f.mode}
+                for f in table.schema
+            ]
+        )
+        start = time.perf_counter()
+        digest = json.dumps(schema_digest(table, max_columns=width))
+        pruned = json.dumps(schema_digest(table, question=QUESTION))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"{width:>8} {estimate_tokens(detailed):>9} {estimate_tokens(digest):>7} "
+            f"{estimate_tokens(pruned):>7} {elapsed_ms:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the tracing overhead per invocation with and without tail sampling.
+
+Spans are exported to a local JSONL file, so no Google Cloud project is
+needed. One invocation in 20 fails and is always kept.
+
+Usage: uv run python tests/benchmarks/bench_trace_sampling.py
+"""
+
+import os
+import tempfile
+import time
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+from app.utils.trace_sampling import TailSamplingSpanProcessor
+from app.utils.tracing import FileSpanExporter
+
+INVOCATIONS = 2000
+TOOL_CALLS = 4
+ERROR_EVERY = 20
+
+
+def run(processor: SpanProcessor) -> float:
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer(__name__)
+    started = time.perf_counter()
+    for i in range(INVOCATIONS):
+        with tracer.start_as_current_span("invocation"):
+            for j in range(TOOL_CALLS):
+                with tracer.start_as_current_span("call_llm") as span:
+                    span.set_attribute("llm_request", "x" * 2000)
+                with tracer.start_as_current_span("execute_tool run_query") as span:
+                    if i % ERROR_EVERY == 0 and j == 0:
+                        span.set_status(
+                            trace.Status(trace.StatusCode.ERROR, "Syntax error")
+                        )
+    provider.shutdown()
+    return (time.perf_counter() - started) / INVOCATIONS * 1e6
+
+
+def main() -> None:
+    print(f"{INVOCATIONS * (1 + 2 * TOOL_CALLS)} spans in {INVOCATIONS} invocations")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, rate in (
+            ("export all", None),
+            ("sample 10%", 0.1),
+            ("sample 1%", 0.01),
+        ):
+            path = os.path.join(directory, f"{name}.jsonl")
+            processor: SpanProcessor = BatchSpanProcessor(FileSpanExporter(path))
+            if rate is not None:
+                processor = TailSamplingSpanProcessor(processor, sample_rate=rate)
+            us = run(processor)
+            with open(path) as f:
+                spans = sum(1 for _ in f)
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{name:12} {us:8.0f} us/invocation {spans:8d} spans {size:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
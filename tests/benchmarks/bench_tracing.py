@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the throughput of the span exporter in spans per second.
+
+Cloud Logging, Cloud Trace and GCS are replaced by fakes that sleep for a
+fixed latency per API call, so the numbers show how the exporter scales
+with the number of calls it makes rather than the speed of the network.
+The per-span export path the exporter used before is measured alongside.
+
+Usage: uv run python tests/benchmarks/bench_tracing.py
+"""
+
+import json
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from google.cloud.logging_v2.logger import Logger
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.utils.tracing import CloudTraceLoggingSpanExporter
+
+# Latency of one Cloud Logging, Cloud Trace or GCS API call.
+API_LATENCY_SECONDS = 0.005
+BATCH_SIZE = 512  # The BatchSpanProcessor's default export batch size.
+LARGE_SPAN_EVERY = 50
+
+
+class FakeLoggingClient:
+    project = "bench-project"
+
+    def __init__(self) -> None:
+        self.logging_api = SimpleNamespace(write_entries=self.write_entries)
+
+    def write_entries(self, entries: list[dict], **kwargs: Any) -> None:
+        time.sleep(API_LATENCY_SECONDS)
+
+    def logger(self, name: str) -> Logger:
+        logger = Logger(name, client=self)
+        # The fake client has no API for Logger.log_struct to call.
+        logger.log_struct = lambda info, **kwargs: time.sleep(API_LATENCY_SECONDS)  # type: ignore[method-assign]
+        return logger
+
+
+def slow_call(*args: Any, **kwargs: Any) -> bool:
+    time.sleep(API_LATENCY_SECONDS)
+    return True
+
+
+bucket = SimpleNamespace(
+    exists=slow_call, blob=lambda name: SimpleNamespace(upload_from_string=slow_call)
+)
+
+
+def make_spans(count: int) -> list[ReadableSpan]:
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer(__name__)
+    for i in range(count):
+        with tracer.start_as_current_span("call_llm") as span:
+            span.set_attribute("gen_ai.request.model", "gemini-2.5-pro")
+            span.set_attribute(
+                "llm_request", "x" * (300 * 1024 if i % LARGE_SPAN_EVERY == 0 else 2000)
+            )
+    return list(memory.get_finished_spans())
+
+
+def make_exporter() -> CloudTraceLoggingSpanExporter:
+    return CloudTraceLoggingSpanExporter(
+        logging_client=FakeLoggingClient(),  # type: ignore[arg-type]
+        storage_client=SimpleNamespace(bucket=lambda name: bucket),
+        project_id="bench-project",
+        client=SimpleNamespace(batch_write_spans=slow_call),
+    )
+
+
+def legacy_export(
+    exporter: CloudTraceLoggingSpanExporter, spans: list[ReadableSpan]
+) -> None:
+    """The previous export path: a JSON round trip, one log write and one bucket check per span."""
+    for span in spans:
+        span_context = span.get_span_context()
+        assert span_context is not None
+        span_id = format(span_context.span_id, "x")
+        span_dict = json.loads(span.to_json())
+        attributes = span_dict["attributes"]
+        if len(json.dumps(attributes).encode()) > 255 * 1024:
+            bucket.exists()
+            bucket.blob(span_id).upload_from_string(
+                json.dumps(dict(attributes.items()))
+            )
+        exporter.logger.log_struct(span_dict, severity="INFO")
+    exporter.client.batch_write_spans(request=None)
+
+
+def spans_per_second(export: Any, spans: list[ReadableSpan]) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(spans), BATCH_SIZE):
+        export(spans[i : i + BATCH_SIZE])
+    return len(spans) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    spans = make_spans(2048)
+    exporter = make_exporter()
+    legacy = spans_per_second(lambda batch: legacy_export(exporter, batch), spans)
+    print(f"per-span export    {legacy:10.0f} spans/s")
+    batched = spans_per_second(exporter.export, spans)
+    exporter.force_flush()
+    print(f"batched export     {batched:10.0f} spans/s ({batched / legacy:.0f}x)")
+    exporter.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app import agent
+
+
+@pytest.mark.asyncio
+async def test_preload_catalog_writes_state_only_when_reloaded(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    overview = {"text": "sales: orders", "version": [1.0]}
+    monkeypatch.setattr(agent.bigquery, "catalog_overview", lambda: dict(overview))
+    state: dict[str, Any] = {}
+    callback_context: Any = SimpleNamespace(state=state)
+
+    await agent.preload_catalog_callback(callback_context)
+    assert state == {"catalog": "sales: orders", "catalog_version": [1.0]}
+
+    state["catalog"] = "unchanged"
+    await agent.preload_catalog_callback(callback_context)
+    assert state["catalog"] == "unchanged"
+
+    overview.update(text="sales: orders, refunds", version=[2.0])
+    await agent.preload_catalog_callback(callback_context)
+    assert state["catalog"] == "sales: orders, refunds"
+
+
+def _grounded_event(*urls: str) -> Any:
+    chunks = [SimpleNamespace(web=SimpleNamespace(uri=url, title=None)) for url in urls]
+    return SimpleNamespace(grounding_metadata=SimpleNamespace(grounding_chunks=chunks))
+
+
+def test_search_sources_are_collected_incrementally() -> None:
+    events = [_grounded_event("https://a", "https://b", "https://a")]
+    state: dict[str, Any] = {}
+    callback_context: Any = SimpleNamespace(
+        state=state,
+        _invocation_context=SimpleNamespace(session=SimpleNamespace(events=events)),
+    )
+
+    agent.collect_search_sources_callback(callback_context)
+    assert [s["url"] for s in state["search_sources"]] == ["https://a", "https://b"]
+    assert state["search_sources_cursor"] == 1
+
+    events += [SimpleNamespace(grounding_metadata=None), _grounded_event("https://c")]
+    agent.collect_search_sources_callback(callback_context)
+    assert state["search_sources"] == [{"url": "https://c", "title": "https://c"}]
+    assert state["search_sources_cursor"] == 3
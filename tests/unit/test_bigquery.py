@@ -0,0 +1,126 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from google.api_core import exceptions
+
+from app.utils import bigquery as bq
+from app.utils.result_store import PREVIEW_ROWS, LocalResultStore
+from app.utils.results import MAX_RESULT_ROWS
+
+
+class FakeRowIterator:
+    def __init__(self, rows: list[dict], max_results: int | None = None) -> None:
+        self._rows = rows[:max_results]
+        self.total_rows = len(rows)
+        self.schema: list[Any] = []
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._rows)
+
+
+class FakeQueryJob:
+    def __init__(self, rows: list[dict]) -> None:
+        self.rows = rows
+        self.job_id = "job-1"
+        self.error_result = None
+        self.state = "DONE"
+        self.total_bytes_processed = 2048
+        self.statement_type = "SELECT"
+        self.referenced_tables: list[Any] = []
+        self.started = None
+
+    def result(self, max_results: int | None = None, **kwargs: Any) -> FakeRowIterator:
+        return FakeRowIterator(self.rows, max_results)
+
+
+class FakeClient:
+    project = "test-project"
+
+    def __init__(self) -> None:
+        self.jobs: list[tuple[str, bool]] = []
+
+    def query(self, query: str, job_config: Any = None) -> FakeQueryJob:
+        dry_run = bool(job_config and job_config.dry_run)
+        self.jobs.append((query, dry_run))
+        if "syntax error" in query:
+            raise exceptions.BadRequest("Syntax error: unexpected keyword")
+        return FakeQueryJob([{"n": 1}, {"n": 2}])
+
+
+@pytest.fixture
+def client() -> Iterator[FakeClient]:
+    fake = FakeClient()
+
+    def factory(project: str | None, location: str | None) -> Any:
+        return fake
+
+    bq.client_manager.set_client_factory(factory)
+    bq.dry_run_memo.invalidate()
+    bq.query_cache.cache.invalidate()
+    yield fake
+    bq.client_manager.set_client_factory(None)
+
+
+def test_run_query_dry_runs_then_executes(client: FakeClient) -> None:
+    result = bq.run_query("SELECT n FROM d.t")
+    assert result["total_bytes_processed"] == 2048
+    assert result["rows"] == [{"n": 1}, {"n": 2}]
+    assert [dry_run for _, dry_run in client.jobs] == [True, False]
+
+
+def test_run_query_memoizes_dry_runs(client: FakeClient) -> None:
+    bq.run_query("SELECT n FROM d.t")
+    bq.run_query("select n\n FROM d.t -- again")
+    assert [dry_run for _, dry_run in client.jobs].count(True) == 1
+
+
+def test_run_query_returns_validation_error(client: FakeClient) -> None:
+    result = bq.run_query("SELECT syntax error")
+    assert result["status"] == "INVALID"
+    assert "Syntax error" in result["error"]
+    assert bq.run_query("SELECT syntax error") == result
+    assert len(client.jobs) == 1
+
+
+def test_run_query_checks_locally_first(client: FakeClient) -> None:
+    result = bq.run_query("SELECT REGEXP_QUOTE(name) FROM d.t")
+    assert result["status"] == "INVALID" and result["checked_locally"]
+    assert client.jobs == []
+
+    result = bq.run_query("SELECT n FROM d.t")
+    assert result["limit_added"] == 10
+    assert client.jobs[-1] == ("SELECT n FROM d.t\nLIMIT 10", False)
+
+
+def test_large_results_are_stored_in_full(
+    client: FakeClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(bq, "result_store", LocalResultStore(str(tmp_path)))
+    total = MAX_RESULT_ROWS + 500
+    job = FakeQueryJob([{"n": i} for i in range(total)])
+
+    result = bq.collect_query_results("SELECT n FROM d.big", job)  # type: ignore[arg-type]
+    assert (result["total_rows"], result["rows_returned"]) == (total, total)
+    assert not result["truncated"] and len(result["preview"]) == PREVIEW_ROWS
+
+    stored = bq.query_stored_result(
+        result["result_id"], "SELECT MAX(n) AS n FROM result"
+    )
+    assert stored["rows"] == [{"n": total - 1}]
+    assert (stored["result_total_rows"], stored["truncated"]) == (total, False)
@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.utils import bigquery_async
+from app.utils.jobs import JobRegistry
+
+
+class FakeJob:
+    job_id = "job-1"
+
+    def __init__(self, polls_until_done: int, error_result: dict | None = None) -> None:
+        self.polls_until_done = polls_until_done
+        self.error_result = error_result
+        self.polls = 0
+        self.cancelled = False
+
+    def done(self) -> bool:
+        self.polls += 1
+        return self.polls >= self.polls_until_done
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(bigquery_async, "POLL_INITIAL_DELAY", 0.001)
+    monkeypatch.setattr(bigquery_async, "POLL_MAX_DELAY", 0.01)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_job_polls_until_done() -> None:
+    job = FakeJob(polls_until_done=3)
+    await bigquery_async.wait_for_job(job)  # type: ignore[arg-type]
+    assert job.polls == 3
+    assert not job.cancelled
+
+
+@pytest.mark.asyncio
+async def test_waits_run_concurrently_on_one_event_loop() -> None:
+    jobs = [FakeJob(polls_until_done=5) for _ in range(200)]
+    await asyncio.gather(*(bigquery_async.wait_for_job(job) for job in jobs))  # type: ignore[arg-type]
+    assert all(job.polls == 5 for job in jobs)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_wait_cancels_the_job() -> None:
+    job = FakeJob(polls_until_done=10**9)
+    task = asyncio.create_task(bigquery_async.wait_for_job(job))  # type: ignore[arg-type]
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert job.cancelled
+
+
+@pytest.mark.asyncio
+async def test_jobs_failing_while_polled_are_counted_as_failed() -> None:
+    registry = JobRegistry()
+    for job in (FakeJob(3), FakeJob(3, {"reason": "invalidQuery"})):
+        with registry.track(job):  # type: ignore[arg-type]
+            await bigquery_async.wait_for_job(job)  # type: ignore[arg-type]
+    assert registry.stats()["completed"] == 1 and registry.stats()["failed"] == 1
@@ -0,0 +1,96 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_or_load_counts_hits_and_misses() -> None:
+    cache = TTLCache(maxsize=4, ttl=10)
+    calls = []
+
+    def loader() -> str:
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_load("key", loader) == "value"
+    assert cache.get_or_load("key", loader) == "value"
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_concurrent_misses_call_the_loader_once() -> None:
+    cache = TTLCache(maxsize=4, ttl=10)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def loader() -> str:
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    def load(_: int) -> str:
+        barrier.wait()
+        return cache.get_or_load("key", loader)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(load, range(8))) == ["value"] * 8
+    assert len(calls) == 1
+    assert cache.get_or_load("other", lambda: "other") == "other"
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, timer=clock)
+    cache.set("key", "value")
+    clock.now = 9
+    assert cache.get("key") == "value"
+    clock.now = 11
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_to_stay_under_max_bytes() -> None:
+    cache = TTLCache(maxsize=10, ttl=10, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 8
+    cache.set("huge", "x" * 11)
+    assert "huge" not in cache
@@ -0,0 +1,171 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from types import SimpleNamespace
+from typing import Any
+
+from google.api_core import exceptions
+
+from app.utils.cache import TTLCache
+from app.utils.catalog import (
+    CATALOG_PARTIAL_TTL_SECONDS,
+    BigQueryCatalog,
+    CatalogEntry,
+    CatalogSnapshot,
+)
+
+SNAPSHOT = CatalogSnapshot(
+    project="other-project",
+    entries=(
+        CatalogEntry("sales", "orders", "BASE TABLE"),
+        CatalogEntry("sales", "daily_revenue", "VIEW"),
+        CatalogEntry("web", "events", "BASE TABLE"),
+    ),
+    failed_datasets=("hr",),
+)
+
+
+def test_describe_lists_resources_per_dataset() -> None:
+    assert SNAPSHOT.describe(qualified=True).splitlines() == [
+        "other-project.sales: orders, daily_revenue (view)",
+        "other-project.web: events",
+        "(incomplete: could not list other-project.hr)",
+    ]
+
+
+def test_describe_counts_resources_of_large_catalogs() -> None:
+    assert SNAPSHOT.describe(max_resources=2).splitlines()[:2] == [
+        "sales: 2 resources",
+        "web: 1 resource",
+    ]
+
+
+class FakeClient:
+    """Lists `sales` in the US, `web` in the EU and `hr` without a location.
+
+    Calls for a region or dataset in `failing` raise, and so does looking up
+    the location of a dataset `d` when `d:location` is in `failing`.
+    """
+
+    project = "my-project"
+
+    def __init__(self, failing: tuple[str, ...] = ()) -> None:
+        self.datasets = {"sales": "US", "web": "EU", "hr": None}
+        self.tables = [
+            ("sales", "orders", "BASE TABLE"),
+            ("sales", "daily_revenue", "VIEW"),
+            ("web", "events", "BASE TABLE"),
+            ("web", "sessions", "MATERIALIZED VIEW"),
+        ]
+        self.failing = failing
+        self.calls: list[str] = []
+
+    def list_datasets(self, project: str, timeout: float) -> list[Any]:
+        self.calls.append("list_datasets")
+        return [SimpleNamespace(dataset_id=dataset_id) for dataset_id in self.datasets]
+
+    def get_dataset(self, dataset: str, timeout: float) -> Any:
+        dataset_id = dataset.split(".")[1]
+        if f"{dataset_id}:location" in self.failing:
+            raise exceptions.Forbidden("Access denied")
+        return SimpleNamespace(location=self.datasets[dataset_id])
+
+    def query(self, sql: str) -> Any:
+        region = re.search(r"region-([\w-]+)", sql).group(1)  # type: ignore[union-attr]
+        self.calls.append(f"query {region}")
+        if region in self.failing:
+            raise exceptions.Forbidden("Access denied")
+        rows = [
+            {
+                "table_schema": dataset_id,
+                "table_name": table_id,
+                "table_type": table_type,
+            }
+            for dataset_id, table_id, table_type in self.tables
+            if (self.datasets[dataset_id] or "US").lower() == region
+        ]
+        return SimpleNamespace(result=lambda: rows)
+
+    def list_tables(self, dataset: str, timeout: float) -> list[Any]:
+        dataset_id = dataset.split(".")[1]
+        self.calls.append(f"list_tables {dataset_id}")
+        if dataset_id in self.failing:
+            raise exceptions.Forbidden("Access denied")
+        return [
+            SimpleNamespace(table_id=table_id, table_type="TABLE")
+            for d, table_id, _ in self.tables
+            if d == dataset_id
+        ]
+
+
+def make_catalog(client: FakeClient, clock: list[float]) -> BigQueryCatalog:
+    return BigQueryCatalog(
+        client_factory=lambda: client,  # type: ignore[arg-type,return-value]
+        location="US",
+        cache=TTLCache(timer=lambda: clock[0]),
+    )
+
+
+def test_snapshot_lists_tables_of_every_dataset_location() -> None:
+    client = FakeClient()
+    snapshot = make_catalog(client, [0.0]).snapshot("my-project")
+
+    assert snapshot.resources() == [
+        "sales.daily_revenue",
+        "sales.orders",
+        "web.events",
+        "web.sessions",
+    ]
+    assert snapshot.regions == ("eu", "us")
+    assert sorted(client.calls) == ["list_datasets", "query eu", "query us"]
+    assert snapshot.describe().splitlines() == [
+        "sales: daily_revenue (view), orders",
+        "web: events, sessions (view)",
+    ]
+
+
+def test_datasets_of_failing_regions_are_crawled() -> None:
+    clock = [0.0]
+    client = FakeClient(failing=("eu",))
+    catalog = make_catalog(client, clock)
+    snapshot = catalog.snapshot("my-project")
+    assert snapshot.resources() == [
+        "sales.daily_revenue",
+        "sales.orders",
+        "web.events",
+        "web.sessions",
+    ]
+    assert snapshot.regions == ("us",) and not snapshot.partial
+    assert "list_tables web" in client.calls and "list_tables sales" not in client.calls
+
+    # So are datasets whose location cannot be read.
+    client.failing = ("web:location",)
+    client.calls.clear()
+    catalog.invalidate()
+    snapshot = catalog.snapshot("my-project")
+    assert len(snapshot.resources()) == 4 and snapshot.regions == ("us",)
+    assert "list_tables web" in client.calls and "query eu" not in client.calls
+
+    # Datasets that cannot be crawled either make the snapshot partial,
+    # and partial snapshots are reloaded sooner.
+    client.failing = ("eu", "web")
+    catalog.invalidate()
+    snapshot = catalog.snapshot("my-project")
+    assert snapshot.failed_datasets == ("web",)
+    assert snapshot.resources() == ["sales.daily_revenue", "sales.orders"]
+    clock[0] += CATALOG_PARTIAL_TTL_SECONDS + 1
+    client.calls.clear()
+    catalog.snapshot("my-project")
+    assert "list_datasets" in client.calls
@@ -0,0 +1,52 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+from app.utils.clients import BigQueryClientManager
+
+
+class FakeClient:
+    def __init__(self, project: str | None, location: str | None) -> None:
+        self.project = project
+        self.location = location
+
+
+def test_clients_are_reused_per_project_and_location() -> None:
+    created: list[Any] = []
+
+    def factory(project: str | None, location: str | None) -> Any:
+        client = FakeClient(project, location)
+        created.append(client)
+        return client
+
+    manager = BigQueryClientManager()
+    manager.set_client_factory(factory)
+
+    first = manager.get_client("p1", "US")
+    assert manager.get_client("p1", "US") is first
+    assert manager.get_client("p1", "EU") is not first
+    assert manager.get_client("p2", "US") is not first
+    assert len(created) == 3
+
+
+def test_set_client_factory_drops_existing_clients() -> None:
+    def factory(project: str | None, location: str | None) -> Any:
+        return FakeClient(project, location)
+
+    manager = BigQueryClientManager()
+    manager.set_client_factory(factory)
+    first = manager.get_client()
+    manager.set_client_factory(factory)
+    assert manager.get_client() is not first
@@ -0,0 +1,82 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+from typing import Any
+
+from google.genai import types
+
+from app.utils.compaction import ContextCompactor
+from app.utils.result_store import LocalResultStore
+
+ROWS = [{"country": f"country-{i}", "revenue": i * 10.5} for i in range(40)]
+
+
+def _tool_response(call_id: str, response: dict[str, Any]) -> types.Content:
+    return types.Content(
+        role="user",
+        parts=[
+            types.Part(
+                function_response=types.FunctionResponse(
+                    id=call_id, name="execute_query", response=response
+                )
+            )
+        ],
+    )
+
+
+def _response(content: types.Content) -> dict[str, Any]:
+    assert content.parts and content.parts[0].function_response
+    response = content.parts[0].function_response.response
+    assert response is not None
+    return response
+
+
+def _history() -> list[types.Content]:
+    return [
+        types.Content(role="user", parts=[types.Part(text="Revenue by country?")]),
+        _tool_response("call-1", {"rows": ROWS, "total_rows": 40, "truncated": False}),
+        types.Content(role="model", parts=[types.Part(text="Here is the revenue.")]),
+        types.Content(role="user", parts=[types.Part(text="And last year?")]),
+        _tool_response("call-2", {"rows": ROWS, "total_rows": 40, "truncated": False}),
+    ]
+
+
+def test_compacts_stale_responses_over_budget(tmp_path: Path) -> None:
+    store = LocalResultStore(str(tmp_path))
+    contents = _history()
+
+    saved = ContextCompactor(result_store=store, budget=100).compact(contents)
+
+    stale = _response(contents[1])
+    assert saved > 0
+    assert stale["compacted"] is True
+    assert stale["total_rows"] == 40
+    assert stale["rows"] == "<40 items omitted>"
+    assert stale["preview"] == ROWS[:3]
+    assert store.get(stale["result_id"]).frame.height == 40
+    # The response of the current turn is left intact.
+    assert _response(contents[4])["rows"] == ROWS
+
+
+def test_keeps_history_within_budget_and_memoizes(tmp_path: Path) -> None:
+    compactor = ContextCompactor(
+        result_store=LocalResultStore(str(tmp_path)), budget=100
+    )
+    assert ContextCompactor(budget=100_000).compact(_history()) == 0
+
+    first, second = _history(), _history()
+    compactor.compact(first)
+    compactor.compact(second)
+    assert _response(first[1]) == _response(second[1])
@@ -0,0 +1,55 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from typing import Any
+
+from app.utils.crawler import CatalogCrawler
+
+
+def _unused_client_factory() -> Any:
+    raise AssertionError("no client expected")
+
+
+def test_fan_out_runs_items_concurrently() -> None:
+    crawler = CatalogCrawler(_unused_client_factory, max_workers=8)
+    start = time.monotonic()
+
+    def work(item: int) -> int:
+        time.sleep(0.1)
+        return item * 2
+
+    outcome = crawler.fan_out(work, range(8))
+    assert time.monotonic() - start < 0.5
+    assert outcome.results == {i: i * 2 for i in range(8)}
+    assert not outcome.partial
+
+
+def test_fan_out_returns_partial_results_on_error_and_timeout() -> None:
+    crawler = CatalogCrawler(_unused_client_factory, max_workers=4)
+    release = threading.Event()
+
+    def work(item: str) -> str:
+        if item == "broken":
+            raise RuntimeError("access denied")
+        if item == "slow":
+            release.wait(5)
+        return item.upper()
+
+    outcome = crawler.fan_out(work, ["ok", "broken", "slow"], timeout=0.2)
+    release.set()
+    assert outcome.results == {"ok": "OK"}
+    assert outcome.errors == {"broken": "access denied", "slow": "timed out"}
+    assert outcome.partial
@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.utils.jobs import JobRegistry
+
+
+class FakeJob:
+    def __init__(self, job_id: str, error_result: dict | None = None) -> None:
+        self.job_id = job_id
+        self.error_result = error_result
+        self.cancelled = False
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+
+def _tool_context(invocation_id: str, session_id: str) -> Any:
+    return SimpleNamespace(
+        invocation_id=invocation_id,
+        _invocation_context=SimpleNamespace(session=SimpleNamespace(id=session_id)),
+    )
+
+
+def test_track_counts_outcomes() -> None:
+    registry = JobRegistry()
+    with registry.track(FakeJob("a")):  # type: ignore[arg-type]
+        assert registry.in_flight() == 1
+    with pytest.raises(asyncio.CancelledError):
+        with registry.track(FakeJob("b")):  # type: ignore[arg-type]
+            raise asyncio.CancelledError
+    with pytest.raises(ValueError):
+        with registry.track(FakeJob("c")):  # type: ignore[arg-type]
+            raise ValueError("bad query")
+    # Jobs that finish while the block waits on them are counted by their state.
+    with registry.track(FakeJob("d", {"reason": "invalidQuery"})):  # type: ignore[arg-type]
+        pass
+    with registry.track(FakeJob("e", {"reason": "timeout"})):  # type: ignore[arg-type]
+        pass
+    assert registry.stats() == {
+        "in_flight": 0,
+        "completed": 1,
+        "failed": 2,
+        "cancelled": 2,
+    }
+
+
+def test_cancel_only_touches_the_given_session() -> None:
+    registry = JobRegistry()
+    mine, theirs = FakeJob("mine"), FakeJob("theirs")
+    with registry.track(mine, _tool_context("inv-1", "session-1")):  # type: ignore[arg-type]
+        with registry.track(theirs, _tool_context("inv-2", "session-2")):  # type: ignore[arg-type]
+            assert registry.cancel(session_id="session-1") == 1
+            assert mine.cancelled
+            assert not theirs.cancelled
+    stats = registry.stats()
+    assert stats["cancelled"] == 1
+    assert stats["completed"] == 1
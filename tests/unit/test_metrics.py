@@ -0,0 +1,95 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+import pytest
+
+from app.utils import metrics as metrics_module
+from app.utils.metrics import MetricsRegistry, Sample, instrument_tool
+from app.utils.middleware import MetricsMiddleware, http_in_flight, time_to_first_event
+
+
+def test_render_prometheus_text_format() -> None:
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.", ("path",)).inc(path="/run")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    registry.register_collector(
+        lambda: [
+            Sample("cache_hits_total", "Hits.", "counter", {"cache": "a"}, 3),
+            Sample("cache_ratio", "Ratio.", "gauge", {"cache": "a"}, 0.75),
+            Sample("cache_hits_total", "Hits.", "counter", {"cache": "b"}, 1),
+        ]
+    )
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{path="/run"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_sum 0.55" in lines
+    assert "latency_seconds_count 2" in lines
+    hits = lines.index('cache_hits_total{cache="a"} 3')
+    assert lines[hits + 1] == 'cache_hits_total{cache="b"} 1'
+
+
+@pytest.mark.asyncio
+async def test_instrument_tool_counts_outcomes() -> None:
+    def get_rows(n: int) -> dict:
+        """Returns rows."""
+        return {"rows": []} if n else {"error": "bad"}
+
+    async def get_rows_async(n: int) -> dict:
+        return get_rows(n)
+
+    tool = instrument_tool(get_rows)
+    async_tool = instrument_tool(get_rows_async)
+    tool(1)
+    tool(0)
+    await async_tool(1)
+
+    calls = metrics_module.tool_calls
+    assert tool.__name__ == "get_rows" and tool.__doc__ == "Returns rows."
+    assert calls.value(tool="get_rows", outcome="ok") == 1
+    assert calls.value(tool="get_rows", outcome="error") == 1
+    assert calls.value(tool="get_rows_async", outcome="ok") == 1
+    assert metrics_module.tool_latency.count(tool="get_rows") == 2
+
+
+@pytest.mark.asyncio
+async def test_middleware_records_time_to_first_event() -> None:
+    in_flight_during_request = []
+
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        in_flight_during_request.append(http_in_flight.value(path="/run_sse"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send(
+            {"type": "http.response.body", "body": b"data: {}\n\n", "more_body": True}
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: Any) -> None:
+        pass
+
+    before = time_to_first_event.count(path="/run_sse")
+    await MetricsMiddleware(app)({"type": "http", "path": "/run_sse"}, receive, send)
+
+    assert in_flight_during_request == [1]
+    assert http_in_flight.value(path="/run_sse") == 0
+    assert time_to_first_event.count(path="/run_sse") == before + 1
@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.tools import FunctionTool, ToolContext
+from google.genai import types
+
+from app.utils.parallel_tools import ParallelToolExecutor
+
+
+async def get_table_schema(table_id: str, tool_context: ToolContext) -> dict:
+    """Looks up a table."""
+    await asyncio.sleep(0.2 if table_id == "slow" else 0.1)
+    tool_context.state[f"looked_up:{table_id}"] = True
+    return {"table": table_id}
+
+
+async def list_datasets() -> list:
+    """Lists datasets."""
+    return []
+
+
+async def run_all(
+    executor: ParallelToolExecutor, *calls: tuple[str, dict]
+) -> list[Any]:
+    """Runs the calls of one model response the way ADK does, one after another."""
+    function_calls = [
+        types.FunctionCall(id=f"call-{i}", name=name, args=args)
+        for i, (name, args) in enumerate(calls)
+    ]
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.append(
+        Event(
+            author="root_agent",
+            content=types.Content(
+                role="model",
+                parts=[types.Part(function_call=c) for c in function_calls],
+            ),
+        )
+    )
+    invocation_context: Any = SimpleNamespace(session=session)
+    results = []
+    for i, (name, args) in enumerate(calls):
+        tool = executor.tools[name]
+        tool_context = ToolContext(invocation_context, function_call_id=f"call-{i}")
+        result = await executor.before_tool_callback(tool, args, tool_context)
+        answered = result is not None
+        if not answered:
+            result = await tool.run_async(args=args, tool_context=tool_context)
+        results.append((result, dict(tool_context.actions.state_delta), answered))
+    return results
+
+
+@pytest.mark.asyncio
+async def test_calls_of_one_response_run_concurrently_in_order() -> None:
+    starts: list[str | None] = []
+    executor = ParallelToolExecutor(
+        [FunctionTool(get_table_schema)],
+        max_concurrency=4,
+        on_start=lambda tool, args, tool_context: starts.append(
+            tool_context.function_call_id
+        ),
+    )
+    tables = ["orders", "slow", "customers"]
+
+    started = time.perf_counter()
+    results = await run_all(
+        executor, *(("get_table_schema", {"table_id": table}) for table in tables)
+    )
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert [result for result, _, _ in results] == [
+        {"table": table} for table in tables
+    ]
+    # State changes land in the context of the call that made them.
+    assert [delta for _, delta, _ in results] == [
+        {f"looked_up:{t}": True} for t in tables
+    ]
+    assert not executor._pending
+    assert starts == ["call-0", "call-1", "call-2"]
+
+
+@pytest.mark.asyncio
+async def test_bounded_timed_out_and_single_calls() -> None:
+    executor = ParallelToolExecutor(
+        [FunctionTool(get_table_schema), FunctionTool(list_datasets)],
+        max_concurrency=1,
+        timeout=0.15,
+    )
+    results = await run_all(
+        executor,
+        ("get_table_schema", {"table_id": "slow"}),
+        ("list_datasets", {}),
+    )
+    assert results[0][0] == {
+        "error": "get_table_schema did not finish within 0.15 seconds."
+    }
+    assert results[1][0] == {"result": []}
+
+    # A response with a single call is left to ADK.
+    [(result, _, answered)] = await run_all(executor, ("list_datasets", {}))
+    assert result == [] and not answered
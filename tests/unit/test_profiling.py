@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from types import SimpleNamespace
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils import profiling
+from app.utils.profiling import TableProfiler
+
+MODIFIED = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeClient:
+    def __init__(self, num_bytes: int, table_type: str = "TABLE") -> None:
+        self.table = bigquery.Table(
+            "p.sales.orders",
+            schema=[
+                bigquery.SchemaField("country", "STRING"),
+                bigquery.SchemaField("amount", "FLOAT"),
+                bigquery.SchemaField("tags", "STRING", mode="REPEATED"),
+            ],
+        )
+        self.table._properties.update(
+            {
+                "type": table_type,
+                "numBytes": str(num_bytes),
+                "numRows": "1000000",
+                "lastModifiedTime": str(int(MODIFIED.timestamp() * 1000)),
+            }
+        )
+        self.queries: list[str] = []
+        self.dry_run_bytes = 0
+
+    def dataset(self, dataset_id: str) -> bigquery.DatasetReference:
+        return bigquery.DatasetReference("p", dataset_id)
+
+    def get_table(self, ref: Any) -> bigquery.Table:
+        return self.table
+
+    def query(self, sql: str, job_config: Any = None) -> Any:
+        if job_config is not None and job_config.dry_run:
+            return SimpleNamespace(total_bytes_processed=self.dry_run_bytes)
+        self.queries.append(sql)
+        row = {
+            "sampled_rows": 200,
+            "c0_nulls": 50,
+            "c0_distinct": 2,
+            "c0_top": [{"value": "DE", "count": 100}, {"value": None, "count": 50}],
+            "c0_min": "DE",
+            "c0_max": "FR",
+            "c1_nulls": 0,
+            "c1_min": 0.5,
+            "c1_max": 99.5,
+        }
+        return SimpleNamespace(result=lambda: iter([row]))
+
+
+def test_profile_samples_large_tables() -> None:
+    client: Any = FakeClient(num_bytes=100 * profiling.PROFILE_SAMPLE_BYTES)
+    profile = TableProfiler(lambda: client).profile("sales", "orders")
+
+    assert "TABLESAMPLE SYSTEM (1.000 PERCENT)" in client.queries[0]
+    assert "tags" not in client.queries[0]
+    assert "APPROX_COUNT_DISTINCT(`amount`)" not in client.queries[0]
+    assert profile["columns"] == [
+        {
+            "name": "country",
+            "type": "STRING",
+            "null_fraction": 0.25,
+            "approx_distinct": 2,
+            "top_values": [{"value": "DE", "count": 100}],
+            "min": "DE",
+            "max": "FR",
+        },
+        {
+            "name": "amount",
+            "type": "FLOAT",
+            "null_fraction": 0.0,
+            "min": 0.5,
+            "max": 99.5,
+        },
+    ]
+
+
+def test_profile_is_cached_until_the_table_changes() -> None:
+    client: Any = FakeClient(num_bytes=1024)
+    profiler = TableProfiler(lambda: client)
+
+    profiler.profile("sales", "orders")
+    profiler.profile("sales", "orders")
+    assert len(client.queries) == 1
+    assert "TABLESAMPLE" not in client.queries[0]
+
+    client.table._properties["lastModifiedTime"] = str(
+        int(MODIFIED.timestamp() * 1000) + 60_000
+    )
+    profiler.profile("sales", "orders")
+    assert len(client.queries) == 2
+
+
+def test_views_are_only_profiled_when_they_scan_little() -> None:
+    client: Any = FakeClient(num_bytes=0, table_type="VIEW")
+    client.dry_run_bytes = 10 * profiling.PROFILE_SAMPLE_BYTES
+    profile = TableProfiler(lambda: client).profile("sales", "orders")
+    assert "error" in profile and client.queries == []
+
+    client.dry_run_bytes = profiling.PROFILE_SAMPLE_BYTES
+    profile = TableProfiler(lambda: client).profile("sales", "orders")
+    assert profile["sample"] == "all rows" and len(profile["columns"]) == 2
+    assert "LIMIT" not in client.queries[0] and "TABLESAMPLE" not in client.queries[0]
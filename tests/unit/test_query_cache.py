@@ -0,0 +1,76 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from collections.abc import Sequence
+from types import SimpleNamespace
+from typing import Any
+
+from app.utils.query_cache import QueryResultCache
+from app.utils.sql import normalize_sql
+
+T0 = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _job(**overrides: Any) -> Any:
+    job = {
+        "statement_type": "SELECT",
+        "referenced_tables": [
+            SimpleNamespace(project="p", dataset_id="d", table_id="t")
+        ],
+        "started": T0 + datetime.timedelta(minutes=1),
+        "total_bytes_processed": 1000,
+    }
+    job.update(overrides)
+    return SimpleNamespace(**job)
+
+
+def test_normalize_sql_ignores_formatting_but_not_literals() -> None:
+    assert normalize_sql("SELECT a,  b -- note\nFROM `p.d.t`;") == normalize_sql(
+        "select a, b from `p.d.t`"
+    )
+    assert normalize_sql("SELECT 'US'") != normalize_sql("SELECT 'us'")
+    assert normalize_sql("SELECT * FROM MyData.t") != normalize_sql(
+        "SELECT * FROM mydata.t"
+    )
+
+
+def test_hit_until_a_referenced_table_changes() -> None:
+    versions = {"p.d.t": T0}
+
+    def table_versions(tables: Sequence[str]) -> dict:
+        return {table: versions.get(table) for table in tables}
+
+    cache = QueryResultCache(table_versions)
+    result = {"rows": [{"n": 1}]}
+    cache.put("SELECT n FROM d.t", _job(), result)
+
+    assert cache.get("select n\n  from d.t") == result
+    versions["p.d.t"] = T0 + datetime.timedelta(hours=1)
+    assert cache.get("SELECT n FROM d.t") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["stale"] == 1
+    assert stats["bytes_saved"] == 1000
+    assert stats["entries"] == 0
+
+
+def test_uncacheable_queries_are_skipped() -> None:
+    cache = QueryResultCache(lambda tables: dict.fromkeys(tables, T0))
+    cache.put("SELECT CURRENT_DATE() FROM d.t", _job(), {"rows": []})
+    cache.put("DELETE FROM d.t WHERE TRUE", _job(statement_type="DELETE"), {})
+    cache.put("SELECT 1", _job(referenced_tables=[]), {"rows": []})
+    cache.put("SELECT n FROM d.t", _job(started=T0 - datetime.timedelta(1)), {})
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,95 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.utils import response_cache
+from app.utils.response_cache import (
+    MemoryBackend,
+    ResponseCache,
+    ResponseCacheBackend,
+    SqliteBackend,
+)
+
+SEARCH_AGENT: Any = SimpleNamespace(name="search_agent")
+SOURCES = [
+    {
+        "url": "https://cloud.google.com/bigquery/docs/bi-engine-intro",
+        "title": "BI Engine",
+    }
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request: pytest.FixtureRequest, tmp_path: Path) -> ResponseCacheBackend:
+    if request.param == "sqlite":
+        return SqliteBackend(str(tmp_path / "cache.sqlite3"))
+    return MemoryBackend()
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_are_answered_from_the_cache(
+    backend: ResponseCacheBackend,
+) -> None:
+    cache = ResponseCache("search_agent", backend=backend)
+    tool_context: Any = SimpleNamespace(state={})
+    args = {"request": "What is BI Engine?"}
+
+    assert await cache.before_tool_callback(SEARCH_AGENT, args, tool_context) is None
+    tool_context.state["search_sources"] = SOURCES
+    await cache.after_tool_callback(
+        SEARCH_AGENT, args, tool_context, "BI Engine is ..."
+    )
+
+    other_context: Any = SimpleNamespace(state={})
+    response = await cache.before_tool_callback(
+        SEARCH_AGENT, {"request": "what is  BI engine"}, other_context
+    )
+    assert response == {"result": "BI Engine is ...", "cached": True}
+    assert other_context.state["search_sources"] == SOURCES
+    assert cache.stats()["hits"] == 1
+    # Other tools are not cached.
+    run_query: Any = SimpleNamespace(name="run_query")
+    assert await cache.before_tool_callback(run_query, args, tool_context) is None
+
+
+def test_sqlite_backend_expires_and_evicts(tmp_path: Path) -> None:
+    now = [0.0]
+    backend = SqliteBackend(
+        str(tmp_path / "cache.sqlite3"), max_entries=2, ttl=10, timer=lambda: now[0]
+    )
+    for i, key in enumerate(("a", "b", "c")):
+        now[0] = i
+        backend.set(key, {"answer": key})
+
+    assert backend.get("a") is None
+    assert backend.get("c") == {"answer": "c"}
+    now[0] = 20
+    assert backend.get("c") is None
+
+
+def test_sqlite_backend_needs_an_explicit_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(response_cache, "SEARCH_CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(response_cache, "SEARCH_CACHE_PATH", None)
+    assert isinstance(response_cache.create_backend(), MemoryBackend)
+    monkeypatch.setattr(
+        response_cache, "SEARCH_CACHE_PATH", str(tmp_path / "cache.sqlite3")
+    )
+    assert isinstance(response_cache.create_backend(), SqliteBackend)
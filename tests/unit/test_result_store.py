@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.utils.result_store import LocalResultStore, query_frame, summarize
+
+ROWS: list[dict[str, Any]] = [
+    {"country": "US", "revenue": 10.0},
+    {"country": "US", "revenue": 5.0},
+    {"country": "FR", "revenue": None},
+]
+
+
+def test_local_store_round_trips_through_parquet(tmp_path: Path) -> None:
+    store = LocalResultStore(str(tmp_path))
+    result_id, _ = store.put(ROWS)
+    assert (tmp_path / f"{result_id}.parquet").exists()
+
+    fresh_store = LocalResultStore(str(tmp_path))
+    stored = fresh_store.get(result_id)
+    assert (stored.frame.to_dicts(), stored.total_rows, stored.truncated) == (
+        ROWS,
+        3,
+        False,
+    )
+    for bad_id in ("missing", f"../{tmp_path.name}/{result_id}", result_id.upper()):
+        with pytest.raises(KeyError):
+            fresh_store.get(bad_id)
+
+
+def test_results_past_the_row_cap_are_stored_truncated(tmp_path: Path) -> None:
+    _, stored = LocalResultStore(str(tmp_path)).put(iter(ROWS), max_rows=2)
+    assert (stored.frame.height, stored.total_rows, stored.truncated) == (2, None, True)
+
+    # Fewer rows than the known size of the result also mark it truncated.
+    result_id, _ = LocalResultStore(str(tmp_path)).put(ROWS, total_rows=10)
+    stored = LocalResultStore(str(tmp_path)).get(result_id)
+    assert (stored.frame.height, stored.total_rows, stored.truncated) == (3, 10, True)
+
+
+def test_summarize_reports_per_column_stats(tmp_path: Path) -> None:
+    _, stored = LocalResultStore(str(tmp_path)).put(ROWS)
+    stats = summarize(stored.frame)
+    assert stats["revenue"]["nulls"] == 1
+    assert stats["revenue"]["max"] == 10.0
+    assert stats["country"]["distinct"] == 2
+
+
+def test_query_frame_pages_and_aggregates(tmp_path: Path) -> None:
+    df = LocalResultStore(str(tmp_path)).put(ROWS)[1].frame
+    page = query_frame(df, offset=1, limit=1)
+    assert page["rows"] == [ROWS[1]]
+    assert page["total_rows"] == 3
+
+    aggregated = query_frame(
+        df,
+        sql="SELECT country, COUNT(*) AS orders FROM result "
+        "GROUP BY country ORDER BY country",
+    )
+    assert aggregated["rows"] == [
+        {"country": "FR", "orders": 1},
+        {"country": "US", "orders": 2},
+    ]
+
+    for sql in ("SELEC country FROM result", "SELECT missing FROM result"):
+        assert "error" in query_frame(df, sql=sql)
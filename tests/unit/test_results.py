@@ -0,0 +1,51 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterator
+
+from app.utils.results import read_bounded
+
+
+def _rows(n: int) -> Iterator[dict]:
+    for i in range(n):
+        yield {"id": i, "name": f"row-{i}"}
+
+
+def test_read_bounded_stops_at_row_cap() -> None:
+    consumed = []
+
+    def tracked() -> Iterator[dict]:
+        for row in _rows(1_000_000):
+            consumed.append(row)
+            yield row
+
+    result = read_bounded(tracked(), max_rows=10, total_rows=1_000_000)
+    assert result.rows_returned == 10
+    assert result.truncated
+    assert result.total_rows == 1_000_000
+    assert len(consumed) == 11
+
+
+def test_read_bounded_stops_at_byte_cap() -> None:
+    result = read_bounded(_rows(100), max_rows=100, max_bytes=100)
+    assert 0 < result.rows_returned < 100
+    assert result.bytes_returned <= 100
+    assert result.truncated
+
+
+def test_read_bounded_small_result_is_complete() -> None:
+    result = read_bounded(_rows(3)).to_dict()
+    assert result["rows_returned"] == 3
+    assert result["total_rows"] == 3
+    assert not result["truncated"]
@@ -0,0 +1,103 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from typing import Any
+
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.utils.routing import (
+    FLASH_MODEL,
+    PRO_MODEL,
+    ModelRouter,
+    load_rules,
+    model_tokens,
+)
+
+
+def _responses(*responses: tuple[str, dict]) -> list[types.Content]:
+    return [
+        types.Content(role="user", parts=[types.Part(text="Revenue by country?")]),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part(
+                    function_response=types.FunctionResponse(
+                        name=name, response=response
+                    )
+                )
+                for name, response in responses
+            ],
+        ),
+    ]
+
+
+def test_routes_by_the_latest_tool_responses() -> None:
+    router = ModelRouter()
+    assert router.route(_responses(("search_catalog", {"result": []}))) == (
+        "catalog",
+        FLASH_MODEL,
+    )
+    assert router.route(_responses(("run_query", {"rows": []}))) == (
+        "format_results",
+        FLASH_MODEL,
+    )
+    assert router.route(_responses(("run_query", {"error": "Syntax error"}))) == (
+        "sql_repair",
+        PRO_MODEL,
+    )
+    # Writing SQL after reading a schema, or mixed responses, use the default model.
+    assert router.route(_responses(("get_table_schema", {"columns": ""}))) == (
+        "default",
+        PRO_MODEL,
+    )
+    assert router.route(
+        _responses(("search_catalog", {"result": []}), ("get_table_schema", {}))
+    ) == ("default", PRO_MODEL)
+    assert router.route(_responses()[:1]) == ("default", PRO_MODEL)
+
+
+def test_rules_are_configurable() -> None:
+    rules = load_rules(
+        '[{"name": "schemas", "model": "flash", "after_tools": ["get_table_schema"]}]'
+    )
+    router = ModelRouter(rules=rules)
+    assert router.route(_responses(("get_table_schema", {}))) == (
+        "schemas",
+        FLASH_MODEL,
+    )
+    assert router.route(_responses(("search_catalog", {}))) == ("default", PRO_MODEL)
+
+
+def test_callbacks_set_the_model_and_record_tokens() -> None:
+    router = ModelRouter()
+    callback_context: Any = SimpleNamespace(
+        invocation_id="inv-1", agent_name="root_agent"
+    )
+    request = LlmRequest(model=PRO_MODEL, contents=_responses(("search_catalog", {})))
+
+    router.before_model_callback(callback_context, request)
+    assert request.model == FLASH_MODEL
+    router.after_model_callback(
+        callback_context,
+        LlmResponse(
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=1200, candidates_token_count=80
+            )
+        ),
+    )
+    labels = {"agent": "root_agent", "route": "catalog", "model": FLASH_MODEL}
+    assert model_tokens.value(kind="prompt", **labels) == 1200
+    assert model_tokens.value(kind="output", **labels) == 80
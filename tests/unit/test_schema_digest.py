@@ -0,0 +1,93 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from google.cloud import bigquery
+
+from app.utils.schema_digest import estimate_tokens, flatten_schema, schema_digest
+
+
+def _table(schema: list[bigquery.SchemaField]) -> bigquery.Table:
+    table = bigquery.Table("p.sales.orders", schema=schema)
+    table.time_partitioning = bigquery.TimePartitioning(field="order_date")
+    table.clustering_fields = ["customer_id"]
+    return table
+
+
+def test_flatten_schema_expands_nested_records() -> None:
+    schema = [
+        bigquery.SchemaField("order_id", "INTEGER"),
+        bigquery.SchemaField(
+            "items",
+            "RECORD",
+            mode="REPEATED",
+            fields=[
+                bigquery.SchemaField("sku", "STRING"),
+                bigquery.SchemaField("tags", "STRING", mode="REPEATED"),
+            ],
+        ),
+    ]
+    assert [(c.path, c.type) for c in flatten_schema(schema)] == [
+        ("order_id", "INT64"),
+        ("items[].sku", "STRING"),
+        ("items[].tags", "ARRAY<STRING>"),
+    ]
+
+
+def test_schema_digest_marks_partitioning_and_clustering() -> None:
+    digest = schema_digest(
+        _table(
+            [
+                bigquery.SchemaField("order_date", "DATE"),
+                bigquery.SchemaField("customer_id", "STRING"),
+            ]
+        )
+    )
+    assert digest == {
+        "table": "sales.orders",
+        "columns": "order_date DATE\ncustomer_id STRING",
+        "partitioned_by": "order_date (DAY)",
+        "clustered_by": "customer_id",
+    }
+
+
+def test_schema_digest_prunes_wide_tables_by_question() -> None:
+    schema = [
+        bigquery.SchemaField("order_date", "DATE"),
+        bigquery.SchemaField("customer_id", "STRING"),
+        bigquery.SchemaField("total_revenue", "NUMERIC"),
+        *(bigquery.SchemaField(f"attribute_{i}", "STRING") for i in range(397)),
+    ]
+    table = _table(schema)
+
+    digest = schema_digest(
+        table, question="What was the revenue per day?", max_columns=5
+    )
+    columns = digest["columns"].splitlines()
+    assert len(columns) == 5
+    assert columns[:3] == [
+        "order_date DATE",
+        "customer_id STRING",
+        "total_revenue NUMERIC",
+    ]
+    assert digest["omitted_columns"] == 395
+
+    detailed = json.dumps(
+        [{"name": f.name, "type": f.field_type, "mode": f.mode} for f in schema]
+    )
+    assert (
+        estimate_tokens(json.dumps(schema_digest(table)))
+        < estimate_tokens(detailed) / 2
+    )
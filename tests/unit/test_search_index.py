@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app.utils.search_index import CatalogSearchIndex, TableDocument, tokenize
+
+
+@pytest.fixture
+def index() -> CatalogSearchIndex:
+    return CatalogSearchIndex(
+        [
+            TableDocument(
+                "sales",
+                "orders",
+                "BASE TABLE",
+                "One row per customer order",
+                [
+                    {"name": "order_id"},
+                    {"name": "customerId"},
+                    {"name": "total_revenue", "description": "Order value in USD"},
+                ],
+            ),
+            TableDocument(
+                "sales",
+                "customers",
+                "BASE TABLE",
+                columns=[{"name": "customer_id"}, {"name": "address.city"}],
+            ),
+            TableDocument(
+                "ops",
+                "shipments",
+                "VIEW",
+                columns=[{"name": "order_id"}, {"name": "carrier"}],
+            ),
+        ]
+    )
+
+
+def test_tokenize_splits_identifiers() -> None:
+    assert tokenize("orderItems.unit_price") == ["order", "items", "unit", "price"]
+
+
+def test_search_ranks_table_name_matches_first(index: CatalogSearchIndex) -> None:
+    results = index.search("customer", k=2)
+    assert results[0]["table"] == "sales.customers"
+    assert "customer_id" in results[0]["matching_columns"]
+
+
+def test_search_matches_descriptions_and_partial_words(
+    index: CatalogSearchIndex,
+) -> None:
+    assert index.search("revenue usd")[0]["table"] == "sales.orders"
+    assert index.search("shipment")[0]["table"] == "ops.shipments"
+    assert index.search("unrelated") == []
+
+
+def test_tables_with_column(index: CatalogSearchIndex) -> None:
+    assert index.tables_with_column("ORDER_ID", dataset_id="sales") == ["orders"]
+    assert index.tables_with_column("order_id") == ["sales.orders", "ops.shipments"]
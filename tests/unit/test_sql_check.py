@@ -0,0 +1,62 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.utils.sql_check import capturing_groups, check_sql
+
+
+def _rules(sql: str) -> list[str]:
+    known = {"sales.orders": True, "sales.refunds": False}
+    return [f.rule for f in check_sql(sql, table_exists=known.get).findings]
+
+
+def test_rejects_broken_rules_and_unknown_tables() -> None:
+    assert capturing_groups(r"(\d+)-(?:\w+)\((?P<city>[^(]+)\)") == 2
+    assert _rules(
+        r"SELECT REGEXP_EXTRACT(address, r'^(\d+) (.*)$') FROM sales.orders"
+    ) == ["regexp_groups"]
+    assert (
+        _rules(r"SELECT REGEXP_EXTRACT(address, '^\\d+ (.*)$') FROM sales.orders") == []
+    )
+    assert _rules("SELECT REGEXP_CONTAINS(a, REGEXP_QUOTE(b)) FROM sales.orders") == [
+        "regexp_quote"
+    ]
+    assert _rules(
+        "SELECT COUNT(*) FROM sales.refunds JOIN crm.accounts USING (id)"
+    ) == ["unknown_table"]
+    assert _rules("SELECT 'unterminated FROM sales.orders") == ["syntax"]
+    assert _rules("SELECT COUNT(*) FROM (SELECT * FROM sales.orders") == ["syntax"]
+    assert _rules("") == ["syntax"]
+
+
+def test_adds_a_limit_to_unbounded_queries() -> None:
+    cases = {
+        "SELECT * FROM sales.orders;": "SELECT * FROM sales.orders\nLIMIT 10",
+        "SELECT * FROM sales.orders -- all": "SELECT * FROM sales.orders -- all\nLIMIT 10",
+        "WITH t AS (SELECT SUM(x) s FROM sales.orders LIMIT 5) SELECT * FROM t": (
+            "WITH t AS (SELECT SUM(x) s FROM sales.orders LIMIT 5) SELECT * FROM t\nLIMIT 10"
+        ),
+        "SELECT country, SUM(revenue) FROM sales.orders GROUP BY 1": None,
+        "SELECT COUNT(*) FROM sales.orders": None,
+        "SELECT day, SUM(revenue) OVER (ORDER BY day) FROM sales.orders": (
+            "SELECT day, SUM(revenue) OVER (ORDER BY day) FROM sales.orders\nLIMIT 10"
+        ),
+        "SELECT COUNT(*) OVER w, MAX(day) FROM sales.orders WINDOW w AS ()": None,
+        "SELECT * FROM sales.orders LIMIT 500": None,
+        "DELETE FROM sales.orders WHERE TRUE": None,
+    }
+    for sql, expected in cases.items():
+        check = check_sql(sql, default_limit=10)
+        assert check.ok
+        assert check.sql == (expected or sql)
+        assert check.limit_added == (10 if expected else None)
@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Sequence
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.cloud import bigquery
+from google.genai import types
+
+from app.utils.sql import referenced_tables
+from app.utils.sql_examples import SQLExampleStore, schema_fingerprint
+
+SQL = "SELECT country, SUM(revenue) AS revenue FROM sales.orders GROUP BY country"
+
+
+def test_referenced_tables() -> None:
+    sql = """
+        WITH recent AS (SELECT * FROM `my-project.sales.orders` WHERE EXTRACT(YEAR FROM day) = 2025)
+        SELECT * FROM recent JOIN sales.customers USING (customer_id), UNNEST(items)
+        WHERE id IN (SELECT id FROM my-project.crm.accounts)  -- FROM ignored.table
+    """
+    assert referenced_tables(sql) == [
+        "my-project.sales.orders",
+        "sales.customers",
+        "my-project.crm.accounts",
+    ]
+
+
+def test_similar_questions_match_until_the_schema_changes() -> None:
+    schemas = {"sales.orders": [bigquery.SchemaField("revenue", "FLOAT")]}
+
+    def fingerprints(tables: Sequence[str]) -> dict[str, str | None]:
+        fakes: dict[str, Any] = {t: SimpleNamespace(schema=schemas[t]) for t in tables}
+        return {t: schema_fingerprint(fake) for t, fake in fakes.items()}
+
+    store = SQLExampleStore(fingerprints)
+    assert store.record("What is the total revenue by country?", SQL)
+    assert store.record(
+        "How many customers signed up last month?", "SELECT COUNT(*) FROM sales.orders"
+    )
+    assert not store.record("Delete old orders", "DELETE FROM sales.orders WHERE TRUE")
+
+    [match] = store.lookup("what's the total revenue by country")
+    assert match.sql == SQL and match.same_question
+    [match] = store.lookup("total revenue per country last year")
+    assert match.sql == SQL and not match.same_question
+    assert store.lookup("list the product categories") == []
+
+    # Descriptions do not change the fingerprint, new columns do.
+    schemas["sales.orders"] = [
+        bigquery.SchemaField("revenue", "FLOAT", description="USD")
+    ]
+    assert store.lookup("total revenue by country")
+    schemas["sales.orders"] = [bigquery.SchemaField("revenue", "NUMERIC")]
+    assert store.lookup("total revenue by country") == []
+    assert store.stats()["evictions"] == 1
+    assert len(store) == 1
+
+
+def test_negated_questions_are_not_the_same_question() -> None:
+    store = SQLExampleStore(lambda tables: dict.fromkeys(tables, "v1"))
+    placed = "SELECT DISTINCT customer_id FROM sales.orders WHERE EXTRACT(YEAR FROM day) = 2024"
+    not_placed = (
+        "SELECT customer_id FROM sales.customers EXCEPT DISTINCT (" + placed + ")"
+    )
+    assert store.record("Which customers placed orders in 2024?", placed)
+    assert store.record("Which customers placed no orders in 2024?", not_placed)
+    assert len(store) == 2
+
+    matches = store.lookup("Which customers placed no orders in 2024?")
+    assert [(m.sql, m.same_question) for m in matches] == [
+        (not_placed, True),
+        (placed, False),
+    ]
+    matches = store.lookup("Which customers didn't place orders in 2024?")
+    assert not any(m.same_question for m in matches)
+
+
+@pytest.mark.asyncio
+async def test_callbacks_record_queries_and_offer_examples() -> None:
+    store = SQLExampleStore(lambda tables: dict.fromkeys(tables, "v1"))
+    question = types.Content(
+        role="user", parts=[types.Part(text="Total revenue by country?")]
+    )
+    tool: Any = SimpleNamespace(name="run_query")
+    tool_context: Any = SimpleNamespace(user_content=question)
+
+    await store.after_tool_callback(
+        tool, {"query": SQL}, tool_context, {"error": "Syntax error"}
+    )
+    assert len(store) == 0
+    await store.after_tool_callback(tool, {"query": SQL}, tool_context, {"rows": []})
+    assert len(store) == 1
+
+    callback_context: Any = SimpleNamespace(user_content=question, state={})
+    await store.before_agent_callback(callback_context)
+    assert callback_context.state["sql_examples"] == (
+        "- Question (same question): Total revenue by country?\n"
+        "  SQL: select country,sum(revenue)as revenue from sales.orders group by country"
+    )
+
+
+@pytest.mark.asyncio
+async def test_follow_up_replies_are_not_questions() -> None:
+    store = SQLExampleStore(lambda tables: dict.fromkeys(tables, "v1"))
+    assert not store.record(
+        "Yes, go ahead", "SELECT * FROM sales.orders WHERE region = 'EU'"
+    )
+    assert store.record("Total revenue by country?", SQL)
+    [match] = store.lookup("revenue by country")
+    assert not match.same_question
+
+    # The question of the exchange is kept while the user answers the agent.
+    state: dict[str, Any] = {}
+    for text in (
+        "What is the total revenue by country?",
+        "Use sales.orders",
+        "yes, go ahead",
+    ):
+        content = types.Content(role="user", parts=[types.Part(text=text)])
+        context: Any = SimpleNamespace(user_content=content, state=state)
+        await store.before_agent_callback(context)
+    assert state["sql_examples_question"] == "What is the total revenue by country?"
+    assert "same question" in state["sql_examples"]
+
+    tool: Any = SimpleNamespace(name="run_query")
+    sql = "SELECT country, SUM(revenue) FROM sales.orders WHERE region = 'EU' GROUP BY country"
+    await store.after_tool_callback(tool, {"query": sql}, context, {"rows": []})
+    [match] = store.lookup("total revenue by country")
+    assert (
+        match.question == "What is the total revenue by country?" and match.sql == sql
+    )
+    assert store.lookup("yes go ahead") == []
@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.utils.tool_logging import ToolCallLogger, bounded_preview
+
+TOOL: Any = SimpleNamespace(name="execute_query")
+
+
+def _context(call_id: str) -> Any:
+    return SimpleNamespace(function_call_id=call_id, invocation_id="inv-1")
+
+
+def test_bounded_preview_stops_at_the_byte_cap() -> None:
+    rows = [{"n": i, "name": "x" * 100} for i in range(100_000)]
+    preview = bounded_preview({"rows": rows}, max_bytes=64)
+    assert len(preview) == 67
+    assert preview.startswith('{"rows": [{"n": 0')
+    assert preview.endswith("...")
+    assert bounded_preview({"a": 1}, max_bytes=64) == '{"a": 1}'
+
+
+def test_records_are_structured_and_bounded(caplog: pytest.LogCaptureFixture) -> None:
+    tool_logger = ToolCallLogger(preview_bytes=32)
+    response = {
+        "rows": [{"n": i} for i in range(1000)],
+        "rows_returned": 1000,
+        "total_rows": 5000,
+        "bytes_returned": 9000,
+        "truncated": True,
+    }
+    with caplog.at_level(logging.INFO, logger="app.utils.tool_logging"):
+        tool_logger.before_tool_callback(TOOL, {"query": "SELECT n"}, _context("c1"))
+        tool_logger.after_tool_callback(
+            TOOL, {"query": "SELECT n"}, _context("c1"), response
+        )
+
+    (log_record,) = caplog.records
+    record = log_record.json_fields  # type: ignore[attr-defined]
+    assert record["tool"] == "execute_query"
+    assert record["duration_ms"] >= 0
+    assert record["args"] == '{"query": "SELECT n"}'
+    assert (record["rows"], record["total_rows"], record["truncated"]) == (
+        1000,
+        5000,
+        True,
+    )
+    assert len(record["preview"]) == 35
+
+
+def test_sampling_skips_successes_but_not_failures(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    tool_logger = ToolCallLogger(sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger="app.utils.tool_logging"):
+        tool_logger.after_tool_callback(TOOL, {}, _context("c1"), {"rows": []})
+        tool_logger.after_tool_callback(
+            TOOL, {}, _context("c2"), {"error": "Syntax error"}
+        )
+
+    assert [r.levelno for r in caplog.records] == [logging.WARNING]
+    assert caplog.records[0].json_fields["duration_ms"] is None  # type: ignore[attr-defined]
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.utils.trace_sampling import TailSamplingSpanProcessor
+
+
+def make_tracer(
+    **kwargs: Any,
+) -> tuple[trace.Tracer, InMemorySpanExporter, TailSamplingSpanProcessor]:
+    memory = InMemorySpanExporter()
+    processor = TailSamplingSpanProcessor(SimpleSpanProcessor(memory), **kwargs)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    return provider.get_tracer(__name__), memory, processor
+
+
+def run_trace(tracer: trace.Tracer, error: bool = False) -> int:
+    with tracer.start_as_current_span("invocation") as root:
+        with tracer.start_as_current_span("call_llm"):
+            pass
+        with tracer.start_as_current_span("execute_tool run_query") as tool:
+            if error:
+                tool.set_status(trace.Status(trace.StatusCode.ERROR, "Syntax error"))
+    return root.get_span_context().trace_id
+
+
+def test_errors_and_slow_traces_are_kept_in_full() -> None:
+    tracer, memory, _ = make_tracer(sample_rate=0.0, slow_seconds=10)
+
+    run_trace(tracer)
+    assert memory.get_finished_spans() == ()
+
+    error_trace = run_trace(tracer, error=True)
+    spans = memory.get_finished_spans()
+    assert [span.name for span in spans] == [
+        "call_llm",
+        "execute_tool run_query",
+        "invocation",
+    ]
+    assert {span.context.trace_id for span in spans} == {error_trace}
+
+    memory.clear()
+    with tracer.start_as_current_span("invocation", end_on_exit=False) as root:
+        with tracer.start_as_current_span("call_llm"):
+            pass
+    # Nothing is exported while the trace is in progress.
+    assert memory.get_finished_spans() == ()
+    root.end(root.start_time + 11 * 10**9)  # type: ignore[attr-defined]
+    assert len(memory.get_finished_spans()) == 2
+
+
+def test_normal_traces_are_sampled_by_trace_id() -> None:
+    tracer, memory, _ = make_tracer(sample_rate=0.25)
+    trace_ids = [run_trace(tracer) for _ in range(400)]
+    kept = {span.context.trace_id for span in memory.get_finished_spans()}
+
+    assert kept == {t for t in trace_ids if t & (2**64 - 1) < 2**62}
+    assert 60 < len(kept) < 140
+    assert len(memory.get_finished_spans()) == 3 * len(kept)
+
+
+def test_oldest_traces_are_decided_when_the_buffer_is_full() -> None:
+    tracer, memory, processor = make_tracer(sample_rate=1.0, max_buffered_spans=2)
+    with tracer.start_as_current_span("invocation"):
+        for i in range(3):
+            with tracer.start_as_current_span(f"tool {i}"):
+                pass
+        assert [span.name for span in memory.get_finished_spans()] == [
+            "tool 0",
+            "tool 1",
+            "tool 2",
+        ]
+    assert memory.get_finished_spans()[-1].name == "invocation"
+
+    with tracer.start_as_current_span("unfinished"):
+        with tracer.start_as_current_span("call_llm"):
+            pass
+        processor.shutdown()
+        assert [span.name for span in memory.get_finished_spans()][-1] == "call_llm"
@@ -0,0 +1,158 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+from types import SimpleNamespace
+from typing import Any
+
+from google.cloud.logging_v2.logger import Logger
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.utils.tracing import (
+    CloudTraceLoggingSpanExporter,
+    FileSpanExporter,
+    span_to_dict,
+)
+
+
+class FakeLoggingClient:
+    project = "test-project"
+
+    def __init__(self) -> None:
+        self.writes: list[list[dict]] = []
+        self.logging_api = SimpleNamespace(write_entries=self.write_entries)
+
+    def write_entries(self, entries: list[dict], **kwargs: Any) -> None:
+        self.writes.append(entries)
+
+    def logger(self, name: str) -> Logger:
+        return Logger(name, client=self)
+
+
+class FakeBucket:
+    def __init__(self) -> None:
+        self.exists_calls = 0
+        self.uploads: dict[str, bytes] = {}
+
+    def exists(self) -> bool:
+        self.exists_calls += 1
+        return True
+
+    def blob(self, name: str) -> Any:
+        def upload_from_string(
+            content: bytes, content_type: str, **kwargs: Any
+        ) -> None:
+            assert (
+                blob.content_encoding == "gzip" and kwargs["if_generation_match"] == 0
+            )
+            self.uploads[name] = gzip.decompress(content)
+
+        blob = SimpleNamespace(
+            content_encoding=None, upload_from_string=upload_from_string
+        )
+        return blob
+
+
+def make_exporter(
+    **kwargs: Any,
+) -> tuple[CloudTraceLoggingSpanExporter, FakeLoggingClient, FakeBucket]:
+    logging_client, bucket = FakeLoggingClient(), FakeBucket()
+    exporter = CloudTraceLoggingSpanExporter(
+        logging_client=logging_client,  # type: ignore[arg-type]
+        storage_client=SimpleNamespace(bucket=lambda name: bucket),
+        project_id="test-project",
+        client=SimpleNamespace(batch_write_spans=lambda request: None),
+        **kwargs,
+    )
+    return exporter, logging_client, bucket
+
+
+def make_spans(count: int, **attributes: Any) -> list[ReadableSpan]:
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer(__name__)
+    with tracer.start_as_current_span("invocation") as parent:
+        for i in range(count):
+            with tracer.start_as_current_span(
+                f"tool {i}",
+                links=[trace.Link(parent.get_span_context(), {"kind": "parent"})],
+            ) as span:
+                span.set_attributes(
+                    {"tables": ("orders", "customers"), "rows": i, **attributes}
+                )
+                span.add_event("called", {"attempt": 1})
+                span.set_status(trace.Status(trace.StatusCode.ERROR, "Syntax error"))
+    return list(memory.get_finished_spans())
+
+
+def test_span_to_dict_matches_to_json() -> None:
+    for span in make_spans(2):
+        assert span_to_dict(span) == json.loads(span.to_json())
+
+
+def test_export_writes_log_entries_in_batches() -> None:
+    exporter, logging_client, _ = make_exporter(max_batch_entries=4)
+    spans = make_spans(9)
+
+    assert exporter.export(spans) == SpanExportResult.SUCCESS
+    assert [len(entries) for entries in logging_client.writes] == [4, 4, 2]
+    entry = logging_client.writes[0][0]["jsonPayload"]
+    assert entry["span_id"] == format(spans[0].context.span_id, "x")
+    assert entry["attributes"]["tables"] == ["orders", "customers"]
+
+    def fail(entries: list[dict], **kwargs: Any) -> None:
+        raise RuntimeError("quota exceeded")
+
+    logging_client.logging_api.write_entries = fail
+    assert exporter.export(spans) == SpanExportResult.FAILURE
+
+
+def test_large_values_are_stored_once_by_content_hash() -> None:
+    exporter, logging_client, bucket = make_exporter()
+    prompt = 'Answer "revenue by country"\n' * 12000
+    spans = make_spans(3, prompt=prompt, instruction="Be brief.")
+
+    exporter.export(spans)
+    assert exporter.force_flush()
+    assert bucket.exists_calls == 1
+    [(name, content)] = bucket.uploads.items()
+    assert name.startswith("spans/payloads/") and name.endswith(".json.gz")
+    assert json.loads(content) == prompt
+
+    for entry in logging_client.writes[0][:3]:
+        attributes = entry["jsonPayload"]["attributes"]
+        assert attributes["prompt"] == f"gs://{exporter.bucket_name}/{name}"
+        assert attributes["offloaded_attributes"] == ["prompt"]
+        assert attributes["instruction"] == "Be brief."
+    exporter.shutdown()
+
+
+def test_file_exporter_writes_json_lines(tmp_path: Any) -> None:
+    path = tmp_path / "spans.jsonl"
+    exporter = FileSpanExporter(str(path))
+    spans = make_spans(2)
+
+    assert exporter.export(spans[:1]) == SpanExportResult.SUCCESS
+    assert exporter.export(spans[1:]) == SpanExportResult.SUCCESS
+    exporter.shutdown()
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        json.loads(s.to_json()) for s in spans
+    ]
+    assert exporter.export(spans) == SpanExportResult.FAILURE